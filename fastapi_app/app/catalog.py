@@ -0,0 +1,116 @@
+# fastapi_app/app/catalog.py
+# 모든 백엔드의 /api/tags를 합친 모델 목록 캐시 (/v1/models, /v1/qwen/health)
+
+import asyncio
+import hashlib
+import json
+import time
+from typing import Optional
+import httpx
+from . import config
+from .clients import registry as ollama_clients
+
+
+def make_etag(content) -> str:
+    """JSON 응답 내용으로 만든 ETag"""
+    data = json.dumps(content, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return f'"{hashlib.sha256(data).hexdigest()[:32]}"'
+
+
+class CatalogSnapshot:
+    __slots__ = ("models", "errors", "fetched_at")
+
+    def __init__(self, models: list[dict], errors: dict[str, str], fetched_at: float):
+        self.models = models
+        self.errors = errors          # 엔드포인트 → 마지막 조회 오류
+        self.fetched_at = fetched_at  # time.monotonic()
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.fetched_at
+
+
+class ModelCatalog:
+    """
+    백엔드별 /api/tags를 동시에 조회해 합친 모델 목록을 메모리에 보관합니다.
+
+    - CATALOG_TTL_SECONDS 이내: 캐시 그대로 반환
+    - CATALOG_STALE_SECONDS 이내: 캐시를 반환하고 백그라운드에서 갱신 (stale-while-revalidate)
+    - 그 이후 또는 캐시 없음: 갱신이 끝날 때까지 대기 (동시 요청은 갱신 1회를 공유)
+    조회에 실패한 백엔드는 마지막으로 성공한 목록을 유지합니다.
+    """
+
+    def __init__(self):
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._last_good: dict[str, list[dict]] = {}
+
+        # 메트릭
+        self.refreshes = 0
+        self.hits = 0
+        self.stale_hits = 0
+
+    async def get(self) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.age < config.CATALOG_TTL_SECONDS:
+            self.hits += 1
+            return snapshot
+        if snapshot is not None and snapshot.age < config.CATALOG_STALE_SECONDS:
+            self.stale_hits += 1
+            self._start_refresh()
+            return snapshot
+        return await asyncio.shield(self._start_refresh())
+
+    def _start_refresh(self) -> asyncio.Task:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self.refresh())
+        return self._refresh_task
+
+    async def refresh(self) -> CatalogSnapshot:
+        endpoints = sorted({endpoint for replicas in config.OLLAMA_REPLICAS.values() for endpoint in replicas})
+        results = await asyncio.gather(*(self._fetch(endpoint) for endpoint in endpoints))
+
+        models: list[dict] = []
+        names: set[str] = set()
+        errors: dict[str, str] = {}
+        for endpoint, (endpoint_models, error) in zip(endpoints, results):
+            if error is not None:
+                errors[endpoint] = error
+                endpoint_models = self._last_good.get(endpoint, [])
+            else:
+                self._last_good[endpoint] = endpoint_models
+            for model in endpoint_models:
+                if model["name"] not in names:
+                    models.append(model)
+                    names.add(model["name"])
+
+        self.refreshes += 1
+        self._snapshot = CatalogSnapshot(models, errors, time.monotonic())
+        return self._snapshot
+
+    async def _fetch(self, endpoint: str) -> tuple[list[dict], Optional[str]]:
+        timeout = config.CATALOG_BACKEND_TIMEOUT_SECONDS
+        try:
+            # httpx 타임아웃은 단계별(연결/읽기)이라 전체 시간은 wait_for로 제한
+            response = await asyncio.wait_for(ollama_clients.get(endpoint).get("/api/tags", timeout=timeout), timeout)
+            response.raise_for_status()
+            return response.json().get("models", []), None
+        except asyncio.TimeoutError:
+            print(f"Warning: Ollama at {endpoint} did not answer within {timeout}s")
+            return [], f"timeout after {timeout}s"
+        except (httpx.HTTPError, ValueError) as e:
+            print(f"Warning: Could not connect to Ollama at {endpoint}. Error: {e}")
+            return [], str(e) or type(e).__name__
+
+    def stats(self) -> dict:
+        return {
+            "models": len(self._snapshot.models) if self._snapshot else 0,
+            "age_seconds": round(self._snapshot.age, 1) if self._snapshot else None,
+            "errors": self._snapshot.errors if self._snapshot else {},
+            "refreshes": self.refreshes,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+        }
+
+
+model_catalog = ModelCatalog()
@@ -0,0 +1,85 @@
+# fastapi_app/app/clients.py
+# Ollama 백엔드별 공유 httpx.AsyncClient 레지스트리
+
+import httpx
+from . import config
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class OllamaClientRegistry:
+    """
+    엔드포인트(config.OLLAMA_REPLICAS의 복제본)마다 하나의 AsyncClient를 유지합니다.
+
+    서버 시작 시 생성하고 종료 시 닫아서 요청마다 TCP 연결을 새로 맺지 않고
+    keep-alive 연결을 재사용합니다.
+    """
+
+    def __init__(self):
+        self._clients: dict[str, httpx.AsyncClient] = {}
+
+    def _build_client(self, endpoint: str) -> httpx.AsyncClient:
+        pool = {**config.OLLAMA_POOL_DEFAULTS, **config.OLLAMA_POOL_LIMITS.get(endpoint, {})}
+        limits = httpx.Limits(
+            max_connections=pool["max_connections"],
+            max_keepalive_connections=pool["max_keepalive_connections"],
+            keepalive_expiry=pool["keepalive_expiry"],
+        )
+        timeout = httpx.Timeout(config.OLLAMA_REQUEST_TIMEOUT, connect=config.OLLAMA_CONNECT_TIMEOUT)
+        return httpx.AsyncClient(
+            base_url=endpoint,
+            limits=limits,
+            timeout=timeout,
+            http2=config.OLLAMA_HTTP2 and HTTP2_AVAILABLE,
+        )
+
+    async def startup(self):
+        for endpoint in {endpoint for replicas in config.OLLAMA_REPLICAS.values() for endpoint in replicas}:
+            if endpoint not in self._clients:
+                self._clients[endpoint] = self._build_client(endpoint)
+
+    async def shutdown(self):
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+    def get(self, endpoint: str) -> httpx.AsyncClient:
+        """엔드포인트용 클라이언트 반환 (startup 이전 호출 시 지연 생성)"""
+        client = self._clients.get(endpoint)
+        if client is None or client.is_closed:
+            client = self._build_client(endpoint)
+            self._clients[endpoint] = client
+        return client
+
+    def endpoints(self) -> list[str]:
+        return sorted(self._clients.keys())
+
+    def pool_stats(self) -> dict[str, dict]:
+        """백엔드별 커넥션 풀 현황 (열린 연결, 유휴 연결, 대기 중인 요청)"""
+        return {endpoint: _pool_stats(client) for endpoint, client in self._clients.items()}
+
+
+def _pool_stats(client: httpx.AsyncClient) -> dict:
+    # httpx는 풀 상태를 공개 API로 노출하지 않으므로 httpcore 풀을 직접 조회
+    # (httpx 0.28 / httpcore 1.0 기준, requirements.txt에서 버전 고정 - 올릴 때 이 함수도 확인)
+    pool = getattr(client._transport, "_pool", None)
+    if pool is None:
+        return {"open": 0, "idle": 0, "active": 0, "waiting": 0}
+
+    connections = list(pool.connections)
+    requests = list(getattr(pool, "_requests", []))
+    idle = sum(1 for conn in connections if conn.is_idle())
+    waiting = sum(1 for req in requests if req.is_queued())
+    return {
+        "open": len(connections),
+        "idle": idle,
+        "active": len(connections) - idle,
+        "waiting": waiting,
+    }
+
+
+registry = OllamaClientRegistry()
@@ -9,11 +9,191 @@ OLLAMA_ENDPOINTS = {
     "gpt-oss:20b": "http://ollama_gpu1:11434"
 }
 
+# 임베딩 모델 (/v1/embeddings 전용 - /v1/generate, /v1/chat에서는 사용 불가)
+# gpu0은 모델 하나만 올리고 OCR(qwen)을 계속 쓰므로, 작은 임베딩 모델은 gpu1에 gpt-oss와 함께 상주시킴
+# (gpu1의 BACKEND_MAX_LOADED_MODELS/OLLAMA_MAX_LOADED_MODELS = 2)
+EMBEDDING_ENDPOINTS = {
+    "bge-m3:latest": "http://ollama_gpu1:11434"
+}
+
+# 모델별 복제본(replica) 목록 - 같은 모델을 올린 GPU 서버를 추가하면 여기에 URL을 추가
+# (기본값은 OLLAMA_ENDPOINTS/EMBEDDING_ENDPOINTS의 서버 하나)
+OLLAMA_REPLICAS = {model: [endpoint] for model, endpoint in {**OLLAMA_ENDPOINTS, **EMBEDDING_ENDPOINTS}.items()}
+
 # 허용된 모델 목록
 SUPPORTED_MODELS = set(OLLAMA_ENDPOINTS.keys())
+EMBEDDING_MODELS = set(EMBEDDING_ENDPOINTS.keys())
 
 # 데이터베이스 파일 위치
 DATABASE_FILE = "/app/database/api_server.db"
 
 # Fallback용 기본 Ollama URL
-OLLAMA_BASE_URL = "http://ollama_gpu0:11434"
\ No newline at end of file
+OLLAMA_BASE_URL = "http://ollama_gpu0:11434"
+
+# Ollama 요청 타임아웃 (초) - 대형 모델 추론을 고려해 nginx/uvicorn 설정과 동일하게 유지
+OLLAMA_REQUEST_TIMEOUT = 1800.0
+
+# Ollama 연결 수립 타임아웃 (초)
+OLLAMA_CONNECT_TIMEOUT = 10.0
+
+# 백엔드별 httpx 커넥션 풀 설정
+# (엔드포인트에 별도 설정이 없으면 OLLAMA_POOL_DEFAULTS 사용)
+OLLAMA_POOL_DEFAULTS = {
+    "max_connections": 32,
+    "max_keepalive_connections": 8,
+    "keepalive_expiry": 30.0,
+}
+OLLAMA_POOL_LIMITS = {
+    "http://ollama_gpu0:11434": {"max_connections": 16, "max_keepalive_connections": 4},
+    "http://ollama_gpu1:11434": {"max_connections": 32, "max_keepalive_connections": 8},
+}
+
+# HTTP/2 사용 여부 (h2는 requirements.txt의 httpx[http2]로 설치됨)
+# HTTP/2는 TLS(ALPN)로 협상하므로 https:// 엔드포인트에만 적용되고, http:// 엔드포인트는 HTTP/1.1 keep-alive 사용
+OLLAMA_HTTP2 = True
+
+# 관리자 API(/v1/admin/*)에 접근 가능한 API 키 소유자
+ADMIN_KEY_OWNERS = {"admin"}
+
+# API 키 캐시 설정
+KEY_CACHE_TTL_SECONDS = 60.0           # 유효한 키 캐시 유지 시간
+KEY_CACHE_NEGATIVE_TTL_SECONDS = 5.0   # 잘못된 키(negative) 캐시 유지 시간
+KEY_CACHE_MAX_SIZE = 10000             # 최대 캐시 항목 수 (LRU)
+KEY_CACHE_VERSION_CHECK_SECONDS = 2.0  # key_version 확인 주기 (revoke 반영 최대 지연)
+KEY_COUNT_FLUSH_INTERVAL_MS = 1000     # request_count 일괄 반영 주기
+
+# 요청 로그 일괄 기록 설정
+LOG_QUEUE_MAX_SIZE = 10000     # 메모리 큐 최대 크기
+LOG_BATCH_SIZE = 500           # 한 트랜잭션에 기록할 최대 로그 수
+LOG_OVERFLOW_POLICY = "block"  # 큐가 가득 찼을 때: "block"(대기) / "drop"(버림) / "spill"(파일에 임시 저장)
+LOG_SPILL_FILE = "/app/database/log_spill.jsonl"
+
+# SQLite 락 대기 시간 (초) - 다른 프로세스(manage_keys.py 등)가 쓰는 중일 때
+DB_BUSY_TIMEOUT_SECONDS = 10.0
+
+# 백엔드별 동시 실행 수 (docker-compose의 OLLAMA_NUM_PARALLEL과 맞춰야 함)
+BACKEND_MAX_INFLIGHT = {
+    "http://ollama_gpu0:11434": 1,
+    "http://ollama_gpu1:11434": 4,
+}
+# 백엔드별 최대 대기열 길이 (없으면 SCHEDULER_DEFAULT_MAX_QUEUE)
+BACKEND_MAX_QUEUE = {}
+SCHEDULER_DEFAULT_MAX_QUEUE = 32
+# 처리 시간 통계가 없을 때 Retry-After 계산에 쓰는 기본값 (초)
+SCHEDULER_DEFAULT_RETRY_AFTER_SECONDS = 30
+
+# 백엔드별 동시 적재 모델 수 (docker-compose의 OLLAMA_MAX_LOADED_MODELS와 맞춰야 함)
+# 설정된 백엔드는 적재된 모델 요청을 먼저 처리해 모델 교체(swap)를 줄임
+BACKEND_MAX_LOADED_MODELS = {
+    "http://ollama_gpu0:11434": 1,
+    "http://ollama_gpu1:11434": 2,   # gpt-oss:20b + bge-m3 (임베딩 요청마다 gpt-oss를 내리지 않도록)
+}
+SCHEDULER_RESIDENCY_AWARE = True
+SCHEDULER_RESIDENT_MAX_CONSECUTIVE = 8       # 다른 모델 요청을 연속으로 건너뛸 수 있는 최대 횟수
+SCHEDULER_RESIDENT_MAX_WAIT_SECONDS = 60.0   # 다른 모델 요청의 최대 대기 시간
+
+# 백엔드별 마이크로배칭 최대 대기 창 (초). 설정된 백엔드는 거의 동시에 들어온 같은 모델 요청을
+# 빈 슬롯 수만큼 모았다가 한꺼번에 보내 Ollama 병렬 슬롯(OLLAMA_NUM_PARALLEL)을 함께 채움
+# Ollama는 이미 스텝 단위로 시퀀스를 합치므로(continuous batching) 기본값은 꺼짐.
+# 프롬프트 처리가 다른 시퀀스를 오래 멈추는 백엔드에서 측정 후 켤 것 (예: {"http://ollama_gpu1:11434": 0.05})
+BACKEND_MICROBATCH_MAX_WINDOW_SECONDS = {}
+# 최근 요청 중 직전 요청 후 창 안에 도착한 비율이 이보다 작으면 (드문드문 옴) 모으지 않고 바로 전달
+MICROBATCH_MIN_FOLLOW_RATIO = 0.5
+
+# 우선순위 클래스 (앞쪽이 먼저 처리됨). 요청은 X-Priority 헤더 → 엔드포인트 기본값(배치 OCR은 batch)
+# → API 키의 priority_class → PRIORITY_DEFAULT_CLASS 순으로 정하고, 키의 priority_class보다 높을 수는 없음
+PRIORITY_CLASSES = ["interactive", "standard", "batch"]
+PRIORITY_DEFAULT_CLASS = "standard"
+# 대기 시간이 이만큼 늘 때마다 한 단계 위 클래스로 취급 (낮은 클래스가 굶지 않도록, 0이면 사용 안 함)
+PRIORITY_AGING_SECONDS = 20.0
+# 클래스별 최대 대기열 대기 시간 (초과하면 업스트림에 보내지 않고 503). X-Queue-Deadline 헤더로 요청별 지정 가능
+PRIORITY_MAX_QUEUE_WAIT_SECONDS = {
+    "batch": 300.0,
+}
+
+# 응답 캐시 설정 (결정적 요청 또는 cache=true 요청만 캐시)
+RESPONSE_CACHE_ENABLED = True
+RESPONSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# 디스크 계층 (None이면 메모리만 사용)
+RESPONSE_CACHE_DISK_DIR = "/app/database/response_cache"
+RESPONSE_CACHE_DISK_MAX_BYTES = 1024 * 1024 * 1024
+
+# /v1/qwen/ocr-file 업로드 최대 크기 (바이트)
+OCR_MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+
+# OCR 이미지 전처리 (요청에서 preprocess=true일 때만 적용)
+PREPROCESS_WORKERS = 2                     # 전처리 프로세스 수
+PREPROCESS_DEFAULT_MAX_PIXELS = 1280 * 28 * 28  # Qwen2.5-VL 권장 max_pixels
+PREPROCESS_JPEG_QUALITY = 90
+
+# 배치 OCR (/v1/qwen/ocr/batch, /v1/qwen/ocr-file/batch)
+OCR_BATCH_MAX_IMAGES = 100    # 배치당 최대 이미지 수
+OCR_BATCH_MAX_PARALLEL = 4    # 배치 하나가 동시에 처리하는 이미지 수
+
+# 여러 페이지 문서 OCR (/v1/qwen/ocr-document, PDF는 pypdfium2 필요)
+OCR_DOCUMENT_MAX_UPLOAD_BYTES = 100 * 1024 * 1024   # 100MB
+OCR_DOCUMENT_MAX_PAGES = 200
+OCR_DOCUMENT_PREFETCH_PAGES = 2     # OCR 중인 페이지 뒤로 미리 래스터화할 페이지 수
+OCR_DOCUMENT_MAX_DPI = 300          # PDF 렌더링 해상도 상한
+OCR_DOCUMENT_TMP_DIR = None         # None이면 시스템 임시 디렉터리
+
+# 복제본 라우팅 (app/router.py)
+ROUTER_POLICY = "least_outstanding"      # "least_outstanding" / "ewma" (지연 시간 가중)
+ROUTER_HEALTH_CHECK_INTERVAL_SECONDS = 10.0
+ROUTER_HEALTH_CHECK_TIMEOUT_SECONDS = 3.0
+ROUTER_EJECT_AFTER_FAILURES = 2          # 연속 실패 시 라우팅 대상에서 제외
+ROUTER_READMIT_AFTER_SUCCESSES = 1       # 제외된 복제본을 다시 포함하는 연속 성공 횟수
+ROUTER_MAX_ATTEMPTS = 3                  # 요청 하나가 시도할 최대 복제본 수
+ROUTER_SWAP_PENALTY = 1.0                # 모델이 적재되지 않은 복제본에 더하는 점수 (부하 1.0 = 슬롯 전체)
+
+# 모델 워밍업 (app/warmup.py) - 백엔드별로 미리 올려둘 모델
+WARMUP_MODELS = {
+    "http://ollama_gpu0:11434": ["qwen2.5vl:7b"],
+    "http://ollama_gpu1:11434": ["gpt-oss:20b", "bge-m3:latest"],
+}
+WARMUP_KEEP_ALIVE = -1                   # 워밍업한 모델 유지 시간 (-1: 영구)
+WARMUP_TIMEOUT_SECONDS = 300.0           # 모델 하나 로드 대기 시간
+WARMUP_RECHECK_INTERVAL_SECONDS = 60.0   # 내려간 모델 재워밍업 확인 주기
+
+# 모델 목록 캐시 (/v1/models, /v1/qwen/health)
+CATALOG_TTL_SECONDS = 30.0             # 이 시간 동안은 캐시 그대로 사용
+CATALOG_STALE_SECONDS = 300.0          # 이 시간까지는 캐시를 응답하면서 백그라운드 갱신
+CATALOG_BACKEND_TIMEOUT_SECONDS = 3.0  # 백엔드별 /api/tags 조회 타임아웃
+
+# 키/모델별 토큰·GPU 시간 집계 반영 주기 (usage_daily 테이블)
+USAGE_FLUSH_INTERVAL_SECONDS = 5.0
+
+# 키별 요청 한도/쿼터 (한도 값은 api_keys 테이블, manage_keys.py limits로 설정)
+RATE_LIMIT_CHECKPOINT_SECONDS = 10.0          # 메모리 상태를 SQLite에 저장하는 주기
+RATE_LIMIT_DEFAULT_QUOTA_WINDOW_HOURS = 24.0  # quota_window_hours가 없을 때 롤링 윈도우
+
+# /v1/generate 세션 (session_id별로 Ollama context 토큰을 보관해 다음 요청에 다시 넣음)
+SESSIONS_MAX_BYTES = 128 * 1024 * 1024     # 보관하는 context 전체 크기 (토큰당 4바이트, LRU)
+SESSIONS_IDLE_TTL_SECONDS = 3600           # 이 시간 동안 쓰지 않은 세션은 새로 시작
+SESSIONS_MAX_CONTEXT_TOKENS = 32768        # 이보다 길어지면 세션 context를 비움 (모델 num_ctx 이하로)
+
+# /v1/chat 대화 기록 (conversation_id가 있는 요청만 저장)
+CHAT_HOT_CACHE_SIZE = 1024            # 메모리에 둘 최근 대화 수 (나머지는 SQLite에서 다시 읽음)
+CHAT_HISTORY_TOKEN_BUDGET = 4096      # 저장된 대화 요청 하나의 프롬프트 토큰 상한 (추정치, 모델 num_ctx 이하로)
+CHAT_CHARS_PER_TOKEN = 3.0            # 토큰 수 추정용 (한국어/영어 혼합 기준 대략값)
+CHAT_COMPACTION = "summarize"         # 예산을 넘는 오래된 턴: "trim"(버림) 또는 "summarize"(요약으로 대체)
+CHAT_SUMMARY_MAX_TOKENS = 256         # 요약 생성 최대 토큰 (num_predict)
+CHAT_SUMMARY_TIMEOUT_SECONDS = 20.0   # 요약이 이보다 오래 걸리면 이번 턴은 trim으로 대체 (요청 지연 상한)
+
+# /v1/embeddings
+EMBEDDINGS_MAX_INPUTS = 2048                  # 요청 하나의 최대 텍스트 수
+EMBEDDINGS_BATCH_SIZE = 64                    # Ollama /api/embed 한 번에 보내는 텍스트 수
+EMBEDDINGS_CACHE_MAX_BYTES = 256 * 1024 * 1024  # 벡터 캐시 크기 (float32, 1024차원 기준 약 6만 개)
+
+# 비동기 작업(/v1/jobs) 설정
+JOBS_WORKERS = 4                          # 동시에 실행하는 작업 수 (GPU 동시 실행 수는 스케줄러가 별도로 제한)
+JOBS_MAX_PENDING_PER_KEY = 100            # 키별 대기/실행 중 작업 최대 개수 (초과 시 429)
+JOBS_RESULT_TTL_SECONDS = 24 * 3600       # 끝난 작업 결과 보관 기간
+JOBS_POLL_INTERVAL_SECONDS = 1.0          # 워커가 새 작업을 확인하는 주기 (제출 시에는 즉시 깨움)
+JOBS_MAX_LONG_POLL_SECONDS = 60           # GET /v1/jobs/{id}?wait= 최대값
+JOBS_REAP_INTERVAL_SECONDS = 300          # 만료된 작업 삭제 주기
+JOBS_CALLBACK_TIMEOUT_SECONDS = 10
+JOBS_CALLBACK_MAX_ATTEMPTS = 3
+# 콜백 URL로 허용할 호스트 (None이면 공인 주소로 확인되는 호스트만 허용 - 루프백/사설/링크 로컬/예약 주소 거절)
+# 목록을 지정하면 목록의 호스트만 허용하며, 이 경우 내부 주소도 허용 (예: {"hooks.internal"})
+JOBS_CALLBACK_ALLOWED_HOSTS = None
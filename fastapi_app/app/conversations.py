@@ -0,0 +1,255 @@
+# fastapi_app/app/conversations.py
+# /v1/chat 대화 기록: SQLite에 저장하고 최근에 쓴 대화는 메모리(LRU)에 보관
+#
+# 클라이언트는 conversation_id와 이번 턴의 메시지만 보내고, 게이트웨이가 저장된 기록을 붙여
+# Ollama /api/chat으로 보냅니다. 기록이 CHAT_HISTORY_TOKEN_BUDGET을 넘으면 오래된 턴부터
+# 버리거나(trim) 요약으로 대체해(summarize) 턴마다 다시 처리하는 프롬프트 토큰을 제한합니다.
+# 요약된 메시지는 DB에만 남고 메모리에는 요약 이후의 메시지만 둡니다.
+
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+from . import config, database
+
+# 메시지 하나의 역할/구분자 토큰 추정치
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_INSTRUCTION = (
+    "You compress chat history. Summarize the conversation below in the language it is written in, "
+    "keeping facts, names, numbers, decisions and open questions the assistant will need later. "
+    "Reply with the summary only."
+)
+
+# (이전 요약, 새로 요약할 메시지) → 새 요약
+Summarizer = Callable[[Optional[str], list[dict]], Awaitable[str]]
+
+
+def estimate_tokens(text: str) -> int:
+    """토크나이저 없이 쓰는 토큰 수 추정 (글자 수 / CHAT_CHARS_PER_TOKEN)"""
+    return math.ceil(len(text) / config.CHAT_CHARS_PER_TOKEN) + MESSAGE_OVERHEAD_TOKENS
+
+
+def summary_prompt(previous: Optional[str], messages: list[dict]) -> list[dict]:
+    """요약 요청용 /api/chat 메시지 (이전 요약이 있으면 이어서 요약)"""
+    lines = []
+    if previous:
+        lines.append(f"[summary of earlier turns]\n{previous}\n")
+    lines.extend(f"{message['role']}: {message['content']}" for message in messages)
+    return [
+        {"role": "system", "content": SUMMARY_INSTRUCTION},
+        {"role": "user", "content": "\n".join(lines)},
+    ]
+
+
+class Conversation:
+    __slots__ = ("owner", "id", "model", "system", "summary", "summarized_count", "messages", "created_at", "updated_at")
+
+    def __init__(self, owner: str, conversation_id: str, row: Optional[dict] = None, messages: Optional[list[dict]] = None):
+        row = row or {}
+        self.owner = owner
+        self.id = conversation_id
+        self.model: Optional[str] = row.get("model")
+        self.system: Optional[str] = row.get("system")
+        self.summary: Optional[str] = row.get("summary")
+        self.summarized_count: int = row.get("summarized_count", 0)
+        # 요약되지 않은 메시지만 ({"role", "content", "tokens"}, 오래된 순)
+        self.messages: list[dict] = (messages or [])[self.summarized_count:]
+        self.created_at: float = row.get("created_at") or time.time()
+        self.updated_at: float = row.get("updated_at") or self.created_at
+
+    def row(self) -> dict:
+        return {
+            "owner": self.owner,
+            "id": self.id,
+            "model": self.model,
+            "system": self.system,
+            "summary": self.summary,
+            "summarized_count": self.summarized_count,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+    def info(self) -> dict:
+        return {
+            "conversation_id": self.id,
+            "model": self.model,
+            "system": self.system,
+            "summary": self.summary,
+            "message_count": self.summarized_count + len(self.messages),
+            "summarized_count": self.summarized_count,
+            "messages": [{"role": message["role"], "content": message["content"]} for message in self.messages],
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+
+class PendingTurn:
+    """build_messages가 계산한 대화 상태 변경 (업스트림 호출이 성공한 뒤 save_turn에서 반영)"""
+
+    __slots__ = ("system", "summary", "summarized", "base_count")
+
+    def __init__(self, system: Optional[str], summary: Optional[str], summarized: int, base_count: int):
+        self.system = system          # 이번 턴 이후의 시스템 프롬프트
+        self.summary = summary        # 새 요약 (summarized가 0이면 기존 요약 그대로)
+        self.summarized = summarized  # 새로 요약되어 메모리에서 뺄 앞쪽 메시지 수
+        self.base_count = base_count  # 계산 시점의 summarized_count (그 사이 다른 턴이 요약했으면 요약은 버림)
+
+
+class ConversationStore:
+    def __init__(self, max_entries: int = config.CHAT_HOT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple[str, str], Conversation] = OrderedDict()
+
+        # 메트릭
+        self.hits = 0
+        self.misses = 0
+        self.trimmed = 0
+        self.summarized = 0
+        self.summary_failures = 0
+        self.history_tokens_sent = 0
+        self.history_tokens_omitted = 0
+
+    async def get(self, owner: str, conversation_id: str, create: bool = True) -> Optional[Conversation]:
+        """대화 반환 (메모리 → DB, 둘 다 없으면 새 대화 또는 create=False면 None)"""
+        key = (owner, conversation_id)
+        conversation = self._entries.get(key)
+        if conversation is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return conversation
+        self.misses += 1
+        loaded = await asyncio.to_thread(database.load_conversation, owner, conversation_id)
+        if loaded is None and not create:
+            return None
+        # DB를 읽는 동안 같은 대화가 먼저 올라왔으면 그쪽을 사용
+        conversation = self._entries.get(key)
+        if conversation is None:
+            conversation = Conversation(owner, conversation_id, *(loaded or ()))
+            self._entries[key] = conversation
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return conversation
+
+    async def build_messages(
+        self,
+        conversation: Conversation,
+        messages: list[dict],
+        compaction: str,
+        summarize: Optional[Summarizer] = None,
+    ) -> tuple[list[dict], PendingTurn]:
+        """
+        저장된 기록 + 이번 턴 메시지로 Ollama에 보낼 messages 구성
+
+        이번 턴의 system 메시지는 대화의 시스템 프롬프트를 바꾸며(이후 턴에도 유지) 맨 앞에 들어갑니다.
+        기록은 최근 턴부터 예산 안에서 붙이고, 넘치는 앞부분은 compaction 방식에 따라 버리거나 요약합니다.
+        대화 객체는 바꾸지 않고 바뀔 상태를 PendingTurn으로 돌려주며, 답변을 받은 뒤 save_turn에 넘깁니다.
+        """
+        system = "\n\n".join(message["content"] for message in messages if message["role"] == "system")
+        system = system or conversation.system
+        summary = conversation.summary
+        turn = [message for message in messages if message["role"] != "system"]
+
+        budget = config.CHAT_HISTORY_TOKEN_BUDGET - sum(estimate_tokens(message["content"]) for message in turn)
+        if system:
+            budget -= estimate_tokens(system)
+        if compaction == "summarize":
+            budget -= config.CHAT_SUMMARY_MAX_TOKENS + MESSAGE_OVERHEAD_TOKENS
+        elif summary:
+            budget -= estimate_tokens(summary)
+
+        history = conversation.messages
+        base_count = conversation.summarized_count
+        start = len(history)
+        while start > 0 and history[start - 1]["tokens"] <= budget:
+            start -= 1
+            budget -= history[start]["tokens"]
+        # 잘린 경우 assistant 답변만 남지 않도록 user 메시지부터 시작
+        if start > 0:
+            while start < len(history) and history[start]["role"] != "user":
+                start += 1
+
+        summarized = 0
+        if start > 0:
+            dropped = history[:start]
+            omitted = sum(message["tokens"] for message in dropped)
+            if compaction == "summarize" and summarize is not None:
+                try:
+                    # 요약은 답변 전에 실행되므로 오래 걸리면 포기하고 trim처럼 보냄
+                    summary = await asyncio.wait_for(summarize(summary, dropped), config.CHAT_SUMMARY_TIMEOUT_SECONDS)
+                except Exception as e:
+                    self.summary_failures += 1
+                    print(f"대화 요약 실패 (오래된 턴은 이번 요청에서만 제외): {e!r}")
+                else:
+                    # 요약된 메시지는 save_turn에서 메모리에서 빼고 DB에만 남김 (요약과 함께 저장)
+                    summarized = start
+                    self.summarized += 1
+            else:
+                self.trimmed += 1
+            self.history_tokens_omitted += omitted
+        kept = history[start:]
+        self.history_tokens_sent += sum(message["tokens"] for message in kept)
+
+        result = []
+        if system:
+            result.append({"role": "system", "content": system})
+        if summary:
+            result.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
+        result.extend({"role": message["role"], "content": message["content"]} for message in kept)
+        result.extend(turn)
+        return result, PendingTurn(system, summary, summarized, base_count)
+
+    async def save_turn(
+        self,
+        conversation: Conversation,
+        model: str,
+        messages: list[dict],
+        reply: str,
+        reply_tokens: Optional[int],
+        pending: Optional[PendingTurn] = None,
+    ):
+        """이번 턴의 메시지와 답변, build_messages가 계산한 시스템 프롬프트/요약을 기록 (메모리 + DB)"""
+        added = [
+            {"role": message["role"], "content": message["content"], "tokens": estimate_tokens(message["content"])}
+            for message in messages if message["role"] != "system"
+        ]
+        added.append({
+            "role": "assistant",
+            "content": reply,
+            # Ollama가 센 답변 토큰 수가 있으면 그 값 사용
+            "tokens": reply_tokens + MESSAGE_OVERHEAD_TOKENS if reply_tokens else estimate_tokens(reply),
+        })
+        history = conversation.messages
+        if pending is not None:
+            conversation.system = pending.system
+            # 그 사이 다른 턴이 먼저 요약했으면 이번 요약은 버림 (이후 추가된 메시지는 뒤에 붙으므로 앞부분 기준은 유지)
+            if pending.summarized and conversation.summarized_count == pending.base_count:
+                conversation.summary = pending.summary
+                conversation.summarized_count += pending.summarized
+                history = history[pending.summarized:]
+        conversation.model = model
+        conversation.updated_at = time.time()
+        conversation.messages = history + added
+        await asyncio.to_thread(database.save_conversation_turn, conversation.row(), added)
+
+    async def delete(self, owner: str, conversation_id: str) -> bool:
+        cached = self._entries.pop((owner, conversation_id), None)
+        deleted = await asyncio.to_thread(database.delete_conversation, owner, conversation_id)
+        return deleted or cached is not None
+
+    def stats(self) -> dict:
+        return {
+            "cached": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "trimmed": self.trimmed,
+            "summarized": self.summarized,
+            "summary_failures": self.summary_failures,
+            "history_tokens_sent": self.history_tokens_sent,
+            "history_tokens_omitted": self.history_tokens_omitted,
+        }
+
+
+conversation_store = ConversationStore()
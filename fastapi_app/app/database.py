@@ -1,13 +1,52 @@
 # fastapi_app/app/database.py
 
 import sqlite3
+import threading
 from . import config
-from datetime import datetime
 
-def init_db():
-    conn = sqlite3.connect(config.DATABASE_FILE)
-    cursor = conn.cursor()
-    
+# 스레드별로 재사용하는 SQLite 연결 (sqlite3 연결은 스레드 간 공유 불가)
+_local = threading.local()
+
+def get_connection() -> sqlite3.Connection:
+    """
+    현재 스레드 전용 연결을 반환 (없으면 생성)
+
+    - WAL 모드: 읽기(manage_keys.py list, 통계 조회)가 로그 쓰기와 서로 막지 않음
+    - synchronous=NORMAL: WAL에서는 커밋마다 fsync하지 않아도 DB 손상 위험 없음
+    - cached_statements: 같은 SQL은 준비된 statement를 재사용
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.path == config.DATABASE_FILE:
+        return conn
+    if conn is not None:
+        conn.close()
+
+    conn = sqlite3.connect(config.DATABASE_FILE, timeout=config.DB_BUSY_TIMEOUT_SECONDS, cached_statements=256)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    _local.conn = conn
+    _local.path = config.DATABASE_FILE
+    return conn
+
+def close_connection():
+    """현재 스레드의 연결 종료"""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+# ==================== 스키마 마이그레이션 ====================
+# PRAGMA user_version에 마지막으로 적용한 마이그레이션 번호를 기록합니다.
+# 기존 /app/database/api_server.db 볼륨도 시작 시 순서대로 업그레이드됩니다.
+# 새 마이그레이션은 항상 목록 끝에 추가하세요.
+
+def _add_column(cursor, table: str, column: str, definition: str):
+    columns = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+def _migrate_base_tables(cursor):
     # api_keys 테이블 생성 (예약어 key → api_key 로 변경)
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS api_keys (
@@ -19,7 +58,7 @@ def init_db():
             request_count INTEGER NOT NULL DEFAULT 0
         )
     ''')
-    
+
     # logs 테이블 생성
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS logs (
@@ -31,37 +70,378 @@ def init_db():
             timestamp TEXT NOT NULL
         )
     ''')
-    conn.commit()
-    conn.close()
 
-async def validate_and_log_key(api_key: str):
-    conn = sqlite3.connect(config.DATABASE_FILE)
-    conn.row_factory = sqlite3.Row
+def _migrate_key_version(cursor):
+    # 키 캐시 무효화용 key_version 컬럼 (manage_keys.py가 먼저 추가했을 수 있음)
+    _add_column(cursor, "api_keys", "key_version", "INTEGER NOT NULL DEFAULT 0")
+
+def _migrate_log_indexes(cursor):
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_logs_owner_timestamp ON logs(api_key_owner, timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_logs_model_timestamp ON logs(model_used, timestamp)")
+
+def _migrate_log_cache_hit(cursor):
+    # 응답 캐시에서 응답한 요청 표시
+    _add_column(cursor, "logs", "cache_hit", "BOOLEAN NOT NULL DEFAULT 0")
+
+def _migrate_usage_daily(cursor):
+    # 키/모델/일자별 토큰 수와 GPU 시간 집계 (app/usage.py가 주기적으로 누적)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS usage_daily (
+            api_key_id INTEGER NOT NULL,
+            owner TEXT NOT NULL,
+            model TEXT NOT NULL,
+            day TEXT NOT NULL,
+            requests INTEGER NOT NULL DEFAULT 0,
+            prompt_tokens INTEGER NOT NULL DEFAULT 0,
+            completion_tokens INTEGER NOT NULL DEFAULT 0,
+            prompt_eval_ms REAL NOT NULL DEFAULT 0,
+            eval_ms REAL NOT NULL DEFAULT 0,
+            load_ms REAL NOT NULL DEFAULT 0,
+            gpu_ms REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (api_key_id, model, day)
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_usage_daily_day ON usage_daily(day)")
+
+def _migrate_rate_limits(cursor):
+    # 키별 요청 한도/쿼터 (NULL = 제한 없음, manage_keys.py limits로 수정)
+    _add_column(cursor, "api_keys", "rate_limit_rps", "REAL")
+    _add_column(cursor, "api_keys", "rate_limit_burst", "INTEGER")
+    _add_column(cursor, "api_keys", "max_concurrent", "INTEGER")
+    _add_column(cursor, "api_keys", "quota_tokens", "INTEGER")
+    _add_column(cursor, "api_keys", "quota_gpu_seconds", "REAL")
+    _add_column(cursor, "api_keys", "quota_window_hours", "REAL")
+    # app/rate_limit.py의 메모리 상태 체크포인트 (재시작 후에도 쿼터 유지)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS rate_limit_state (
+            api_key_id INTEGER PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            usage TEXT NOT NULL
+        )
+    ''')
+
+def _migrate_priority_class(cursor):
+    # 키별 최고 우선순위 클래스 (NULL = 제한 없음, config.PRIORITY_CLASSES 중 하나)
+    _add_column(cursor, "api_keys", "priority_class", "TEXT")
+
+def _migrate_jobs(cursor):
+    # 비동기 작업 (/v1/jobs). request/result는 JSON, 시각은 epoch 초
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            api_key_id INTEGER NOT NULL,
+            owner TEXT NOT NULL,
+            type TEXT NOT NULL,
+            model TEXT,
+            request TEXT NOT NULL,
+            priority TEXT NOT NULL,
+            priority_rank INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            result TEXT,
+            error TEXT,
+            callback_url TEXT,
+            callback_state TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            run_after REAL NOT NULL DEFAULT 0,
+            started_at REAL,
+            finished_at REAL,
+            expires_at REAL
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs(status, priority_rank, created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_api_key ON jobs(api_key_id, status)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_expires_at ON jobs(expires_at)")
+
+def _migrate_conversations(cursor):
+    # /v1/chat 대화 기록. summary는 앞쪽 summarized_count개 메시지를 요약한 텍스트
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS conversations (
+            owner TEXT NOT NULL,
+            id TEXT NOT NULL,
+            model TEXT,
+            system TEXT,
+            summary TEXT,
+            summarized_count INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (owner, id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS conversation_messages (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            owner TEXT NOT NULL,
+            conversation_id TEXT NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            tokens INTEGER NOT NULL,
+            created_at REAL NOT NULL
+        )
+    ''')
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_conversation_messages ON conversation_messages(owner, conversation_id, seq)"
+    )
+
+MIGRATIONS = [
+    _migrate_base_tables,
+    _migrate_key_version,
+    _migrate_log_indexes,
+    _migrate_log_cache_hit,
+    _migrate_usage_daily,
+    _migrate_rate_limits,
+    _migrate_priority_class,
+    _migrate_jobs,
+    _migrate_conversations,
+]
+
+def init_db():
+    conn = get_connection()
     cursor = conn.cursor()
-    
-    cursor.execute("SELECT * FROM api_keys WHERE api_key = ? AND is_active = 1", (api_key,))
+    current = cursor.execute("PRAGMA user_version").fetchone()[0]
+    for version, migration in enumerate(MIGRATIONS[current:], start=current + 1):
+        with conn:
+            migration(cursor)
+            cursor.execute(f"PRAGMA user_version = {version}")
+        print(f"DB 마이그레이션 적용: v{version} ({migration.__name__})")
+
+# ==================== API 키 ====================
+
+def fetch_active_key(api_key: str):
+    """활성 상태인 API 키 정보를 조회 (없으면 None)"""
+    cursor = get_connection().execute("SELECT * FROM api_keys WHERE api_key = ? AND is_active = 1", (api_key,))
     key_data = cursor.fetchone()
-    
-    if not key_data:
-        conn.close()
+    return dict(key_data) if key_data else None
+
+def fetch_key_by_id(key_id: int):
+    """활성 상태인 API 키 정보를 id로 조회 (비동기 작업 실행 시, 없으면 None)"""
+    cursor = get_connection().execute("SELECT * FROM api_keys WHERE id = ? AND is_active = 1", (key_id,))
+    key_data = cursor.fetchone()
+    return dict(key_data) if key_data else None
+
+def get_key_version():
+    """api_keys 테이블의 최신 key_version (manage_keys.py가 키를 변경할 때마다 증가)"""
+    cursor = get_connection().execute("SELECT COALESCE(MAX(key_version), 0) FROM api_keys")
+    return cursor.fetchone()[0]
+
+def add_request_counts(counts: dict[int, int]):
+    """키 id별로 누적된 request_count 증가분을 한 트랜잭션으로 반영"""
+    if not counts:
+        return
+    conn = get_connection()
+    with conn:
+        conn.executemany(
+            "UPDATE api_keys SET request_count = request_count + ? WHERE id = ?",
+            [(count, key_id) for key_id, count in counts.items()]
+        )
+
+# ==================== 요청 로그 ====================
+
+def insert_api_logs(rows: list[tuple]):
+    """
+    로그 여러 건을 한 트랜잭션으로 기록
+    rows: (api_key_owner, model_used, prompt, response, cache_hit, timestamp) 튜플 목록
+    """
+    if not rows:
+        return
+    conn = get_connection()
+    with conn:
+        conn.executemany(
+            "INSERT INTO logs (api_key_owner, model_used, prompt, response, cache_hit, timestamp) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            rows
+        )
+
+# ==================== 사용량 집계 ====================
+
+USAGE_COLUMNS = ("requests", "prompt_tokens", "completion_tokens", "prompt_eval_ms", "eval_ms", "load_ms", "gpu_ms")
+
+def add_usage(rows: list[tuple]):
+    """
+    사용량 증가분을 한 트랜잭션으로 누적
+    rows: (api_key_id, owner, model, day, *USAGE_COLUMNS 값) 튜플 목록
+    """
+    if not rows:
+        return
+    updates = ", ".join(f"{column} = {column} + excluded.{column}" for column in USAGE_COLUMNS)
+    conn = get_connection()
+    with conn:
+        conn.executemany(
+            f"INSERT INTO usage_daily (api_key_id, owner, model, day, {', '.join(USAGE_COLUMNS)}) "
+            f"VALUES ({', '.join('?' * (4 + len(USAGE_COLUMNS)))}) "
+            f"ON CONFLICT (api_key_id, model, day) DO UPDATE SET {updates}",
+            rows
+        )
+
+def get_usage(since_day: str, owner: str = None):
+    """since_day(YYYY-MM-DD) 이후 소유자/모델별 사용량 합계"""
+    sums = ", ".join(f"SUM({column}) AS {column}" for column in USAGE_COLUMNS)
+    sql = f"SELECT owner, model, {sums} FROM usage_daily WHERE day >= ?"
+    params = [since_day]
+    if owner:
+        sql += " AND owner = ?"
+        params.append(owner)
+    sql += " GROUP BY owner, model ORDER BY gpu_ms DESC"
+    return [dict(row) for row in get_connection().execute(sql, params)]
+
+# ==================== 요청 한도 상태 ====================
+
+def load_rate_limit_state():
+    """(api_key_id, tokens, updated_at, usage JSON) 목록"""
+    return [tuple(row) for row in get_connection().execute(
+        "SELECT api_key_id, tokens, updated_at, usage FROM rate_limit_state"
+    )]
+
+def save_rate_limit_state(rows: list[tuple]):
+    if not rows:
+        return
+    conn = get_connection()
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO rate_limit_state (api_key_id, tokens, updated_at, usage) VALUES (?, ?, ?, ?)",
+            rows
+        )
+
+# ==================== 비동기 작업 ====================
+
+JOB_COLUMNS = (
+    "id", "api_key_id", "owner", "type", "model", "request", "priority", "priority_rank",
+    "status", "callback_url", "callback_state", "created_at"
+)
+
+def insert_job(job: dict):
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            f"INSERT INTO jobs ({', '.join(JOB_COLUMNS)}) VALUES ({', '.join('?' * len(JOB_COLUMNS))})",
+            [job[column] for column in JOB_COLUMNS]
+        )
+
+def get_job(job_id: str):
+    row = get_connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return dict(row) if row else None
+
+def count_unfinished_jobs(api_key_id: int) -> int:
+    return get_connection().execute(
+        "SELECT COUNT(*) FROM jobs WHERE api_key_id = ? AND status IN ('queued', 'running')", (api_key_id,)
+    ).fetchone()[0]
+
+def claim_next_job(now: float):
+    """실행할 작업 하나를 running으로 바꾸고 반환 (우선순위 → 제출 순, 없으면 None)"""
+    conn = get_connection()
+    with conn:
+        row = conn.execute(
+            "SELECT * FROM jobs WHERE status = 'queued' AND run_after <= ? ORDER BY priority_rank, created_at LIMIT 1",
+            (now,)
+        ).fetchone()
+        if row is None:
+            return None
+        cursor = conn.execute(
+            "UPDATE jobs SET status = 'running', started_at = ?, attempts = attempts + 1 WHERE id = ? AND status = 'queued'",
+            (now, row["id"])
+        )
+    if cursor.rowcount == 0:
         return None
-    
-    cursor.execute("UPDATE api_keys SET request_count = request_count + 1 WHERE id = ?", (key_data['id'],))
-    conn.commit()
-    conn.close()
-    return dict(key_data)
-
-async def add_api_log(owner: str, model: str, prompt: str, response: str):
-    conn = sqlite3.connect(config.DATABASE_FILE)
-    cursor = conn.cursor()
-    timestamp = datetime.now().isoformat()
-    try:
-        cursor.execute(
-            "INSERT INTO logs (api_key_owner, model_used, prompt, response, timestamp) VALUES (?, ?, ?, ?, ?)",
-            (owner, model, prompt, response, timestamp)
-        )
-        conn.commit()
-    except Exception as e:
-        print(f"DB 로그 기록 실패: {e}")
-    finally:
-        conn.close()
+    return {**dict(row), "status": "running", "started_at": now, "attempts": row["attempts"] + 1}
+
+def requeue_job(job_id: str, run_after: float):
+    """실행 중인 작업을 다시 대기 상태로 (백엔드 혼잡, 게이트웨이 종료)"""
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            "UPDATE jobs SET status = 'queued', run_after = ?, started_at = NULL WHERE id = ? AND status = 'running'",
+            (run_after, job_id)
+        )
+
+def requeue_running_jobs() -> int:
+    """시작 시 호출: 이전 프로세스에서 실행 중이던 작업을 다시 대기 상태로"""
+    conn = get_connection()
+    with conn:
+        cursor = conn.execute("UPDATE jobs SET status = 'queued', started_at = NULL WHERE status = 'running'")
+    return cursor.rowcount
+
+def finish_job(job_id: str, status: str, result, error, finished_at: float, expires_at: float) -> bool:
+    """실행 결과 기록 (그사이 취소된 작업은 그대로 둠)"""
+    conn = get_connection()
+    with conn:
+        cursor = conn.execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, expires_at = ? "
+            "WHERE id = ? AND status = 'running'",
+            (status, result, error, finished_at, expires_at, job_id)
+        )
+    return cursor.rowcount > 0
+
+def cancel_job(job_id: str, finished_at: float, expires_at: float) -> bool:
+    conn = get_connection()
+    with conn:
+        cursor = conn.execute(
+            "UPDATE jobs SET status = 'cancelled', finished_at = ?, expires_at = ? "
+            "WHERE id = ? AND status IN ('queued', 'running')",
+            (finished_at, expires_at, job_id)
+        )
+    return cursor.rowcount > 0
+
+def set_job_callback_state(job_id: str, state: str):
+    conn = get_connection()
+    with conn:
+        conn.execute("UPDATE jobs SET callback_state = ? WHERE id = ?", (state, job_id))
+
+def pending_callback_jobs():
+    """끝났지만 콜백을 아직 보내지 못한 작업 (재시작 후 재전송)"""
+    return [dict(row) for row in get_connection().execute(
+        "SELECT * FROM jobs WHERE callback_state = 'pending' AND status IN ('succeeded', 'failed', 'cancelled')"
+    )]
+
+def delete_expired_jobs(now: float) -> int:
+    conn = get_connection()
+    with conn:
+        cursor = conn.execute("DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+    return cursor.rowcount
+
+# ==================== 대화 기록 (/v1/chat) ====================
+
+def load_conversation(owner: str, conversation_id: str):
+    """대화와 메시지 목록(오래된 순) 조회 (없으면 None)"""
+    conn = get_connection()
+    row = conn.execute(
+        "SELECT * FROM conversations WHERE owner = ? AND id = ?", (owner, conversation_id)
+    ).fetchone()
+    if row is None:
+        return None
+    messages = [dict(message) for message in conn.execute(
+        "SELECT role, content, tokens FROM conversation_messages "
+        "WHERE owner = ? AND conversation_id = ? ORDER BY seq",
+        (owner, conversation_id)
+    )]
+    return dict(row), messages
+
+def save_conversation_turn(conversation: dict, messages: list[dict]):
+    """대화 상태(시스템 프롬프트, 요약) 갱신 + 이번 턴 메시지 추가를 한 트랜잭션으로"""
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            "INSERT INTO conversations (owner, id, model, system, summary, summarized_count, created_at, updated_at) "
+            "VALUES (:owner, :id, :model, :system, :summary, :summarized_count, :created_at, :updated_at) "
+            "ON CONFLICT(owner, id) DO UPDATE SET model = excluded.model, system = excluded.system, "
+            "summary = excluded.summary, summarized_count = excluded.summarized_count, updated_at = excluded.updated_at",
+            conversation
+        )
+        conn.executemany(
+            "INSERT INTO conversation_messages (owner, conversation_id, role, content, tokens, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (conversation["owner"], conversation["id"], message["role"], message["content"],
+                 message["tokens"], conversation["updated_at"])
+                for message in messages
+            ]
+        )
+
+def delete_conversation(owner: str, conversation_id: str) -> bool:
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            "DELETE FROM conversation_messages WHERE owner = ? AND conversation_id = ?", (owner, conversation_id)
+        )
+        cursor = conn.execute("DELETE FROM conversations WHERE owner = ? AND id = ?", (owner, conversation_id))
+    return cursor.rowcount > 0
@@ -0,0 +1,165 @@
+# fastapi_app/app/embeddings.py
+# /v1/embeddings: 텍스트 중복 제거 → 내용 해시 캐시 → 나머지만 Ollama /api/embed로 묶어서 전송
+#
+# 벡터는 little-endian float32 바이트로 보관합니다 (JSON float 목록보다 4~5배 작고,
+# format=float32/base64 응답은 변환 없이 그대로 이어 붙여 보냄).
+# 같은 텍스트를 동시에 요청하면 진행 중인 배치의 결과를 함께 받습니다.
+
+import asyncio
+import hashlib
+import sys
+from array import array
+from collections import OrderedDict
+from typing import Awaitable, Callable
+from . import config
+
+# 캐시 항목 하나의 고정 오버헤드 추정치 (키, bytes 객체, dict 항목)
+ENTRY_OVERHEAD_BYTES = 128
+
+# 텍스트 목록 → 같은 순서의 벡터 목록 (Ollama /api/embed 호출 한 번)
+EmbedBatch = Callable[[list[str]], Awaitable[list[list[float]]]]
+
+
+def make_key(model: str, text: str, truncate: bool) -> bytes:
+    digest = hashlib.sha256()
+    digest.update(f"{model}\0{int(truncate)}\0".encode("utf-8"))
+    digest.update(text.encode("utf-8"))
+    return digest.digest()
+
+
+def pack(vector: list[float]) -> bytes:
+    """float 목록 → little-endian float32 바이트"""
+    packed = array("f", vector)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def unpack(data: bytes) -> list[float]:
+    unpacked = array("f")
+    unpacked.frombytes(data)
+    if sys.byteorder == "big":
+        unpacked.byteswap()
+    return unpacked.tolist()
+
+
+class EmbeddingService:
+    def __init__(self, max_bytes: int = config.EMBEDDINGS_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[bytes, bytes] = OrderedDict()
+        self._bytes = 0
+        self._pending: dict[bytes, asyncio.Future] = {}
+        self._batches: set[asyncio.Task] = set()
+
+        # 메트릭
+        self.requested = 0
+        self.duplicates = 0
+        self.hits = 0
+        self.shared = 0
+        self.misses = 0
+        self.batches = 0
+        self.evictions = 0
+
+    async def embed(self, model: str, texts: list[str], truncate: bool, fetch: EmbedBatch) -> tuple[list[bytes], int]:
+        """
+        texts 순서대로 벡터(float32 바이트) 반환, (벡터 목록, 캐시에서 가져온 고유 텍스트 수)
+
+        캐시에 없는 텍스트만 EMBEDDINGS_BATCH_SIZE개씩 나눠 fetch로 보내며, 배치들은 동시에 실행되고
+        실제 동시 실행 수는 백엔드 스케줄러가 제한합니다.
+        """
+        keys = [make_key(model, text, truncate) for text in texts]
+        unique = dict(zip(keys, texts))
+        self.requested += len(texts)
+        self.duplicates += len(texts) - len(unique)
+
+        vectors: dict[bytes, bytes] = {}
+        waiting: dict[bytes, asyncio.Future] = {}
+        missing: list[tuple[bytes, str]] = []
+        for key, text in unique.items():
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                vectors[key] = vector
+            elif key in self._pending:
+                waiting[key] = self._pending[key]
+                self.shared += 1
+            else:
+                missing.append((key, text))
+                self.misses += 1
+
+        size = config.EMBEDDINGS_BATCH_SIZE
+        for start in range(0, len(missing), size):
+            batch = missing[start:start + size]
+            futures = []
+            for key, _ in batch:
+                future = self._pending[key] = asyncio.get_running_loop().create_future()
+                # 대기자가 모두 떠난 뒤 실패한 경우 "exception was never retrieved" 경고 방지
+                future.add_done_callback(lambda f: f.cancelled() or f.exception())
+                waiting[key] = future
+                futures.append(future)
+            # 요청이 취소되어도 배치는 끝까지 실행해 캐시와 다른 대기자에게 결과를 남김
+            task = asyncio.create_task(self._run_batch(batch, futures, fetch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+        cached = len(vectors)
+        self.hits += cached
+        for key, future in waiting.items():
+            vectors[key] = await asyncio.shield(future)
+        return [vectors[key] for key in keys], cached
+
+    async def _run_batch(self, batch: list[tuple[bytes, str]], futures: list[asyncio.Future], fetch: EmbedBatch):
+        self.batches += 1
+        try:
+            embeddings = await fetch([text for _, text in batch])
+            if len(embeddings) != len(batch):
+                raise ValueError(f"Ollama returned {len(embeddings)} embeddings for {len(batch)} inputs")
+        except asyncio.CancelledError:
+            for future in futures:
+                future.cancel()
+            raise
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            for key, _ in batch:
+                self._pending.pop(key, None)
+        for (key, _), future, embedding in zip(batch, futures, embeddings):
+            vector = pack(embedding)
+            self._remember(key, vector)
+            if not future.done():
+                future.set_result(vector)
+
+    def _remember(self, key: bytes, vector: bytes):
+        size = len(vector) + ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old) + ENTRY_OVERHEAD_BYTES
+        self._entries[key] = vector
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted) + ENTRY_OVERHEAD_BYTES
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "in_progress": len(self._pending),
+            "requested": self.requested,
+            "duplicates": self.duplicates,
+            "hits": self.hits,
+            "shared": self.shared,
+            "misses": self.misses,
+            "batches": self.batches,
+            "evictions": self.evictions,
+        }
+
+
+embedding_service = EmbeddingService()
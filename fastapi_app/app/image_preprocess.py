@@ -0,0 +1,161 @@
+# fastapi_app/app/image_preprocess.py
+# OCR 이미지 전처리 (EXIF 회전, 축소, 흑백 변환, 재인코딩, perceptual hash)
+#
+# Qwen2.5-VL의 비전 인코더 비용은 픽셀 수에 비례하므로 1200만 화소 휴대폰 사진을
+# 그대로 보내는 대신 max_pixels 이하로 줄여서 보냅니다.
+# Pillow 디코딩/리사이즈는 CPU를 많이 쓰므로 ProcessPoolExecutor에서 실행해
+# 이벤트 루프와 GIL을 막지 않습니다.
+
+import asyncio
+import base64
+import hashlib
+import io
+import math
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Union
+from PIL import Image, ImageOps
+from . import config
+from .ocr_input import Base64Image
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def difference_hash(image: Image.Image, hash_size: int = 16) -> str:
+    """dHash: 인접 픽셀 밝기 차이로 만든 perceptual hash (hash_size² 비트, hex)"""
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR)
+    pixels = small.tobytes()
+    bits = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return f"{bits:0{hash_size * hash_size // 4}x}"
+
+
+def preprocess_image(
+    data: Union[bytes, str],
+    max_pixels: int,
+    grayscale: bool,
+    image_format: str,
+    jpeg_quality: int = 90,
+) -> dict:
+    """
+    워커 프로세스에서 실행되는 전처리 함수
+
+    data: 원본 이미지 바이트 또는 base64 문자열 (디코딩도 워커에서 처리)
+    반환값의 image_base64는 Ollama에 그대로 보낼 수 있는 base64 문자열입니다.
+    """
+    start = time.perf_counter()
+    if isinstance(data, str):
+        data = base64.b64decode(data)
+
+    image = Image.open(io.BytesIO(data))
+    original_size = image.size
+    if image.format == "JPEG" and original_size[0] * original_size[1] > max_pixels:
+        # JPEG는 디코딩 단계에서 1/2, 1/4, 1/8로 줄여 읽을 수 있어 훨씬 빠름
+        scale = math.sqrt(max_pixels / (original_size[0] * original_size[1]))
+        image.draft("L" if grayscale else "RGB", (int(original_size[0] * scale), int(original_size[1] * scale)))
+    image = ImageOps.exif_transpose(image)
+    return encode_image(image, original_size, max_pixels, grayscale, image_format, jpeg_quality, start)
+
+
+def encode_image(
+    image: Image.Image,
+    original_size: tuple[int, int],
+    max_pixels: int,
+    grayscale: bool,
+    image_format: str,
+    jpeg_quality: int,
+    start: float,
+) -> dict:
+    """디코딩된 이미지를 축소/변환/재인코딩 (preprocess_image와 문서 페이지 렌더링 공통)"""
+    width, height = image.size
+    if width * height > max_pixels:
+        scale = math.sqrt(max_pixels / (width * height))
+        image = image.resize((max(1, int(width * scale)), max(1, int(height * scale))), Image.Resampling.LANCZOS)
+
+    if grayscale:
+        image = image.convert("L")
+    elif image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    output = io.BytesIO()
+    if image_format == "png":
+        image.save(output, format="PNG", optimize=False)
+    else:
+        image.save(output, format="JPEG", quality=jpeg_quality)
+    encoded = output.getvalue()
+
+    return {
+        "image_base64": base64.b64encode(encoded).decode("ascii"),
+        "sha256": hashlib.sha256(encoded).hexdigest(),
+        "phash": difference_hash(image),
+        "original_size": original_size,
+        "size": image.size,
+        "bytes": len(encoded),
+        "worker_ms": (time.perf_counter() - start) * 1000,
+    }
+
+
+class PreprocessedImage(Base64Image):
+    """
+    전처리된 이미지
+
+    dedupe=True이면 perceptual hash를 캐시 키로 사용해 재압축/재촬영 등으로
+    바이트가 조금 다른 같은 페이지도 캐시를 공유합니다. (기본은 정확히 같은 이미지만)
+    """
+
+    def __init__(self, result: dict, options_key: str, dedupe: bool):
+        super().__init__(result["image_base64"])
+        self.result = result
+        self.options_key = options_key
+        self.dedupe = dedupe
+
+    async def digest(self) -> str:
+        if self.dedupe:
+            return f"phash:{self.result['phash']}:{self.options_key}"
+        return f"sha256:{self.result['sha256']}"
+
+
+def start():
+    global _pool
+    if _pool is None:
+        # 스레드가 있는 프로세스를 fork하지 않도록 spawn 사용
+        _pool = ProcessPoolExecutor(
+            max_workers=config.PREPROCESS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def run_in_pool(fn, *args):
+    """전처리 프로세스 풀에서 fn 실행 (풀이 없으면 생성)"""
+    start()
+    return await asyncio.get_running_loop().run_in_executor(_pool, fn, *args)
+
+
+async def preprocess(
+    image,
+    max_pixels: Optional[int] = None,
+    grayscale: bool = False,
+    image_format: str = "jpeg",
+    dedupe: bool = False,
+) -> tuple[PreprocessedImage, float]:
+    """
+    ocr_input의 이미지 소스를 전처리해 (PreprocessedImage, 소요 시간 ms) 반환
+    소요 시간은 프로세스 풀 대기 시간을 포함한 전체 시간입니다.
+    """
+    started = time.perf_counter()
+    max_pixels = max_pixels or config.PREPROCESS_DEFAULT_MAX_PIXELS
+    data = await image.raw()
+    result = await run_in_pool(preprocess_image, data, max_pixels, grayscale, image_format, config.PREPROCESS_JPEG_QUALITY)
+    options_key = f"{max_pixels}:{int(grayscale)}:{image_format}"
+    return PreprocessedImage(result, options_key, dedupe), (time.perf_counter() - started) * 1000
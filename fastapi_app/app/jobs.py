@@ -0,0 +1,370 @@
+# fastapi_app/app/jobs.py
+# 비동기 작업(job) 큐: 오래 걸리는 생성/OCR 요청을 접수만 하고 결과는 폴링/롱폴링/콜백으로 전달
+#
+# 작업은 SQLite jobs 테이블에 저장되어 재시작 후에도 유지되고, 프로세스 안의 워커들이 꺼내 실행합니다.
+# 워커는 일반 요청과 같은 ReplicaRouter/BackendScheduler를 거치므로 GPU 동시 실행 한도와
+# 우선순위 대기열을 공유합니다. 작업 종류별 실행 함수는 main.py가 register()로 등록합니다.
+
+import asyncio
+import ipaddress
+import json
+import socket
+import time
+import uuid
+from typing import Awaitable, Callable, Optional
+from urllib.parse import urlsplit
+import httpx
+from . import config, database, metrics
+from .rate_limit import RateLimitExceeded, rate_limiter
+from .scheduler import Priority, QueueFullError
+
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+
+# 작업 종류별 실행 함수: (요청 본문, 우선순위가 들어간 key_info) → 결과 dict
+JobHandler = Callable[[dict, dict], Awaitable[dict]]
+
+
+class JobFailed(Exception):
+    """실행 함수가 작업을 실패로 끝낼 때 사용 (result는 실패한 경우에도 저장)"""
+
+    def __init__(self, error: str, result: Optional[dict] = None):
+        super().__init__(error)
+        self.error = error
+        self.result = result
+
+
+def check_callback_url(url: str):
+    """
+    콜백 URL 검증 (http/https, JOBS_CALLBACK_ALLOWED_HOSTS, 내부 IP 리터럴). 문제가 있으면 ValueError
+
+    호스트 이름이 가리키는 주소는 전송 시점에 check_callback_address()로 다시 확인합니다.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError("callback_url must be an absolute http(s) URL")
+    allowed = config.JOBS_CALLBACK_ALLOWED_HOSTS
+    if allowed is not None:
+        if parts.hostname not in allowed:
+            raise ValueError(f"callback_url host '{parts.hostname}' is not allowed")
+        return
+    try:
+        address = ipaddress.ip_address(parts.hostname)
+    except ValueError:
+        return
+    if _is_internal(address):
+        raise ValueError(f"callback_url address '{parts.hostname}' is not public")
+
+
+async def check_callback_address(url: str):
+    """
+    전송 직전에 콜백 호스트를 DNS로 확인해 루프백/사설/링크 로컬/예약 주소로 향하면 ValueError (SSRF 방지)
+
+    JOBS_CALLBACK_ALLOWED_HOSTS에 명시한 호스트는 내부 주소여도 허용합니다.
+    """
+    check_callback_url(url)
+    parts = urlsplit(url)
+    if config.JOBS_CALLBACK_ALLOWED_HOSTS is not None:
+        return
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    for address in await resolve_host(parts.hostname, port):
+        if _is_internal(ipaddress.ip_address(address.split("%", 1)[0])):
+            raise ValueError(f"callback_url host '{parts.hostname}' resolves to non-public address {address}")
+
+
+async def resolve_host(host: str, port: int) -> list[str]:
+    infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    return [info[4][0] for info in infos]
+
+
+def _is_internal(address) -> bool:
+    if address.version == 6 and address.ipv4_mapped:
+        address = address.ipv4_mapped
+    # is_global이 아니면 사설, 루프백, 링크 로컬, 예약, 미지정(0.0.0.0), CGNAT 대역 등
+    return not address.is_global or address.is_multicast
+
+
+def job_view(job: dict) -> dict:
+    """API 응답용 작업 표현 (요청 본문은 제외)"""
+    view = {
+        "id": job["id"],
+        "type": job["type"],
+        "model": job["model"],
+        "status": job["status"],
+        "priority": job["priority"],
+        "attempts": job["attempts"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "expires_at": job["expires_at"],
+        "result": json.loads(job["result"]) if job["result"] else None,
+        "error": job["error"],
+    }
+    if job["callback_url"]:
+        view["callback"] = {"url": job["callback_url"], "state": job["callback_state"]}
+    return view
+
+
+class JobManager:
+    def __init__(self):
+        self._handlers: dict[str, JobHandler] = {}
+        self._workers: list[asyncio.Task] = []
+        self._reaper: Optional[asyncio.Task] = None
+        self._running: dict[str, asyncio.Task] = {}    # 작업 id → 실행 중인 태스크 (취소용)
+        self._finished: dict[str, asyncio.Event] = {}  # 작업 id → 롱폴링 대기자 깨우기
+        self._callbacks: set[asyncio.Task] = set()
+        self._wakeup: Optional[asyncio.Event] = None  # 제출 시 쉬고 있는 워커 깨우기 (start()에서 생성)
+        self._http: Optional[httpx.AsyncClient] = None
+        self._stopping = False
+
+        # 메트릭
+        self.submitted = 0
+        self.requeued = 0
+        self.callbacks_delivered = 0
+        self.callbacks_failed = 0
+
+    def register(self, job_type: str, handler: JobHandler):
+        self._handlers[job_type] = handler
+
+    @property
+    def job_types(self) -> list[str]:
+        return sorted(self._handlers)
+
+    # ---------- 제출 / 조회 / 취소 ----------
+
+    async def submit(
+        self,
+        key_info: dict,
+        job_type: str,
+        request: dict,
+        model: Optional[str],
+        priority: Priority,
+        callback_url: Optional[str] = None,
+    ) -> dict:
+        pending = await asyncio.to_thread(database.count_unfinished_jobs, key_info["id"])
+        if pending >= config.JOBS_MAX_PENDING_PER_KEY:
+            raise RateLimitExceeded(
+                f"대기 중인 작업 한도({config.JOBS_MAX_PENDING_PER_KEY}개)를 초과했습니다",
+                config.SCHEDULER_DEFAULT_RETRY_AFTER_SECONDS
+            )
+        job = {
+            "id": uuid.uuid4().hex,
+            "api_key_id": key_info["id"],
+            "owner": key_info.get("owner", "unknown"),
+            "type": job_type,
+            "model": model,
+            "request": json.dumps(request, ensure_ascii=False),
+            "priority": priority.name,
+            "priority_rank": priority.rank,
+            "status": "queued",
+            "callback_url": callback_url,
+            "callback_state": "pending" if callback_url else None,
+            "created_at": time.time(),
+        }
+        await asyncio.to_thread(database.insert_job, job)
+        self.submitted += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return await self.get(job["id"])
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await asyncio.to_thread(database.get_job, job_id)
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[dict]:
+        """롱폴링: 작업이 끝나거나 timeout이 지날 때까지 대기 후 현재 상태 반환"""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = await self.get(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job["status"] in FINISHED_STATUSES or remaining <= 0:
+                return job
+            event = self._finished.setdefault(job_id, asyncio.Event())
+            try:
+                # 다른 프로세스가 바꾼 상태도 반영되도록 주기적으로 DB를 다시 확인
+                await asyncio.wait_for(event.wait(), min(remaining, config.JOBS_POLL_INTERVAL_SECONDS))
+            except asyncio.TimeoutError:
+                pass
+
+    async def cancel(self, job_id: str) -> bool:
+        """대기/실행 중인 작업 취소 (이미 끝난 작업이면 False)"""
+        now = time.time()
+        cancelled = await asyncio.to_thread(
+            database.cancel_job, job_id, now, now + config.JOBS_RESULT_TTL_SECONDS
+        )
+        if not cancelled:
+            return False
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+        job = await self.get(job_id)
+        self._finish_notify(job)
+        return True
+
+    # ---------- 워커 ----------
+
+    async def start(self):
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        requeued = await asyncio.to_thread(database.requeue_running_jobs)
+        if requeued:
+            print(f"중단된 작업 {requeued}개를 다시 대기열에 넣었습니다")
+        self._http = httpx.AsyncClient(timeout=config.JOBS_CALLBACK_TIMEOUT_SECONDS)
+        for job in await asyncio.to_thread(database.pending_callback_jobs):
+            self._send_callback(job)
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(config.JOBS_WORKERS)]
+        if self._reaper is None:
+            self._reaper = asyncio.create_task(self._reap_loop())
+
+    async def stop(self):
+        # 실행 중이던 작업은 대기 상태로 되돌려 다음 시작 때 다시 실행
+        self._stopping = True
+        tasks = self._workers + ([self._reaper] if self._reaper else []) + list(self._callbacks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._reaper = None
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def _worker(self):
+        while True:
+            self._wakeup.clear()
+            job = await asyncio.to_thread(database.claim_next_job, time.time())
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), config.JOBS_POLL_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._execute(job)
+
+    async def _execute(self, job: dict):
+        task = asyncio.create_task(self._run(job))
+        self._running[job["id"]] = task
+        try:
+            await asyncio.wait({task})
+        except asyncio.CancelledError:
+            # 게이트웨이 종료: 작업을 취소하고 다시 대기 상태로
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await asyncio.shield(asyncio.to_thread(database.requeue_job, job["id"], 0.0))
+            raise
+        finally:
+            self._running.pop(job["id"], None)
+
+        if task.cancelled():
+            # 사용자가 취소함 (상태는 cancel()에서 이미 기록)
+            return
+        error = task.exception()
+        if isinstance(error, (QueueFullError, RateLimitExceeded)):
+            # 백엔드 대기열이 가득 찼거나 키의 요청 한도/쿼터 초과: Retry-After 뒤에 다시 시도
+            self.requeued += 1
+            await asyncio.to_thread(database.requeue_job, job["id"], time.time() + error.retry_after)
+            return
+
+        status, result, message = "succeeded", task.result() if error is None else None, None
+        if isinstance(error, JobFailed):
+            status, result, message = "failed", error.result, error.error
+        elif error is not None:
+            status, message = "failed", getattr(error, "detail", None) or str(error) or type(error).__name__
+        now = time.time()
+        finished = await asyncio.to_thread(
+            database.finish_job, job["id"], status,
+            json.dumps(result, ensure_ascii=False) if result is not None else None,
+            str(message) if message is not None else None,
+            now, now + config.JOBS_RESULT_TTL_SECONDS
+        )
+        if finished:
+            metrics.JOBS_FINISHED.inc(job["type"], status)
+            self._finish_notify(await self.get(job["id"]))
+
+    async def _run(self, job: dict) -> dict:
+        key_info = await asyncio.to_thread(database.fetch_key_by_id, job["api_key_id"])
+        if key_info is None:
+            raise JobFailed("API key was revoked before the job ran")
+        handler = self._handlers.get(job["type"])
+        if handler is None:
+            raise JobFailed(f"Unknown job type: {job['type']}")
+        # 일반 요청과 같은 키별 요청 한도/동시 실행 슬롯/쿼터 적용 (초과하면 RateLimitExceeded → 다시 대기)
+        lease = rate_limiter.admit(key_info)
+        try:
+            # 비동기 작업은 대기열 최대 대기 시간 없이 실행 (혼잡하면 다시 대기)
+            api_key = {**key_info, "priority": Priority(job["priority"])}
+            return await handler(json.loads(job["request"]), api_key)
+        finally:
+            lease.release()
+
+    def _finish_notify(self, job: Optional[dict]):
+        if job is None:
+            return
+        event = self._finished.pop(job["id"], None)
+        if event is not None:
+            event.set()
+        if job["callback_state"] == "pending":
+            self._send_callback(job)
+
+    # ---------- 콜백 ----------
+
+    def _send_callback(self, job: dict):
+        if self._http is None or self._stopping:
+            return
+        task = asyncio.create_task(self._deliver_callback(job))
+        self._callbacks.add(task)
+        task.add_done_callback(self._callbacks.discard)
+
+    async def _deliver_callback(self, job: dict):
+        """완료된 작업을 callback_url로 POST (실패하면 지수 백오프로 재시도)"""
+        last_error = None
+        for attempt in range(config.JOBS_CALLBACK_MAX_ATTEMPTS):
+            if attempt:
+                await asyncio.sleep(2 ** attempt)
+            try:
+                await check_callback_address(job["callback_url"])
+                response = await self._http.post(
+                    job["callback_url"], json=job_view(job), headers={"X-Job-Id": job["id"]}
+                )
+                response.raise_for_status()
+            except ValueError as e:
+                # 내부 주소로 향하는 콜백은 재시도하지 않음
+                last_error = str(e)
+                break
+            except (httpx.HTTPError, OSError) as e:
+                last_error = str(e) or type(e).__name__
+                continue
+            self.callbacks_delivered += 1
+            await asyncio.to_thread(database.set_job_callback_state, job["id"], "delivered")
+            return
+        self.callbacks_failed += 1
+        print(f"작업 콜백 전송 실패 ({job['id']} → {job['callback_url']}): {last_error}")
+        await asyncio.to_thread(database.set_job_callback_state, job["id"], "failed")
+
+    # ---------- 만료 ----------
+
+    async def _reap_loop(self):
+        while True:
+            try:
+                deleted = await asyncio.to_thread(database.delete_expired_jobs, time.time())
+                if deleted:
+                    print(f"만료된 작업 {deleted}개 삭제")
+            except Exception as e:
+                print(f"만료 작업 삭제 실패: {e}")
+            await asyncio.sleep(config.JOBS_REAP_INTERVAL_SECONDS)
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self._workers),
+            "running": len(self._running),
+            "submitted": self.submitted,
+            "requeued": self.requeued,
+            "callbacks_delivered": self.callbacks_delivered,
+            "callbacks_failed": self.callbacks_failed,
+        }
+
+
+job_manager = JobManager()
+
+metrics.registry.gauge(
+    "gateway_jobs_running", "Async jobs currently executing in this process", (),
+    lambda: {(): len(job_manager._running)})
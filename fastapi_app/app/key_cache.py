@@ -0,0 +1,119 @@
+# fastapi_app/app/key_cache.py
+# API 키 검증 결과를 메모리에 캐시하고 request_count를 모아서 기록
+
+import asyncio
+import time
+from collections import OrderedDict, defaultdict
+from typing import Optional
+from . import config, database
+
+
+class APIKeyCache:
+    """
+    TTL + LRU 기반 API 키 캐시
+
+    - 유효한 키는 KEY_CACHE_TTL_SECONDS, 잘못된 키는 KEY_CACHE_NEGATIVE_TTL_SECONDS 동안 캐시
+    - request_count 증가분은 메모리에 누적했다가 백그라운드 태스크가 주기적으로 일괄 UPDATE
+    - manage_keys.py가 키를 추가/폐기하면 key_version이 바뀌므로 이를 감지해 캐시 전체를 비움
+    """
+
+    def __init__(
+        self,
+        ttl: float = config.KEY_CACHE_TTL_SECONDS,
+        negative_ttl: float = config.KEY_CACHE_NEGATIVE_TTL_SECONDS,
+        max_size: int = config.KEY_CACHE_MAX_SIZE,
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        # api_key -> (만료 시각, key_info 또는 None)
+        self._entries: OrderedDict[str, tuple[float, Optional[dict]]] = OrderedDict()
+        self._pending_counts: defaultdict[int, int] = defaultdict(int)
+        self._version: Optional[int] = None
+        self._tasks: list[asyncio.Task] = []
+        self.hits = 0
+        self.misses = 0
+
+    async def validate(self, api_key: str) -> Optional[dict]:
+        """키 정보를 반환 (유효하지 않으면 None). 유효한 키는 request_count 증가분을 누적"""
+        now = time.monotonic()
+        entry = self._entries.get(api_key)
+        if entry is not None and entry[0] > now:
+            self._entries.move_to_end(api_key)
+            self.hits += 1
+            key_info = entry[1]
+        else:
+            self.misses += 1
+            key_info = await asyncio.to_thread(database.fetch_active_key, api_key)
+            ttl = self.ttl if key_info else self.negative_ttl
+            self._entries[api_key] = (now + ttl, key_info)
+            self._entries.move_to_end(api_key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+        if key_info:
+            self._pending_counts[key_info["id"]] += 1
+        return key_info
+
+    def invalidate(self, api_key: Optional[str] = None):
+        if api_key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(api_key, None)
+
+    async def flush_counts(self):
+        """누적된 request_count를 한 트랜잭션으로 DB에 반영"""
+        if not self._pending_counts:
+            return
+        counts, self._pending_counts = dict(self._pending_counts), defaultdict(int)
+        try:
+            await asyncio.to_thread(database.add_request_counts, counts)
+        except Exception as e:
+            print(f"request_count 반영 실패 (다음 주기에 재시도): {e}")
+            for key_id, count in counts.items():
+                self._pending_counts[key_id] += count
+
+    async def check_version(self):
+        """key_version이 바뀌었으면 캐시를 비워 revoke/add를 반영"""
+        version = await asyncio.to_thread(database.get_key_version)
+        if self._version is not None and version != self._version:
+            self.invalidate()
+        self._version = version
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(config.KEY_COUNT_FLUSH_INTERVAL_MS / 1000)
+            await self.flush_counts()
+
+    async def _version_loop(self):
+        while True:
+            await asyncio.sleep(config.KEY_CACHE_VERSION_CHECK_SECONDS)
+            try:
+                await self.check_version()
+            except Exception as e:
+                print(f"key_version 확인 실패: {e}")
+
+    async def start(self):
+        await self.check_version()
+        self._tasks = [
+            asyncio.create_task(self._flush_loop()),
+            asyncio.create_task(self._version_loop()),
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.flush_counts()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "pending_counts": sum(self._pending_counts.values()),
+        }
+
+
+key_cache = APIKeyCache()
@@ -0,0 +1,178 @@
+# fastapi_app/app/log_writer.py
+# 요청 로그를 큐에 모아 전용 스레드에서 일괄 기록
+
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional
+from . import config, database, metrics
+
+_STOP = object()
+
+
+class LogWriter:
+    """
+    asyncio 큐 기반 로그 기록기
+
+    - 핸들러는 큐에 넣기만 하고 바로 반환 (이벤트 루프에서 sqlite/fsync 대기 없음)
+    - 백그라운드 태스크가 쌓인 로그를 최대 LOG_BATCH_SIZE개씩 executemany로 한 번에 기록
+    - DB 쓰기는 전용 스레드 1개에서만 수행하므로 SQLite 쓰기 락 경합이 없음
+    - 큐가 가득 차면 LOG_OVERFLOW_POLICY에 따라 대기 / 버림 / 파일로 임시 저장
+    """
+
+    def __init__(
+        self,
+        max_queue: int = config.LOG_QUEUE_MAX_SIZE,
+        batch_size: int = config.LOG_BATCH_SIZE,
+        overflow_policy: str = config.LOG_OVERFLOW_POLICY,
+        spill_file: str = config.LOG_SPILL_FILE,
+    ):
+        if overflow_policy not in ("block", "drop", "spill"):
+            raise ValueError(f"Unknown log overflow policy: {overflow_policy}")
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.overflow_policy = overflow_policy
+        self.spill_file = spill_file
+        self._queue: Optional[asyncio.Queue] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._task: Optional[asyncio.Task] = None
+
+        # 메트릭
+        self.written = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.batches = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="log-writer")
+        await self._replay_spill()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """큐에 남은 로그를 모두 기록한 뒤 종료"""
+        if self._task is None:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        await self._replay_spill()
+        await asyncio.get_running_loop().run_in_executor(self._executor, database.close_connection)
+        self._executor.shutdown(wait=True)
+        self._task = None
+        self._queue = None
+        self._executor = None
+
+    async def add_api_log(self, owner: str, model: str, prompt: str, response: str, cache_hit: bool = False):
+        await self.add_api_logs([(owner, model, prompt, response, cache_hit)])
+
+    async def add_api_logs(self, entries: list[tuple]):
+        """(owner, model, prompt, response, cache_hit) 목록을 큐에 추가"""
+        timestamp = datetime.now().isoformat()
+        rows = [(*entry, timestamp) for entry in entries]
+
+        if self._queue is None:
+            # 기록기가 시작되지 않은 경우 (테스트, 스크립트 등) 바로 기록
+            await asyncio.to_thread(database.insert_api_logs, rows)
+            return
+
+        overflow = []
+        for row in rows:
+            if self.overflow_policy == "block":
+                await self._queue.put(row)
+                continue
+            try:
+                self._queue.put_nowait(row)
+            except asyncio.QueueFull:
+                overflow.append(row)
+
+        if overflow and self.overflow_policy == "drop":
+            self.dropped += len(overflow)
+        elif overflow:
+            await asyncio.to_thread(self._append_spill, overflow)
+            self.spilled += len(overflow)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            batch = []
+            item = await self._queue.get()
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size or self._queue.empty():
+                    break
+                item = self._queue.get_nowait()
+            if not batch:
+                continue
+
+            start = time.perf_counter()
+            try:
+                await loop.run_in_executor(self._executor, database.insert_api_logs, batch)
+                self.written += len(batch)
+            except Exception as e:
+                print(f"DB 로그 일괄 기록 실패 ({len(batch)}건): {e}")
+                self.dropped += len(batch)
+            self._record_flush((time.perf_counter() - start) * 1000)
+
+    def _record_flush(self, elapsed_ms: float):
+        metrics.LOG_FLUSH_SECONDS.observe(elapsed_ms / 1000)
+        self.batches += 1
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self._total_flush_ms += elapsed_ms
+
+    def _append_spill(self, rows: list[tuple]):
+        with open(self.spill_file, "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+    def _drain_spill(self):
+        """임시 파일에 저장된 로그를 DB에 기록하고 파일 삭제"""
+        if not os.path.exists(self.spill_file):
+            return 0
+        with open(self.spill_file, encoding="utf-8") as f:
+            rows = [tuple(json.loads(line)) for line in f if line.strip()]
+        for i in range(0, len(rows), self.batch_size):
+            database.insert_api_logs(rows[i:i + self.batch_size])
+        os.remove(self.spill_file)
+        return len(rows)
+
+    async def _replay_spill(self):
+        try:
+            replayed = await asyncio.get_running_loop().run_in_executor(self._executor, self._drain_spill)
+            self.written += replayed
+        except Exception as e:
+            print(f"임시 로그 파일 재기록 실패: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "queue_max": self.max_queue,
+            "overflow_policy": self.overflow_policy,
+            "written": self.written,
+            "dropped": self.dropped,
+            "spilled": self.spilled,
+            "batches": self.batches,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "max_flush_ms": round(self.max_flush_ms, 2),
+            "avg_flush_ms": round(self._total_flush_ms / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+log_writer = LogWriter()
+
+metrics.registry.gauge(
+    "gateway_log_queue_depth", "Request-log rows waiting to be written", (),
+    lambda: {(): log_writer._queue.qsize() if log_writer._queue else 0})
+metrics.registry.counter_callback(
+    "gateway_log_rows_total", "Request-log rows by outcome", ("outcome",),
+    lambda: {("written",): log_writer.written, ("dropped",): log_writer.dropped, ("spilled",): log_writer.spilled})
@@ -5,6 +5,10 @@ from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import Optional, List
 from . import config, database, models
+from .clients import registry as ollama_clients
+from .key_cache import key_cache
+from .log_writer import log_writer
+from .warmup import warmup_manager
 
 app = FastAPI(
     title="Optimized AI API Server (Qwen2.5-VL + GPT-OSS)",
@@ -12,50 +16,37 @@ app = FastAPI(
 )
 
 # 🔥 서버 시작 시 모델 미리 로드 (Warm-up)
+# config.WARMUP_MODELS의 모델을 백그라운드에서 백엔드별로 병렬 로드 (서버 시작을 막지 않음)
+# 진행 상황은 /v1/ready로 확인
 @app.on_event("startup")
 async def on_startup():
     database.init_db()
-    
-    # 🔥 모델 워밍업: 서버 시작 시 두 모델 모두 미리 로드
-    print("🚀 모델 워밍업 시작...")
-    
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        try:
-            # GPU 0: Qwen2.5-VL 워밍업
-            print("  ↳ GPU 0: qwen2.5vl:7b 로딩중...")
-            await client.post(
-                "http://ollama_gpu0:11434/api/generate",
-                json={
-                    "model": "qwen2.5vl:7b",
-                    "prompt": "warmup",
-                    "stream": False,
-                    "keep_alive": -1  # 🔥 영구 유지
-                }
-            )
-            print("  ✅ GPU 0: qwen2.5vl:7b 로드 완료")
-            
-            # GPU 1: GPT-OSS 워밍업
-            print("  ↳ GPU 1: gpt-oss:20b 로딩중...")
-            await client.post(
-                "http://ollama_gpu1:11434/api/generate",
-                json={
-                    "model": "gpt-oss:20b",
-                    "prompt": "warmup",
-                    "stream": False,
-                    "keep_alive": -1  # 🔥 영구 유지
-                }
-            )
-            print("  ✅ GPU 1: gpt-oss:20b 로드 완료")
-            print("🎉 모든 모델 워밍업 완료!")
-            
-        except Exception as e:
-            print(f"⚠️ 워밍업 중 에러 (무시됨): {e}")
+    await ollama_clients.startup()
+    await key_cache.start()
+    await log_writer.start()
+    await warmup_manager.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await warmup_manager.stop()
+    await log_writer.stop()
+    await key_cache.stop()
+    await ollama_clients.shutdown()
+
+@app.get("/v1/ready", tags=["System"])
+async def readiness_check():
+    """모델 워밍업 완료 여부 (인증 불필요)"""
+    ready = warmup_manager.is_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "warming_up", "models": warmup_manager.stats()}
+    )
 
 # API 키 검증을 위한 의존성 주입
 async def get_valid_api_key(x_api_key: str = Header(..., description="Your personal API Key.")):
     if not x_api_key:
         raise HTTPException(status_code=401, detail="API Key is missing")
-    key_info = await database.validate_and_log_key(x_api_key)
+    key_info = await key_cache.validate(x_api_key)
     if not key_info:
         raise HTTPException(status_code=401, detail="Invalid or Inactive API Key")
     print(f"Request from '{key_info['owner']}' (Key: ...{x_api_key[-4:]})")
@@ -124,7 +115,7 @@ async def generate_completion(
             # 로그 저장
             try:
                 ai_response_text = response_data.get("response", "")
-                await database.add_api_log(
+                await log_writer.add_api_log(
                     owner=api_key.get("owner", "unknown"),
                     model=model_name,
                     prompt=request.prompt,
@@ -212,7 +203,7 @@ async def qwen_ocr_endpoint(
 
                 # DB 로그 기록
                 try:
-                    await database.add_api_log(
+                    await log_writer.add_api_log(
                         owner=api_key.get("owner", "unknown"),
                         model=model,
                         prompt=f"[OCR] {request.prompt[:100]}...",
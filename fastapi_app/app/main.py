@@ -1,78 +1,284 @@
-import httpx
+import anyio
+import asyncio
 import base64
-from fastapi import FastAPI, HTTPException, Header, Depends, UploadFile, File
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
-from typing import Optional, List
-from . import config, database, models
+import httpx
+import json
+import time
+from fastapi import FastAPI, HTTPException, Header, Depends, Query, Request, UploadFile, File
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, ValidationError
+from typing import Literal, Optional, List
+from . import config, database, metrics, models, streaming
+from .clients import registry as ollama_clients
+from .key_cache import key_cache
+from .log_writer import log_writer
+from .scheduler import QueueFullError, resolve_priority, schedulers
+from .router import router as replica_router
+from .warmup import warmup_manager
+from .catalog import make_etag, model_catalog
+from .usage import usage_meter
+from .sessions import Session, session_store
+from .conversations import conversation_store, summary_prompt
+from .embeddings import embedding_service, unpack
+from .jobs import FINISHED_STATUSES, JobFailed, check_callback_url, job_manager, job_view
+from .rate_limit import RateLimitExceeded, rate_limiter
+from .response_cache import make_key as make_cache_key, should_cache, response_cache
+from .singleflight import singleflight
+from .ocr_input import Base64Image, UploadedImage
+from .ocr_document import UploadedDocument
+from . import image_preprocess
 
 app = FastAPI(
     title="Custom AI API Server with Qwen2.5-VL",
     description="A secure gateway to Ollama models with API key authentication + Qwen2.5-VL OCR endpoint."
 )
 
-# 서버 시작 시 DB 초기화
+# 서버 시작 시 DB 초기화 + Ollama 커넥션 풀 생성 + 키 캐시/로그 기록기 백그라운드 작업 시작
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     database.init_db()
+    await ollama_clients.startup()
+    await key_cache.start()
+    await log_writer.start()
+    await usage_meter.start()
+    await rate_limiter.start()
+    await response_cache.start()
+    await replica_router.start()
+    await warmup_manager.start()
+    image_preprocess.start()
+    await job_manager.start()
+
+# 서버 종료 시 남은 로그/request_count 반영 + 커넥션 풀 정리
+@app.on_event("shutdown")
+async def on_shutdown():
+    await job_manager.stop()
+    image_preprocess.shutdown()
+    await warmup_manager.stop()
+    await replica_router.stop()
+    await rate_limiter.stop()
+    await usage_meter.stop()
+    await log_writer.stop()
+    await key_cache.stop()
+    await ollama_clients.shutdown()
+
+# 백엔드 대기열이 가득 찬 경우: 503 + Retry-After
+@app.exception_handler(QueueFullError)
+async def queue_full_handler(request: Request, exc: QueueFullError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"모델 서버가 혼잡합니다. {exc.retry_after}초 후 다시 시도해주세요."},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+# 키별 요청 한도/쿼터 초과: 429 + Retry-After
+@app.exception_handler(RateLimitExceeded)
+async def rate_limit_handler(request: Request, exc: RateLimitExceeded):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": f"{exc.reason}. {exc.retry_after}초 후 다시 시도해주세요."},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+# Ollama 최종 응답의 토큰 수/소요 시간 → 메트릭, 키별 사용량, 쿼터
+def account_usage(api_key: dict, model: str, body: Optional[dict]):
+    metrics.observe_ollama(model, body)
+    usage_meter.record(api_key, model, body)
+    if body:
+        rate_limiter.charge(
+            api_key,
+            (body.get("prompt_eval_count") or 0) + (body.get("eval_count") or 0),
+            (body.get("total_duration") or 0) / 1e9
+        )
+
 # API 키 검증을 위한 의존성 주입
 async def get_valid_api_key(x_api_key: str = Header(..., description="Your personal API Key.")):
     if not x_api_key:
         raise HTTPException(status_code=401, detail="API Key is missing")
-    key_info = await database.validate_and_log_key(x_api_key)
+    started = time.perf_counter()
+    key_info = await key_cache.validate(x_api_key)
+    metrics.AUTH_SECONDS.observe(time.perf_counter() - started, "valid" if key_info else "invalid")
     if not key_info:
         raise HTTPException(status_code=401, detail="Invalid or Inactive API Key")
     print(f"Request from '{key_info['owner']}' (Key: ...{x_api_key[-4:]})")
     return key_info
 
+# 키별 요청 한도 (초과 시 429) - 추론 요청(generate, chat, embeddings, OCR, 작업 제출)에만 적용
+# 조회/삭제/폴링은 한도를 쓰지 않음. 동시 실행 슬롯은 응답(스트림 포함)이 끝난 뒤 반환
+async def get_limited_api_key(api_key: dict = Depends(get_valid_api_key)):
+    lease = rate_limiter.admit(api_key)
+    try:
+        yield api_key
+    finally:
+        lease.release()
+
+# 관리자 전용 API 의존성 (config.ADMIN_KEY_OWNERS에 포함된 소유자만 허용)
+async def get_admin_api_key(api_key: dict = Depends(get_valid_api_key)):
+    if api_key.get("owner") not in config.ADMIN_KEY_OWNERS:
+        raise HTTPException(status_code=403, detail="Admin API Key required")
+    return api_key
+
+# 우선순위 클래스 결정 (X-Priority, X-Queue-Deadline 헤더 + 키의 priority_class)
+# 검증된 key_info 복사본에 "priority"를 넣어 반환하며, 스케줄러 대기열 순서에 사용됨
+def prioritized_api_key(default_class: Optional[str] = None):
+    async def dependency(
+        api_key: dict = Depends(get_limited_api_key),
+        x_priority: Optional[str] = Header(None, description=f"Priority class: {', '.join(config.PRIORITY_CLASSES)}"),
+        x_queue_deadline: Optional[float] = Header(None, description="Give up if still queued after this many seconds."),
+    ) -> dict:
+        if x_queue_deadline is not None and x_queue_deadline <= 0:
+            raise HTTPException(status_code=400, detail="X-Queue-Deadline must be a positive number of seconds")
+        try:
+            priority = resolve_priority(
+                x_priority.strip().lower() if x_priority else None,
+                api_key.get("priority_class"),
+                default_class,
+                x_queue_deadline
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {**api_key, "priority": priority}
+    return dependency
+
+get_prioritized_api_key = prioritized_api_key()
+# 배치 OCR/문서 OCR은 헤더가 없으면 batch 클래스 (대화형 요청보다 뒤에 처리)
+get_batch_api_key = prioritized_api_key("batch")
+
+# ETag/If-None-Match 조건부 응답 (내용이 같으면 304, 본문 없음)
+def conditional_json(request: Request, content) -> Response:
+    etag = make_etag(content)
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={int(config.CATALOG_TTL_SECONDS)}"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=content, headers=headers)
+
+# 게이트웨이 내부 상태 (커넥션 풀, 대기열, 키 캐시, 로그 큐) - 용량 튜닝용
+@app.get("/v1/admin/stats", tags=["Admin"])
+async def get_gateway_stats(api_key: dict = Depends(get_admin_api_key)):
+    return {
+        "pools": ollama_clients.pool_stats(),
+        "schedulers": schedulers.stats(),
+        "replicas": replica_router.stats(),
+        "warmup": warmup_manager.stats(),
+        "catalog": model_catalog.stats(),
+        "usage": usage_meter.stats(),
+        "rate_limits": rate_limiter.stats(),
+        "jobs": job_manager.stats(),
+        "sessions": session_store.stats(),
+        "conversations": conversation_store.stats(),
+        "embeddings": embedding_service.stats(),
+        "response_cache": response_cache.stats(),
+        "singleflight": singleflight.stats(),
+        "key_cache": key_cache.stats(),
+        "log_writer": log_writer.stats(),
+    }
+
+# 키/모델별 토큰 수와 GPU 시간 (용량 계획용)
+@app.get("/v1/admin/usage", tags=["Admin"])
+async def get_usage_report(
+    days: int = Query(7, ge=1, le=366),
+    owner: Optional[str] = None,
+    api_key: dict = Depends(get_admin_api_key)
+):
+    return {"days": days, "usage": await usage_meter.report(days, owner)}
+
+# 생존 확인 (인증 불필요, 업스트림 호출 없음) - 프로세스가 살아 있으면 항상 200
+@app.get("/v1/health", tags=["System"])
+async def health_check():
+    replicas = replica_router.stats()["replicas"]
+    return {
+        "status": "healthy" if all(replica["healthy"] for replica in replicas.values()) else "degraded",
+        "replicas": {endpoint: "online" if replica["healthy"] else "offline" for endpoint, replica in replicas.items()},
+    }
+
+# Prometheus 수집용 메트릭 (인증 불필요 - nginx에서 외부 접근 차단)
+@app.get("/metrics", tags=["System"], include_in_schema=False)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+# 준비 상태 확인 (인증 불필요) - 설정된 모델 워밍업이 끝나기 전에는 503
+@app.get("/v1/ready", tags=["System"])
+async def readiness_check():
+    ready = warmup_manager.is_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "warming_up", "models": warmup_manager.stats()}
+    )
+
 # [기존] 사용 가능한 모델 리스트 API
 @app.get("/v1/models", tags=["Models"])
-async def list_available_models(api_key: dict = Depends(get_valid_api_key)):
+async def list_available_models(request: Request, api_key: dict = Depends(get_valid_api_key)):
     """
     Ollama 서버에 다운로드된 사용 가능한 모든 모델의 목록을 반환합니다.
+    (백엔드를 동시에 조회한 결과를 메모리에 캐시, If-None-Match 지원)
     """
-    all_models = []
-    all_model_names = set()
-
-    async with httpx.AsyncClient() as client:
-        for endpoint in set(config.OLLAMA_ENDPOINTS.values()):
-            try:
-                response = await client.get(f"{endpoint}/api/tags")
-                response.raise_for_status()
-                models_data = response.json()
-
-                if "models" in models_data:
-                    for model in models_data["models"]:
-                        if model["name"] not in all_model_names:
-                            all_models.append(model)
-                            all_model_names.add(model["name"])
-
-            except httpx.RequestError as e:
-                # 개별 엔드포인트 실패는 무시하고 계속 진행
-                print(f"Warning: Could not connect to Ollama at {endpoint}. Error: {e}")
-                continue
-
-    if not all_models:
+    catalog = await model_catalog.get()
+    if not catalog.models:
         raise HTTPException(status_code=500, detail="Could not retrieve models from any Ollama server.")
 
-    return {"models": all_models}
+    return conditional_json(request, {"models": catalog.models})
 
 # [기존] 메인 생성 API
 @app.post("/v1/generate", tags=["Generation"])
 async def generate_completion(
     request: models.OllamaRequest,
-    api_key: dict = Depends(get_valid_api_key)
+    api_key: dict = Depends(get_prioritized_api_key)
 ):
-    model_name = request.model.strip().lower()
+    model_name, ollama_payload = prepare_generate(request)
+    owner = api_key.get("owner", "unknown")
+
+    # 스트리밍 모드: Ollama NDJSON 청크를 도착 즉시 중계 (TTFT 단축)
+    if request.stream:
+        session = open_session(request, owner, model_name, ollama_payload)
+        # 슬롯은 스트림이 끝날 때(RelayResponse.on_close)까지 유지
+        try:
+            upstream, release = await replica_router.open(
+                model_name, owner,
+                lambda client: streaming.open_stream(client, "/api/generate", ollama_payload),
+                priority=api_key.get("priority"),
+                affinity=session
+            )
+        except httpx.HTTPStatusError as e:
+            raise HTTPException(status_code=502, detail=f"Ollama 응답 오류: {e.response.status_code}")
+        except httpx.RequestError as e:
+            raise HTTPException(status_code=500, detail=f"Ollama 연결 오류: {e}")
+
+        async def log_stream(full_text: str, final_chunk: Optional[dict]):
+            account_usage(api_key, model_name, final_chunk)
+            session_store.record_prompt_eval(model_name, "context" in ollama_payload, final_chunk)
+            if session is not None and final_chunk is not None:
+                # 중간에 끊긴 스트림은 세션을 바꾸지 않음 (다음 요청은 이전 context로 다시 시도)
+                session_store.update(session, final_chunk.get("context"))
+            await log_writer.add_api_log(owner=owner, model=model_name, prompt=request.prompt, response=full_text)
+
+        return streaming.RelayResponse(
+            upstream, request.stream_format, log_stream, on_close=release,
+            drop_final_keys=("context",) if session is not None else ()
+        )
+
+    response_data, cache_hit = await run_generate(request, model_name, ollama_payload, api_key)
+    if cache_hit:
+        return JSONResponse(content=response_data, headers={"X-Cache": "HIT"})
+    return response_data
+
+def resolve_model(model: str) -> str:
+    """요청의 모델 이름 정규화 + 지원 여부 확인 (/v1/generate, /v1/chat 공통)"""
+    model_name = model.strip().lower()
 
     if model_name not in config.SUPPORTED_MODELS:
         raise HTTPException(status_code=400, detail=f"지원하지 않는 모델입니다: {model_name}")
 
-    endpoint = config.OLLAMA_ENDPOINTS.get(model_name)
-    if not endpoint:
+    if not config.OLLAMA_REPLICAS.get(model_name):
         raise HTTPException(status_code=500, detail=f"모델 '{model_name}'에 대한 Ollama 엔드포인트를 찾을 수 없습니다.")
 
-    ollama_payload = {
+    return model_name
+
+def prepare_generate(request: models.OllamaRequest) -> tuple[str, dict]:
+    """모델 확인 + Ollama 페이로드 구성 (/v1/generate, 비동기 작업 공통)"""
+    model_name = resolve_model(request.model)
+
+    return model_name, {
         "model": model_name,
         "prompt": request.prompt,
         "stream": request.stream,
@@ -80,41 +286,297 @@ async def generate_completion(
         "options": request.options or {}
     }
 
-    async with httpx.AsyncClient(timeout=1800.0) as client:
+def open_session(
+    request: models.OllamaRequest,
+    owner: str,
+    model_name: str,
+    ollama_payload: dict
+) -> Optional[Session]:
+    """session_id가 있으면 세션을 찾아 보관된 context를 페이로드에 넣음"""
+    if not request.session_id:
+        return None
+    session = session_store.get(owner, request.session_id, model_name)
+    if session.context:
+        ollama_payload["context"] = session.context.tolist()
+    return session
+
+async def run_generate(
+    request: models.OllamaRequest,
+    model_name: str,
+    ollama_payload: dict,
+    api_key: dict
+) -> tuple[dict, bool]:
+    """비스트리밍 생성 (캐시 → single-flight → 스케줄러 → Ollama), (응답, 캐시 적중 여부) 반환"""
+    owner = api_key.get("owner", "unknown")
+    session = open_session(request, owner, model_name, ollama_payload)
+
+    # 결정적 요청(temperature=0 등) 또는 cache=true 요청은 응답 캐시 사용
+    # (세션 요청은 이전 대화에 따라 응답이 달라지므로 캐시하지 않음)
+    cache_key = None
+    if session is None and should_cache(ollama_payload["options"], request.cache):
+        cache_key = make_cache_key(model_name, request.prompt, ollama_payload["options"])
+        cached = await response_cache.get(cache_key)
+        if cached is not None:
+            await log_writer.add_api_log(
+                owner=owner, model=model_name, prompt=request.prompt,
+                response=cached.get("response", ""), cache_hit=True
+            )
+            return cached, True
+
+    async def call_ollama():
+        response = await replica_router.call(
+            model_name, owner,
+            lambda client: client.post("/api/generate", json=ollama_payload),
+            priority=api_key.get("priority"),
+            affinity=session
+        )
+        response.raise_for_status()
+        response_data = response.json()
+        account_usage(api_key, model_name, response_data)
+        session_store.record_prompt_eval(model_name, "context" in ollama_payload, response_data)
+        if cache_key:
+            await response_cache.put(cache_key, response_data)
+        return response_data
+
+    try:
+        if cache_key:
+            # 동일한 캐시 대상 요청이 동시에 여러 개 들어오면 업스트림 호출 1회를 공유 (로그는 요청마다 기록)
+            # 비결정적 요청은 호출마다 다른 샘플을 기대하므로 합치지 않음
+            response_data, _ = await singleflight.do(cache_key, call_ollama)
+        else:
+            response_data = await call_ollama()
+            if session is not None:
+                # context 토큰은 게이트웨이가 보관하므로 클라이언트에는 보내지 않음
+                session_store.update(session, response_data.pop("context", None))
+
+        # 로그 저장
         try:
-            response = await client.post(
-                f"{endpoint}/api/generate",
-                json=ollama_payload
+            ai_response_text = response_data.get("response", "")
+            await log_writer.add_api_log(
+                owner=owner,
+                model=model_name,
+                prompt=request.prompt,
+                response=ai_response_text
+            )
+        except Exception as log_e:
+            print(f"로그 기록 중 에러 발생: {log_e}")
+
+        return response_data, False
+
+    except httpx.RequestError as e:
+        raise HTTPException(status_code=500, detail=f"Ollama 연결 오류: {e}")
+
+# 세션 상태 조회 (context 토큰 수, 고정된 복제본, 턴 수)
+@app.get("/v1/sessions/{session_id}", tags=["Generation"])
+async def get_session(session_id: str, api_key: dict = Depends(get_valid_api_key)):
+    session = session_store.peek(api_key.get("owner", "unknown"), session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="세션을 찾을 수 없습니다")
+    return session.info()
+
+# 세션 종료 (보관 중인 context 삭제 - 다음 요청은 새 대화로 시작)
+@app.delete("/v1/sessions/{session_id}", tags=["Generation"], status_code=204)
+async def delete_session(session_id: str, api_key: dict = Depends(get_valid_api_key)):
+    if not session_store.delete(api_key.get("owner", "unknown"), session_id):
+        raise HTTPException(status_code=404, detail="세션을 찾을 수 없습니다")
+    return Response(status_code=204)
+
+# ==================== 채팅 (/v1/chat) ====================
+# Ollama /api/chat 중계. conversation_id가 있으면 기록을 게이트웨이가 저장하고 토큰 예산에 맞춰 압축
+
+def chat_text(chunk: dict) -> str:
+    return (chunk.get("message") or {}).get("content", "")
+
+@app.post("/v1/chat", tags=["Generation"])
+async def chat_completion(
+    request: models.ChatRequest,
+    api_key: dict = Depends(get_prioritized_api_key)
+):
+    model_name = resolve_model(request.model)
+    owner = api_key.get("owner", "unknown")
+    priority = api_key.get("priority")
+    messages = [message.model_dump() for message in request.messages]
+
+    conversation = None
+    pending = None
+    if request.conversation_id:
+        conversation = await conversation_store.get(owner, request.conversation_id)
+
+        async def summarize(previous: Optional[str], dropped: list[dict]) -> str:
+            response = await replica_router.call(
+                model_name, owner,
+                lambda client: client.post("/api/chat", json={
+                    "model": model_name,
+                    "messages": summary_prompt(previous, dropped),
+                    "stream": False,
+                    "keep_alive": -1,
+                    "options": {"temperature": 0, "num_predict": config.CHAT_SUMMARY_MAX_TOKENS},
+                }),
+                priority=priority
             )
             response.raise_for_status()
-            response_data = response.json()
+            body = response.json()
+            account_usage(api_key, model_name, body)
+            return chat_text(body).strip()
 
-            # 로그 저장
+        messages, pending = await conversation_store.build_messages(
+            conversation, messages, request.compaction or config.CHAT_COMPACTION, summarize
+        )
+
+    ollama_payload = {
+        "model": model_name,
+        "messages": messages,
+        "stream": request.stream,
+        "keep_alive": -1,
+        "options": request.options or {}
+    }
+    prompt = next((message["content"] for message in reversed(messages) if message["role"] == "user"), "")
+    headers = {"X-Conversation-Id": conversation.id} if conversation is not None else None
+
+    async def finish(reply: str, body: Optional[dict]):
+        account_usage(api_key, model_name, body)
+        if conversation is not None and body is not None:
+            # 중간에 끊긴 스트림은 기록하지 않음
             try:
-                ai_response_text = response_data.get("response", "")
-                await database.add_api_log(
-                    owner=api_key.get("owner", "unknown"),
-                    model=model_name,
-                    prompt=request.prompt,
-                    response=ai_response_text
+                await conversation_store.save_turn(
+                    conversation, model_name, [message.model_dump() for message in request.messages],
+                    reply, body.get("eval_count"), pending
                 )
-            except Exception as log_e:
-                print(f"로그 기록 중 에러 발생: {log_e}")
+            except Exception as e:
+                print(f"대화 기록 저장 실패: {e}")
+        await log_writer.add_api_log(owner=owner, model=model_name, prompt=prompt, response=reply)
+
+    try:
+        if request.stream:
+            upstream, release = await replica_router.open(
+                model_name, owner,
+                lambda client: streaming.open_stream(client, "/api/chat", ollama_payload),
+                priority=priority
+            )
+            return streaming.RelayResponse(
+                upstream, request.stream_format, finish, on_close=release, text_of=chat_text, headers=headers
+            )
 
-            return response_data
+        response = await replica_router.call(
+            model_name, owner,
+            lambda client: client.post("/api/chat", json=ollama_payload),
+            priority=priority
+        )
+        response.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=502, detail=f"Ollama 응답 오류: {e.response.status_code}")
+    except httpx.RequestError as e:
+        raise HTTPException(status_code=500, detail=f"Ollama 연결 오류: {e}")
 
-        except httpx.RequestError as e:
-            raise HTTPException(status_code=500, detail=f"Ollama 연결 오류: {e}")
+    response_data = response.json()
+    await finish(chat_text(response_data), response_data)
+    return JSONResponse(content=response_data, headers=headers)
+
+# 저장된 대화 조회 (요약되지 않은 최근 메시지 + 요약)
+@app.get("/v1/chat/conversations/{conversation_id}", tags=["Generation"])
+async def get_conversation(conversation_id: str, api_key: dict = Depends(get_valid_api_key)):
+    conversation = await conversation_store.get(api_key.get("owner", "unknown"), conversation_id, create=False)
+    if conversation is None:
+        raise HTTPException(status_code=404, detail="대화를 찾을 수 없습니다")
+    return conversation.info()
+
+@app.delete("/v1/chat/conversations/{conversation_id}", tags=["Generation"], status_code=204)
+async def delete_conversation(conversation_id: str, api_key: dict = Depends(get_valid_api_key)):
+    if not await conversation_store.delete(api_key.get("owner", "unknown"), conversation_id):
+        raise HTTPException(status_code=404, detail="대화를 찾을 수 없습니다")
+    return Response(status_code=204)
+
+# ==================== 임베딩 (/v1/embeddings) ====================
+
+@app.post("/v1/embeddings", tags=["Embeddings"])
+async def create_embeddings(
+    request: models.EmbeddingRequest,
+    api_key: dict = Depends(get_prioritized_api_key)
+):
+    """
+    텍스트(또는 텍스트 목록)의 임베딩 벡터를 입력 순서대로 반환합니다.
+    (중복 텍스트는 한 번만 계산, 이전에 계산한 텍스트는 캐시에서 반환)
+    """
+    model_name = request.model.strip().lower()
+    if model_name not in config.EMBEDDING_MODELS or not config.OLLAMA_REPLICAS.get(model_name):
+        raise HTTPException(status_code=400, detail=f"지원하지 않는 임베딩 모델입니다: {model_name}")
+    texts = [request.input] if isinstance(request.input, str) else request.input
+    if not texts or len(texts) > config.EMBEDDINGS_MAX_INPUTS:
+        raise HTTPException(status_code=400, detail=f"input은 1~{config.EMBEDDINGS_MAX_INPUTS}개여야 합니다")
+    owner = api_key.get("owner", "unknown")
+
+    async def embed_batch(batch: list[str]) -> list[list[float]]:
+        response = await replica_router.call(
+            model_name, owner,
+            lambda client: client.post("/api/embed", json={
+                "model": model_name,
+                "input": batch,
+                "truncate": request.truncate,
+                "keep_alive": -1,
+            }),
+            priority=api_key.get("priority")
+        )
+        response.raise_for_status()
+        body = response.json()
+        account_usage(api_key, model_name, body)
+        return body.get("embeddings") or []
+
+    try:
+        vectors, cached = await embedding_service.embed(model_name, texts, request.truncate, embed_batch)
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=502, detail=f"Ollama 응답 오류: {e.response.status_code}")
+    except httpx.RequestError as e:
+        raise HTTPException(status_code=500, detail=f"Ollama 연결 오류: {e}")
+    except ValueError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+
+    dimensions = len(vectors[0]) // 4
+    # 입력 전체는 배치당 수 MB가 될 수 있으므로 개수/글자 수와 첫 텍스트 앞부분만 기록
+    await log_writer.add_api_log(
+        owner=owner, model=model_name,
+        prompt=f"[EMBED] {len(texts)} texts, {sum(map(len, texts))} chars: {texts[0][:100]}...",
+        response=f"{len(vectors)} embeddings x {dimensions} dims", cache_hit=cached == len(set(texts))
+    )
+    headers = {"X-Embedding-Dimensions": str(dimensions), "X-Cache-Hits": str(cached)}
+
+    if request.format == "float32":
+        # 행 우선(row-major) little-endian float32: 벡터 i는 [i*dims*4, (i+1)*dims*4) 바이트
+        headers["X-Embedding-Count"] = str(len(vectors))
+        return Response(content=b"".join(vectors), media_type="application/octet-stream", headers=headers)
+    if request.format == "base64":
+        embeddings = [base64.b64encode(vector).decode("ascii") for vector in vectors]
+    else:
+        embeddings = [unpack(vector) for vector in vectors]
+    return JSONResponse(
+        content={"model": model_name, "dimensions": dimensions, "embeddings": embeddings},
+        headers=headers
+    )
 
 # ==================== 🔥 NEW: Qwen2.5-VL OCR 전용 엔드포인트 ====================
 
-class QwenOCRRequest(BaseModel):
-    """Qwen2.5-VL OCR 요청 모델"""
-    image_base64: str
+class QwenOCROptions(BaseModel):
+    """Qwen2.5-VL OCR 옵션 (단건/배치/파일 업로드 공통)"""
     prompt: Optional[str] = "이 이미지의 모든 텍스트를 정확히 읽어주세요. 한국어, 영어, 숫자를 모두 포함해서 줄바꿈도 유지해주세요."
     model: Optional[str] = "qwen2.5vl:7b"
     temperature: Optional[float] = 0.1
     top_p: Optional[float] = 0.9
+    # 응답 캐시 사용 여부 (None: temperature=0일 때만, True: 항상, False: 사용 안 함)
+    cache: Optional[bool] = None
+    # 서버 측 이미지 전처리 (EXIF 회전 + max_pixels 이하로 축소 + 재인코딩)
+    preprocess: bool = False
+    max_pixels: Optional[int] = None
+    grayscale: bool = False
+    image_format: Literal["jpeg", "png"] = "jpeg"
+    # 전처리 시 perceptual hash로 캐시 키를 만들어 거의 같은 이미지도 캐시 공유
+    dedupe: bool = False
+
+class QwenOCRRequest(QwenOCROptions):
+    """Qwen2.5-VL OCR 요청 모델"""
+    image_base64: str
+
+class QwenOCRBatchRequest(QwenOCROptions):
+    """Qwen2.5-VL 배치 OCR 요청 모델 (여러 페이지를 한 번에)"""
+    images: List[str]
 
 class QwenOCRResponse(BaseModel):
     """Qwen2.5-VL OCR 응답 모델"""
@@ -122,12 +584,14 @@ class QwenOCRResponse(BaseModel):
     ocr_text: str
     model_used: str
     processing_time_ms: float
+    cache_hit: bool = False
+    preprocess_time_ms: Optional[float] = None
     error: Optional[str] = None
 
 @app.post("/v1/qwen/ocr", tags=["Qwen2.5-VL"], response_model=QwenOCRResponse)
 async def qwen_ocr_endpoint(
     request: QwenOCRRequest,
-    api_key: dict = Depends(get_valid_api_key)
+    api_key: dict = Depends(get_prioritized_api_key)
 ):
     """
     Qwen2.5-VL을 사용한 고성능 OCR 엔드포인트
@@ -137,15 +601,26 @@ async def qwen_ocr_endpoint(
     - 빠른 응답 시간
     - 커스텀 프롬프트 지원
     """
-    import time
-    start_time = time.time()
+    return await run_qwen_ocr(request, Base64Image(request.image_base64), api_key, time.time())
+
+async def run_qwen_ocr(
+    request: QwenOCROptions,
+    image,
+    api_key: dict,
+    start_time: float,
+    log_entries: Optional[list] = None
+) -> QwenOCRResponse:
+    """
+    OCR 공통 처리 (캐시 → single-flight → 스케줄러 → Ollama)
 
+    image: ocr_input.Base64Image 또는 ocr_input.UploadedImage
+    log_entries: 주어지면 로그를 바로 기록하지 않고 이 목록에 모음 (배치에서 한 번에 기록)
+    """
     try:
-        # Qwen2.5-VL 전용 페이로드 구성
+        # Qwen2.5-VL 전용 페이로드 구성 (images는 image 소스가 추가)
         qwen_payload = {
             "model": request.model,
             "prompt": request.prompt,
-            "images": [request.image_base64],
             "stream": False,
             "keep_alive": -1,
             "options": {
@@ -154,62 +629,99 @@ async def qwen_ocr_endpoint(
             }
         }
 
-        endpoint = config.OLLAMA_ENDPOINTS.get(request.model)
-        if not endpoint:
+        if not config.OLLAMA_REPLICAS.get(request.model):
             raise HTTPException(status_code=500, detail=f"모델 '{request.model}'에 대한 Ollama 엔드포인트를 찾을 수 없습니다.")
 
-        async with httpx.AsyncClient(timeout=1800.0) as client:
-            try:
-                response = await client.post(
-                    f"{endpoint}/api/generate",
-                    json=qwen_payload,
-                    headers={'Content-Type': 'application/json'}
-                )
-                response.raise_for_status()
-                result = response.json()
+        # 선택적 전처리: 프로세스 풀에서 축소/재인코딩 (이벤트 루프를 막지 않음)
+        preprocess_time_ms = None
+        if request.preprocess:
+            image, preprocess_time_ms = await image_preprocess.preprocess(
+                image,
+                max_pixels=request.max_pixels,
+                grayscale=request.grayscale,
+                image_format=request.image_format,
+                dedupe=request.dedupe
+            )
+            preprocess_time_ms = round(preprocess_time_ms, 2)
+
+        # 같은 이미지 재제출은 응답 캐시에서 처리 (GPU 사용 없음)
+        request_key = make_cache_key(request.model, request.prompt, qwen_payload["options"], [await image.digest()])
+        use_cache = should_cache(qwen_payload["options"], request.cache)
+        result = await response_cache.get(request_key) if use_cache else None
+        cache_hit = result is not None
+
+        async def call_ollama():
+            response = await replica_router.call(
+                request.model, api_key.get("owner", "unknown"),
+                lambda client: image.post(client, qwen_payload),
+                priority=api_key.get("priority")
+            )
+            response.raise_for_status()
+            body = response.json()
+            account_usage(api_key, request.model, body)
+            result = {"response": body.get("response", "")}
+            if use_cache:
+                await response_cache.put(request_key, result)
+            return result
+
+        try:
+            if use_cache and not cache_hit:
+                # 같은 이미지가 동시에 여러 번 들어오면 GPU 호출 1회를 공유 (캐시 대상 요청만)
+                result, _ = await singleflight.do(request_key, call_ollama)
+            elif not cache_hit:
+                result = await call_ollama()
 
-                processing_time = (time.time() - start_time) * 1000
-                ocr_text = result.get("response", "").strip()
+            processing_time = (time.time() - start_time) * 1000
+            ocr_text = result.get("response", "").strip()
 
-                if not ocr_text:
-                    ocr_text = "[No text detected]"
+            if not ocr_text:
+                ocr_text = "[No text detected]"
 
-                # DB 로그 기록 (선택사항)
+            # DB 로그 기록 (선택사항)
+            log_entry = (
+                api_key.get("owner", "unknown"),
+                request.model,
+                f"[OCR] {request.prompt[:100]}...",
+                ocr_text[:500],  # OCR 결과는 길 수 있으니 500자만
+                cache_hit
+            )
+            if log_entries is not None:
+                log_entries.append(log_entry)
+            else:
                 try:
-                    await database.add_api_log(
-                        owner=api_key.get("owner", "unknown"),
-                        model=request.model,
-                        prompt=f"[OCR] {request.prompt[:100]}...",
-                        response=ocr_text[:500]  # OCR 결과는 길 수 있으니 500자만
-                    )
+                    await log_writer.add_api_logs([log_entry])
                 except Exception as log_e:
                     print(f"OCR 로그 기록 중 에러: {log_e}")
 
-                return QwenOCRResponse(
-                    success=True,
-                    ocr_text=ocr_text,
-                    model_used=request.model,
-                    processing_time_ms=round(processing_time, 2),
-                    error=None
-                )
+            return QwenOCRResponse(
+                success=True,
+                ocr_text=ocr_text,
+                model_used=request.model,
+                processing_time_ms=round(processing_time, 2),
+                cache_hit=cache_hit,
+                preprocess_time_ms=preprocess_time_ms,
+                error=None
+            )
 
-            except httpx.TimeoutException:
-                return QwenOCRResponse(
-                    success=False,
-                    ocr_text="",
-                    model_used=request.model,
-                    processing_time_ms=round((time.time() - start_time) * 1000, 2),
-                    error="OCR processing timeout (300s exceeded)"
-                )
-            except httpx.RequestError as e:
-                return QwenOCRResponse(
-                    success=False,
-                    ocr_text="",
-                    model_used=request.model,
-                    processing_time_ms=round((time.time() - start_time) * 1000, 2),
-                    error=f"Network error: {str(e)}"
-                )
+        except httpx.TimeoutException:
+            return QwenOCRResponse(
+                success=False,
+                ocr_text="",
+                model_used=request.model,
+                processing_time_ms=round((time.time() - start_time) * 1000, 2),
+                error=f"OCR processing timeout ({config.OLLAMA_REQUEST_TIMEOUT}s exceeded)"
+            )
+        except httpx.RequestError as e:
+            return QwenOCRResponse(
+                success=False,
+                ocr_text="",
+                model_used=request.model,
+                processing_time_ms=round((time.time() - start_time) * 1000, 2),
+                error=f"Network error: {str(e)}"
+            )
 
+    except QueueFullError:
+        raise
     except Exception as e:
         return QwenOCRResponse(
             success=False,
@@ -219,89 +731,324 @@ async def qwen_ocr_endpoint(
             error=f"Server error: {str(e)}"
         )
 
-@app.post("/v1/qwen/ocr-file", tags=["Qwen2.5-VL"], response_model=QwenOCRResponse)
-async def qwen_ocr_file_upload(
-    file: UploadFile = File(..., description="이미지 파일 (PNG, JPG, JPEG)"),
+def ocr_query_options(
     prompt: str = "이 이미지의 모든 텍스트를 정확히 읽어주세요. 한국어, 영어, 숫자를 모두 포함해서 줄바꿈도 유지해주세요.",
     model: str = "qwen2.5vl:7b",
     temperature: float = 0.1,
     top_p: float = 0.9,
-    api_key: dict = Depends(get_valid_api_key)
+    cache: Optional[bool] = None,
+    preprocess: bool = False,
+    max_pixels: Optional[int] = None,
+    grayscale: bool = False,
+    image_format: Literal["jpeg", "png"] = "jpeg",
+    dedupe: bool = False
+) -> QwenOCROptions:
+    """파일 업로드 엔드포인트용 OCR 옵션 (쿼리 파라미터)"""
+    return QwenOCROptions(
+        prompt=prompt,
+        model=model,
+        temperature=temperature,
+        top_p=top_p,
+        cache=cache,
+        preprocess=preprocess,
+        max_pixels=max_pixels,
+        grayscale=grayscale,
+        image_format=image_format,
+        dedupe=dedupe
+    )
+
+@app.post("/v1/qwen/ocr-file", tags=["Qwen2.5-VL"], response_model=QwenOCRResponse)
+async def qwen_ocr_file_upload(
+    file: UploadFile = File(..., description="이미지 파일 (PNG, JPG, JPEG)"),
+    options: QwenOCROptions = Depends(ocr_query_options),
+    api_key: dict = Depends(get_prioritized_api_key)
 ):
-    print(f"Received model in qwen_ocr_file_upload: {model}")
     """
     파일 업로드 방식의 Qwen2.5-VL OCR 엔드포인트
+
+    업로드 파일은 메모리에 통째로 올리지 않고 청크 단위로 base64 인코딩해 Ollama로 스트리밍합니다.
     """
-    import time
     start_time = time.time()
 
     # 파일 타입 검증
     if not file.content_type.startswith('image/'):
         raise HTTPException(status_code=400, detail="Only image files are supported")
 
-    try:
-        # 파일을 base64로 인코딩
-        file_content = await file.read()
-        image_base64 = base64.b64encode(file_content).decode('utf-8')
-
-        # 기존 OCR 엔드포인트 재사용
-        request_obj = QwenOCRRequest(
-            image_base64=image_base64,
-            prompt=prompt,
-            model=model,
-            temperature=temperature,
-            top_p=top_p
-        )
+    # 크기 제한 검증 (초과 시 413)
+    image = await UploadedImage.from_upload(file)
+    return await run_qwen_ocr(options, image, api_key, start_time)
 
-        # 내부적으로 qwen_ocr_endpoint 호출
-        return await qwen_ocr_endpoint(request_obj, api_key)
+# ==================== 배치 OCR (여러 페이지를 한 번의 요청으로) ====================
 
-    except Exception as e:
-        return QwenOCRResponse(
-            success=False,
-            ocr_text="",
-            model_used=model,
-            processing_time_ms=round((time.time() - start_time) * 1000, 2),
-            error=f"File processing error: {str(e)}"
-        )
+def stream_ocr_batch(options: QwenOCROptions, images: list, api_key: dict) -> StreamingResponse:
+    """
+    이미지 N개를 최대 OCR_BATCH_MAX_PARALLEL개씩 동시에 처리하고
+    끝나는 순서대로 {"index": i, ...QwenOCRResponse} NDJSON 줄로 내보냅니다.
+    인증은 요청당 1회, 로그는 배치가 끝난 뒤 한 번에 기록합니다.
+    """
+    start_time = time.time()
+    semaphore = asyncio.Semaphore(config.OCR_BATCH_MAX_PARALLEL)
+    log_entries: list = []
 
-@app.get("/v1/qwen/health", tags=["Qwen2.5-VL"])
-async def qwen_health_check(api_key: dict = Depends(get_valid_api_key)):
+    async def run_item(index: int, image):
+        async with semaphore:
+            try:
+                result = await run_qwen_ocr(options, image, api_key, time.time(), log_entries=log_entries)
+            except QueueFullError as e:
+                result = QwenOCRResponse(
+                    success=False,
+                    ocr_text="",
+                    model_used=options.model,
+                    processing_time_ms=0.0,
+                    error=f"Backend busy (retry after {e.retry_after}s)"
+                )
+        return index, result
+
+    async def body():
+        tasks = [asyncio.create_task(run_item(index, image)) for index, image in enumerate(images)]
+        succeeded = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                index, result = await next_done
+                succeeded += result.success
+                line = {"index": index, **result.model_dump()}
+                yield (json.dumps(line, ensure_ascii=False) + "\n").encode("utf-8")
+            summary = {
+                "done": True,
+                "total": len(images),
+                "succeeded": succeeded,
+                "processing_time_ms": round((time.time() - start_time) * 1000, 2)
+            }
+            yield (json.dumps(summary) + "\n").encode("utf-8")
+        finally:
+            # 클라이언트가 끊기면 남은 페이지는 취소하고, 완료된 페이지 로그는 한 번에 기록
+            with anyio.CancelScope(shield=True):
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                await log_writer.add_api_logs(log_entries)
+
+    return StreamingResponse(body(), media_type=streaming.NDJSON_MEDIA_TYPE)
+
+def _check_batch_size(count: int):
+    if count == 0:
+        raise HTTPException(status_code=400, detail="이미지가 없습니다")
+    if count > config.OCR_BATCH_MAX_IMAGES:
+        raise HTTPException(status_code=413, detail=f"배치당 최대 {config.OCR_BATCH_MAX_IMAGES}장까지 처리할 수 있습니다")
+
+@app.post("/v1/qwen/ocr/batch", tags=["Qwen2.5-VL"])
+async def qwen_ocr_batch(
+    request: QwenOCRBatchRequest,
+    api_key: dict = Depends(get_batch_api_key)
+):
+    """
+    Base64 이미지 여러 장을 한 번에 OCR (결과는 완료 순서대로 NDJSON 스트리밍)
+    """
+    _check_batch_size(len(request.images))
+    images = [Base64Image(image_base64) for image_base64 in request.images]
+    return stream_ocr_batch(request, images, api_key)
+
+@app.post("/v1/qwen/ocr-file/batch", tags=["Qwen2.5-VL"])
+async def qwen_ocr_file_batch(
+    files: List[UploadFile] = File(..., description="이미지 파일 여러 개 (PNG, JPG, JPEG)"),
+    options: QwenOCROptions = Depends(ocr_query_options),
+    api_key: dict = Depends(get_batch_api_key)
+):
     """
-    Qwen2.5-VL 모델 상태 확인
+    이미지 파일 여러 개를 한 번에 OCR (결과는 완료 순서대로 NDJSON 스트리밍)
     """
-    qwen_models = []
-    errors = []
+    _check_batch_size(len(files))
+    for file in files:
+        if not file.content_type.startswith('image/'):
+            raise HTTPException(status_code=400, detail=f"Only image files are supported: {file.filename}")
+    images = [await UploadedImage.from_upload(file) for file in files]
+    return stream_ocr_batch(options, images, api_key)
+
+# ==================== 여러 페이지 문서 OCR (PDF, TIFF) ====================
 
-    async with httpx.AsyncClient() as client:
-        for endpoint in set(config.OLLAMA_ENDPOINTS.values()):
+@app.post("/v1/qwen/ocr-document", tags=["Qwen2.5-VL"])
+async def qwen_ocr_document(
+    file: UploadFile = File(..., description="문서 파일 (PDF, 여러 페이지 TIFF)"),
+    options: QwenOCROptions = Depends(ocr_query_options),
+    api_key: dict = Depends(get_batch_api_key)
+):
+    """
+    PDF/TIFF 문서를 페이지별로 OCR (결과는 페이지 순서대로 NDJSON 스트리밍)
+
+    페이지 래스터화는 프로세스 풀에서 실행되며, k페이지가 GPU에서 OCR되는 동안
+    다음 페이지들을 미리 래스터화합니다. 마지막 줄에 처리량(pages_per_minute)을 보고합니다.
+    """
+    document = await UploadedDocument.from_upload(file)
+    page_options = options.model_copy(update={"preprocess": False})
+    log_entries: list = []
+
+    pages = document.pages(
+        max_pixels=options.max_pixels,
+        grayscale=options.grayscale,
+        image_format=options.image_format,
+        dedupe=options.dedupe
+    )
+
+    async def body():
+        start_time = time.time()
+        succeeded = 0
+        async for page_number, image, render_ms, render_error in pages:
             try:
-                response = await client.get(f"{endpoint}/api/tags")
-                response.raise_for_status()
-                models_data = response.json()
+                if render_error is not None:
+                    # 렌더링에 실패한 페이지는 에러 줄만 내보내고 다음 페이지 계속 처리
+                    result = QwenOCRResponse(
+                        success=False,
+                        ocr_text="",
+                        model_used=options.model,
+                        processing_time_ms=0.0,
+                        error=render_error
+                    )
+                else:
+                    result = await run_qwen_ocr(page_options, image, api_key, time.time(), log_entries=log_entries)
+            except QueueFullError as e:
+                result = QwenOCRResponse(
+                    success=False,
+                    ocr_text="",
+                    model_used=options.model,
+                    processing_time_ms=0.0,
+                    error=f"Backend busy (retry after {e.retry_after}s)"
+                )
+            result.preprocess_time_ms = round(render_ms, 2)
+            succeeded += result.success
+            line = {"page": page_number, **result.model_dump()}
+            yield (json.dumps(line, ensure_ascii=False) + "\n").encode("utf-8")
 
-                for model in models_data.get("models", []):
-                    if "qwen" in model.get("name", "").lower():
-                        qwen_models.append(model["name"])
+        elapsed = time.time() - start_time
+        summary = {
+            "done": True,
+            "pages": document.page_count,
+            "succeeded": succeeded,
+            "processing_time_ms": round(elapsed * 1000, 2),
+            "pages_per_minute": round(document.page_count / elapsed * 60, 2) if elapsed else None
+        }
+        yield (json.dumps(summary) + "\n").encode("utf-8")
 
-            except Exception as e:
-                errors.append(f"Could not connect to {endpoint}: {str(e)}")
-                continue
+    # 본문 전송이 시작되기 전에 클라이언트가 끊어도 임시 파일과 미리 래스터화 중인 작업을 정리
+    async def cleanup():
+        await pages.aclose()
+        document.close()
+        await log_writer.add_api_logs(log_entries)
+
+    return streaming.ClosingStreamingResponse(body(), cleanup, media_type=streaming.NDJSON_MEDIA_TYPE)
+
+@app.get("/v1/qwen/health", tags=["Qwen2.5-VL"])
+async def qwen_health_check(request: Request, api_key: dict = Depends(get_valid_api_key)):
+    """
+    Qwen2.5-VL 모델 상태 확인 (모델 목록 캐시 사용)
+    """
+    catalog = await model_catalog.get()
+    qwen_models = sorted({model["name"] for model in catalog.models if "qwen" in model.get("name", "").lower()})
+    errors = [f"Could not connect to {endpoint}: {error}" for endpoint, error in catalog.errors.items()]
 
     if not qwen_models and errors:
-        return {
+        return conditional_json(request, {
             "status": "error",
             "errors": errors,
             "message": "Could not connect to any Ollama server or no Qwen models found."
-        }
+        })
 
-    return {
+    return conditional_json(request, {
         "status": "healthy" if qwen_models else "no_qwen_models_found",
-        "available_qwen_models": list(set(qwen_models)),
+        "available_qwen_models": qwen_models,
         "recommended_model": "qwen2.5vl:7b",
         "endpoints": [
             "/v1/qwen/ocr",
             "/v1/qwen/ocr-file",
+            "/v1/qwen/ocr/batch",
+            "/v1/qwen/ocr-file/batch",
+            "/v1/qwen/ocr-document",
             "/v1/qwen/health"
         ]
-    }
\ No newline at end of file
+    })
+
+# ==================== 비동기 작업 (/v1/jobs) ====================
+# 오래 걸리는 생성/OCR을 접수만 하고 바로 202를 반환 (연결을 추론 내내 잡고 있지 않음)
+# 결과는 GET 폴링, ?wait= 롱폴링, callback_url 중 하나로 받음
+
+class JobSubmitRequest(BaseModel):
+    """비동기 작업 제출 (request는 /v1/generate 또는 /v1/qwen/ocr 요청 본문과 같은 형식)"""
+    type: Literal["generate", "ocr"]
+    request: dict
+    callback_url: Optional[str] = None
+
+async def run_generate_job(body: dict, api_key: dict) -> dict:
+    request = models.OllamaRequest.model_validate({**body, "stream": False})
+    model_name, ollama_payload = prepare_generate(request)
+    response_data, _ = await run_generate(request, model_name, ollama_payload, api_key)
+    return response_data
+
+async def run_ocr_job(body: dict, api_key: dict) -> dict:
+    request = QwenOCRRequest.model_validate(body)
+    result = await run_qwen_ocr(request, Base64Image(request.image_base64), api_key, time.time())
+    if not result.success:
+        raise JobFailed(result.error or "OCR failed", result.model_dump())
+    return result.model_dump()
+
+job_manager.register("generate", run_generate_job)
+job_manager.register("ocr", run_ocr_job)
+
+def validate_job_request(body: JobSubmitRequest) -> tuple[dict, str]:
+    """제출 시점에 요청 본문 검증 (실행 중 실패 대신 바로 4xx), (정규화된 본문, 모델) 반환"""
+    try:
+        if body.type == "generate":
+            request = models.OllamaRequest.model_validate({**body.request, "stream": False})
+            model_name, _ = prepare_generate(request)
+            return request.model_dump(), model_name
+        request = QwenOCRRequest.model_validate(body.request)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors(include_url=False))
+    if not config.OLLAMA_REPLICAS.get(request.model):
+        raise HTTPException(status_code=400, detail=f"지원하지 않는 모델입니다: {request.model}")
+    return request.model_dump(), request.model
+
+async def get_own_job(job_id: str, api_key: dict) -> dict:
+    """작업 조회 (다른 소유자의 작업은 관리자가 아니면 404)"""
+    job = await job_manager.get(job_id)
+    owner = api_key.get("owner")
+    if job is None or (job["owner"] != owner and owner not in config.ADMIN_KEY_OWNERS):
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다")
+    return job
+
+@app.post("/v1/jobs", tags=["Jobs"], status_code=202)
+async def submit_job(
+    body: JobSubmitRequest,
+    api_key: dict = Depends(get_batch_api_key)
+):
+    """
+    생성/OCR 작업을 대기열에 넣고 바로 반환 (헤더가 없으면 batch 우선순위)
+
+    작업은 SQLite에 저장되어 게이트웨이가 재시작되어도 이어서 실행되며,
+    결과는 JOBS_RESULT_TTL_SECONDS 동안 보관됩니다.
+    """
+    if body.callback_url:
+        try:
+            check_callback_url(body.callback_url)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    request, model = validate_job_request(body)
+    job = await job_manager.submit(api_key, body.type, request, model, api_key["priority"], body.callback_url)
+    return JSONResponse(status_code=202, content=job_view(job), headers={"Location": f"/v1/jobs/{job['id']}"})
+
+@app.get("/v1/jobs/{job_id}", tags=["Jobs"])
+async def poll_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, le=config.JOBS_MAX_LONG_POLL_SECONDS, description="끝날 때까지 최대 몇 초 기다릴지 (롱폴링)"),
+    api_key: dict = Depends(get_valid_api_key)
+):
+    job = await get_own_job(job_id, api_key)
+    if wait and job["status"] not in FINISHED_STATUSES:
+        job = await job_manager.wait(job_id, wait) or job
+    return job_view(job)
+
+@app.delete("/v1/jobs/{job_id}", tags=["Jobs"])
+async def cancel_job(job_id: str, api_key: dict = Depends(get_valid_api_key)):
+    """대기 중이거나 실행 중인 작업 취소 (실행 중이면 업스트림 요청도 중단)"""
+    job = await get_own_job(job_id, api_key)
+    if not await job_manager.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"이미 끝난 작업입니다 ({job['status']})")
+    return job_view(await job_manager.get(job_id))
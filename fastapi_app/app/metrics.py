@@ -0,0 +1,176 @@
+# fastapi_app/app/metrics.py
+# Prometheus 텍스트 형식 메트릭 (/metrics)
+#
+# 게이트웨이는 이벤트 루프 하나에서 동작하므로 기록은 락 없이 dict/list 값만 증가시킵니다.
+# 히스토그램은 버킷별(비누적) 카운트만 올리고 누적 합계는 수집(scrape) 시점에 계산합니다.
+# 대기열 길이 같은 게이지는 요청 경로에서 갱신하지 않고 수집 시점에 콜백으로 읽습니다.
+
+import bisect
+import math
+from typing import Callable, Iterable, Optional
+
+# 초 단위 지연 시간용 기본 버킷 (인증 수 ms ~ 대형 모델 추론 수 분)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels, value: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + value
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in sorted(self._values.items()):
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # 라벨 → [버킷별 카운트..., +Inf 카운트, 합계]
+        self._values: dict[tuple, list[float]] = {}
+
+    def observe(self, value: float, *labels):
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        entry[bisect.bisect_left(self.buckets, value)] += 1
+        entry[-1] += value
+
+    def samples(self) -> Iterable[str]:
+        for labels, entry in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), entry[:-1]):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(entry[-1])}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+
+class Callback:
+    """
+    수집 시점에 collect()가 돌려주는 {라벨 튜플: 값}을 그대로 노출
+    (이미 다른 객체가 세고 있는 값을 요청 경로에서 다시 기록하지 않기 위해 사용)
+    """
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...], collect: Callable[[], dict[tuple, float]], type: str):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.collect = collect
+        self.type = type
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in sorted(self.collect().items()):
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, object] = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name: str, help: str, labelnames: tuple[str, ...], collect: Callable[[], dict[tuple, float]]) -> Callback:
+        return self.register(Callback(name, help, labelnames, collect, "gauge"))
+
+    def counter_callback(self, name: str, help: str, labelnames: tuple[str, ...], collect: Callable[[], dict[tuple, float]]) -> Callback:
+        return self.register(Callback(name, help, labelnames, collect, "counter"))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# ---------- 게이트웨이 단계별 지연 시간 ----------
+
+AUTH_SECONDS = registry.histogram(
+    "gateway_auth_seconds", "API key validation time (cache + DB)", ("result",))
+QUEUE_WAIT_SECONDS = registry.histogram(
+    "gateway_queue_wait_seconds", "Time spent waiting for a backend slot", ("backend", "priority"))
+UPSTREAM_TTFB_SECONDS = registry.histogram(
+    "gateway_upstream_ttfb_seconds", "Time until Ollama response headers on streaming requests", ("model", "backend"))
+UPSTREAM_TOTAL_SECONDS = registry.histogram(
+    "gateway_upstream_total_seconds", "Time until the upstream request finished (stream end)", ("model", "backend"))
+UPSTREAM_ERRORS = registry.counter(
+    "gateway_upstream_errors_total", "Upstream connection failures", ("backend",))
+LOG_FLUSH_SECONDS = registry.histogram(
+    "gateway_log_flush_seconds", "Batched request-log write latency")
+JOBS_FINISHED = registry.counter(
+    "gateway_jobs_finished_total", "Async jobs that reached a final state", ("type", "status"))
+
+# ---------- Ollama가 응답 본문에 보고한 값 ----------
+
+OLLAMA_EVAL_TOKENS = registry.counter(
+    "ollama_eval_tokens_total", "Generated tokens (eval_count)", ("model",))
+OLLAMA_PROMPT_EVAL_TOKENS = registry.counter(
+    "ollama_prompt_eval_tokens_total", "Prompt tokens evaluated (prompt_eval_count)", ("model",))
+OLLAMA_EVAL_SECONDS = registry.histogram(
+    "ollama_eval_duration_seconds", "Generation time reported by Ollama (eval_duration)", ("model",))
+OLLAMA_PROMPT_EVAL_SECONDS = registry.histogram(
+    "ollama_prompt_eval_duration_seconds", "Prompt processing time reported by Ollama (prompt_eval_duration)", ("model",))
+GENERATE_PROMPT_EVAL_SECONDS = registry.histogram(
+    "gateway_generate_prompt_eval_seconds", "Prompt processing time on /v1/generate by whether a session context was replayed", ("model", "context"))
+OLLAMA_LOAD_SECONDS = registry.histogram(
+    "ollama_load_duration_seconds", "Model load time reported by Ollama (load_duration)", ("model",))
+
+
+def observe_ollama(model: str, body: Optional[dict]):
+    """Ollama 최종 응답(done 청크)의 토큰 수/소요 시간 기록 (나노초 → 초)"""
+    if not body:
+        return
+    if body.get("eval_count"):
+        OLLAMA_EVAL_TOKENS.inc(model, value=body["eval_count"])
+    if body.get("prompt_eval_count"):
+        OLLAMA_PROMPT_EVAL_TOKENS.inc(model, value=body["prompt_eval_count"])
+    if body.get("eval_duration"):
+        OLLAMA_EVAL_SECONDS.observe(body["eval_duration"] / 1e9, model)
+    if body.get("prompt_eval_duration"):
+        OLLAMA_PROMPT_EVAL_SECONDS.observe(body["prompt_eval_duration"] / 1e9, model)
+    if body.get("load_duration"):
+        OLLAMA_LOAD_SECONDS.observe(body["load_duration"] / 1e9, model)
@@ -1,9 +1,38 @@
 # Pydantic을 사용한 요청/응답 형식 정의
-from pydantic import BaseModel
-from typing import Any
+from pydantic import BaseModel, Field
+from typing import Any, Literal, Optional, Union
 
 class OllamaRequest(BaseModel):
     model: str
     prompt: str
     stream: bool = False
-    options: dict[str, Any] = {}
\ No newline at end of file
+    # stream=True일 때 응답 형식: NDJSON(Ollama 원본) 또는 SSE
+    stream_format: Literal["ndjson", "sse"] = "ndjson"
+    options: dict[str, Any] = {}
+    # 응답 캐시 사용 여부 (None: temperature=0/seed 지정 시만, True: 항상, False: 사용 안 함)
+    cache: Optional[bool] = None
+    # 세션 id: 게이트웨이가 이전 응답의 context를 보관했다가 다음 요청에 다시 넣음 (이전 대화를 다시 보낼 필요 없음)
+    session_id: Optional[str] = Field(None, min_length=1, max_length=128)
+
+class ChatMessage(BaseModel):
+    role: Literal["system", "user", "assistant"]
+    content: str
+
+class ChatRequest(BaseModel):
+    model: str
+    # conversation_id가 있으면 이번 턴의 메시지만 보내면 됨 (이전 기록은 게이트웨이가 붙임)
+    messages: list[ChatMessage] = Field(..., min_length=1)
+    conversation_id: Optional[str] = Field(None, min_length=1, max_length=128)
+    stream: bool = False
+    stream_format: Literal["ndjson", "sse"] = "ndjson"
+    options: dict[str, Any] = {}
+    # 기록이 토큰 예산을 넘을 때 처리 방식 (None: config.CHAT_COMPACTION)
+    compaction: Optional[Literal["trim", "summarize"]] = None
+
+class EmbeddingRequest(BaseModel):
+    model: str
+    input: Union[str, list[str]]
+    # 응답 형식: json(float 목록), base64(벡터별 little-endian float32), float32(전체를 이어 붙인 바이너리)
+    format: Literal["json", "base64", "float32"] = "json"
+    # 모델 최대 길이를 넘는 텍스트를 자를지 (False면 Ollama가 에러 반환)
+    truncate: bool = True
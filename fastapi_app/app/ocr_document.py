@@ -0,0 +1,177 @@
+# fastapi_app/app/ocr_document.py
+# 여러 페이지 문서(PDF, TIFF) OCR 입력
+#
+# 업로드 문서를 임시 파일로 저장하고, 페이지 래스터화는 전처리 프로세스 풀에서
+# 한 페이지씩 실행합니다. 워커에는 문서 바이트 대신 파일 경로만 넘기므로
+# 50페이지 문서라도 페이지마다 문서 전체를 복사하지 않습니다.
+#
+# PDF 렌더링은 선택 의존성인 pypdfium2가 있어야 합니다 (TIFF는 Pillow만으로 처리).
+
+import asyncio
+import importlib.util
+import math
+import os
+import shutil
+import tempfile
+import time
+from typing import AsyncIterator, Optional
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+from . import config, image_preprocess
+from .image_preprocess import PreprocessedImage, encode_image
+
+PDF_AVAILABLE = importlib.util.find_spec("pypdfium2") is not None
+
+CONTENT_TYPES = {
+    "application/pdf": "pdf",
+    "image/tiff": "tiff",
+    "image/tif": "tiff",
+}
+
+# PDF 페이지 크기는 포인트(1/72인치) 단위
+PDF_POINTS_PER_INCH = 72
+
+
+def count_pages(path: str, kind: str) -> int:
+    """워커에서 실행: 문서 페이지 수"""
+    if kind == "pdf":
+        import pypdfium2
+        document = pypdfium2.PdfDocument(path)
+        try:
+            return len(document)
+        finally:
+            document.close()
+    with Image.open(path) as image:
+        return getattr(image, "n_frames", 1)
+
+
+def render_page(
+    path: str,
+    kind: str,
+    index: int,
+    max_pixels: int,
+    grayscale: bool,
+    image_format: str,
+    jpeg_quality: int = 90,
+) -> dict:
+    """
+    워커에서 실행: index 페이지를 max_pixels 이하로 래스터화해 재인코딩
+    반환값은 image_preprocess.preprocess_image와 같은 형식입니다.
+    """
+    start = time.perf_counter()
+    if kind == "pdf":
+        import pypdfium2
+        document = pypdfium2.PdfDocument(path)
+        try:
+            page = document[index]
+            width, height = page.get_size()
+            # 처음부터 목표 해상도로 렌더링 (최대 OCR_DOCUMENT_MAX_DPI)
+            scale = min(
+                math.sqrt(max_pixels / (width * height)),
+                config.OCR_DOCUMENT_MAX_DPI / PDF_POINTS_PER_INCH,
+            )
+            image = page.render(scale=scale, grayscale=grayscale).to_pil()
+            original_size = (round(width), round(height))
+            page.close()
+        finally:
+            document.close()
+    else:
+        with Image.open(path) as document:
+            document.seek(index)
+            image = document.copy()
+            original_size = image.size
+    return encode_image(image, original_size, max_pixels, grayscale, image_format, jpeg_quality, start)
+
+
+class UploadedDocument:
+    """임시 파일로 저장된 업로드 문서 (close()에서 삭제)"""
+
+    def __init__(self, path: str, kind: str, page_count: int):
+        self.path = path
+        self.kind = kind
+        self.page_count = page_count
+
+    @classmethod
+    async def from_upload(cls, file: UploadFile) -> "UploadedDocument":
+        kind = CONTENT_TYPES.get(file.content_type)
+        if kind is None:
+            raise HTTPException(status_code=415, detail="PDF 또는 TIFF 문서만 지원합니다")
+        if kind == "pdf" and not PDF_AVAILABLE:
+            raise HTTPException(status_code=501, detail="PDF 처리를 위해 서버에 pypdfium2가 필요합니다")
+
+        size = file.size
+        if size is None:
+            await file.seek(0, 2)
+            size = file.file.tell()
+        if size > config.OCR_DOCUMENT_MAX_UPLOAD_BYTES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"문서 파일이 너무 큽니다 (최대 {config.OCR_DOCUMENT_MAX_UPLOAD_BYTES // (1024 * 1024)}MB)"
+            )
+        if size == 0:
+            raise HTTPException(status_code=400, detail="빈 파일입니다")
+
+        await file.seek(0)
+        path = await asyncio.to_thread(_save, file.file, config.OCR_DOCUMENT_TMP_DIR)
+        try:
+            page_count = await image_preprocess.run_in_pool(count_pages, path, kind)
+        except Exception:
+            os.unlink(path)
+            raise HTTPException(status_code=400, detail="문서를 읽을 수 없습니다")
+        document = cls(path, kind, page_count)
+        if page_count > config.OCR_DOCUMENT_MAX_PAGES:
+            document.close()
+            raise HTTPException(status_code=413, detail=f"문서당 최대 {config.OCR_DOCUMENT_MAX_PAGES}페이지까지 처리할 수 있습니다")
+        return document
+
+    async def pages(
+        self,
+        max_pixels: Optional[int] = None,
+        grayscale: bool = False,
+        image_format: str = "jpeg",
+        dedupe: bool = False,
+        prefetch: int = config.OCR_DOCUMENT_PREFETCH_PAGES,
+    ) -> AsyncIterator[tuple[int, Optional[PreprocessedImage], float, Optional[str]]]:
+        """
+        (페이지 번호, PreprocessedImage, 렌더링 ms, 에러)를 페이지 순서대로 반환
+
+        소비자가 k페이지를 OCR하는 동안 k+1 … k+prefetch 페이지를 미리 래스터화합니다.
+        렌더링 ms는 워커 안에서 걸린 시간입니다 (풀 대기 시간 제외).
+        한 페이지를 렌더링하지 못하면 (페이지 번호, None, 0.0, 에러 메시지)를 반환하고 다음 페이지로 넘어갑니다.
+        """
+        max_pixels = max_pixels or config.PREPROCESS_DEFAULT_MAX_PIXELS
+        options_key = f"{max_pixels}:{int(grayscale)}:{image_format}"
+
+        def submit(index: int) -> asyncio.Task:
+            return asyncio.ensure_future(image_preprocess.run_in_pool(
+                render_page, self.path, self.kind, index, max_pixels, grayscale, image_format,
+                config.PREPROCESS_JPEG_QUALITY
+            ))
+
+        pending: dict[int, asyncio.Task] = {}
+        try:
+            for index in range(self.page_count):
+                for ahead in range(index, min(index + prefetch + 1, self.page_count)):
+                    if ahead not in pending:
+                        pending[ahead] = submit(ahead)
+                try:
+                    result = await pending.pop(index)
+                except Exception as e:
+                    yield index + 1, None, 0.0, f"Page render error: {e or type(e).__name__}"
+                    continue
+                yield index + 1, PreprocessedImage(result, options_key, dedupe), result["worker_ms"], None
+        finally:
+            for task in pending.values():
+                task.cancel()
+
+    def close(self):
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+def _save(source, directory: Optional[str]) -> str:
+    with tempfile.NamedTemporaryFile(prefix="ocr-document-", dir=directory, delete=False) as target:
+        shutil.copyfileobj(source, target, 1024 * 1024)
+        return target.name
@@ -0,0 +1,99 @@
+# fastapi_app/app/ocr_input.py
+# OCR 이미지 입력 소스 (JSON base64 문자열 / 업로드 파일)
+#
+# 두 소스 모두 같은 이미지라면 같은 digest(base64 텍스트의 sha256)를 돌려주므로
+# /v1/qwen/ocr 와 /v1/qwen/ocr-file 요청이 응답 캐시와 single-flight 키를 공유합니다.
+
+import base64
+import hashlib
+import json
+import httpx
+from fastapi import HTTPException, UploadFile
+from typing import AsyncIterator
+from . import config
+
+# base64 인코딩 단위 (3의 배수여야 청크 경계에 패딩이 생기지 않음)
+BASE64_CHUNK_BYTES = 3 * 64 * 1024
+
+
+class Base64Image:
+    """JSON 요청에 포함된 base64 문자열 이미지"""
+
+    def __init__(self, data: str):
+        self.data = data
+
+    async def digest(self) -> str:
+        return hashlib.sha256(self.data.encode("utf-8")).hexdigest()
+
+    async def raw(self) -> str:
+        """전처리 워커에 넘길 원본 (base64 디코딩은 워커에서 수행)"""
+        return self.data
+
+    async def post(self, client: httpx.AsyncClient, payload: dict) -> httpx.Response:
+        return await client.post("/api/generate", json={**payload, "images": [self.data]})
+
+
+class UploadedImage:
+    """
+    업로드된 이미지 파일 (Starlette가 SpooledTemporaryFile에 저장한 상태)
+
+    파일 전체를 메모리에 올리거나 base64 문자열을 만들지 않고,
+    청크 단위로 base64 인코딩하면서 업스트림 JSON 본문을 스트리밍합니다.
+    """
+
+    def __init__(self, file: UploadFile, size: int):
+        self.file = file
+        self.size = size
+
+    @classmethod
+    async def from_upload(cls, file: UploadFile, max_bytes: int = config.OCR_MAX_UPLOAD_BYTES) -> "UploadedImage":
+        size = file.size
+        if size is None:
+            await file.seek(0, 2)
+            size = file.file.tell()
+        if size > max_bytes:
+            raise HTTPException(status_code=413, detail=f"이미지 파일이 너무 큽니다 (최대 {max_bytes // (1024 * 1024)}MB)")
+        if size == 0:
+            raise HTTPException(status_code=400, detail="빈 파일입니다")
+        await file.seek(0)
+        return cls(file, size)
+
+    async def iter_base64(self) -> AsyncIterator[bytes]:
+        await self.file.seek(0)
+        while True:
+            chunk = await self.file.read(BASE64_CHUNK_BYTES)
+            if not chunk:
+                break
+            yield base64.b64encode(chunk)
+
+    async def digest(self) -> str:
+        digest = hashlib.sha256()
+        async for encoded in self.iter_base64():
+            digest.update(encoded)
+        return digest.hexdigest()
+
+    async def raw(self) -> bytes:
+        """전처리 워커에 넘길 원본 바이트 (크기는 from_upload에서 이미 제한됨)"""
+        await self.file.seek(0)
+        return await self.file.read()
+
+    def base64_length(self) -> int:
+        return 4 * ((self.size + 2) // 3)
+
+    async def post(self, client: httpx.AsyncClient, payload: dict) -> httpx.Response:
+        # {...payload, "images": ["<base64>"]} 형태의 JSON을 문자열로 만들지 않고 바이트 스트림으로 전송
+        head = json.dumps(payload, ensure_ascii=False).encode("utf-8")[:-1] + b', "images": ["'
+        tail = b'"]}'
+
+        async def body() -> AsyncIterator[bytes]:
+            yield head
+            async for encoded in self.iter_base64():
+                yield encoded
+            yield tail
+
+        content_length = len(head) + self.base64_length() + len(tail)
+        return await client.post(
+            "/api/generate",
+            content=body(),
+            headers={"Content-Type": "application/json", "Content-Length": str(content_length)}
+        )
@@ -0,0 +1,201 @@
+# fastapi_app/app/rate_limit.py
+# API 키별 요청 속도 제한(token bucket), 동시 실행 수 제한, 토큰/GPU 시간 쿼터
+#
+# 한도는 api_keys 테이블의 컬럼에 저장되며(NULL = 제한 없음) 키 캐시의 key_info에 함께 들어옵니다.
+# 검사는 인증 경로에서 메모리만으로 수행하고, 쿼터 사용량과 버킷 상태는 주기적으로
+# rate_limit_state 테이블에 저장해 재시작 후에도 이어서 적용합니다.
+
+import asyncio
+import json
+import math
+import time
+from collections import defaultdict
+from typing import Optional
+from . import config, database
+
+# 쿼터 사용량을 모으는 시간 단위 (초) - 롤링 윈도우는 이 단위로 만료
+QUOTA_BUCKET_SECONDS = 3600
+
+
+class RateLimitExceeded(Exception):
+    """요청 한도 초과 (HTTP 429 + Retry-After로 변환)"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _KeyState:
+    __slots__ = ("tokens", "updated_at", "in_flight", "usage")
+
+    def __init__(self, tokens: float, updated_at: float):
+        self.tokens = tokens          # token bucket 잔량
+        self.updated_at = updated_at  # time.time()
+        self.in_flight = 0
+        # 시간 버킷 시작(epoch 초) → [토큰 수, GPU 초]
+        self.usage: dict[int, list[float]] = {}
+
+
+class Lease:
+    """동시 실행 슬롯 (요청이 끝나면 release)"""
+
+    __slots__ = ("state", "_released")
+
+    def __init__(self, state: Optional[_KeyState]):
+        self.state = state
+        self._released = state is None
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.state.in_flight -= 1
+
+
+class RateLimiter:
+    def __init__(self):
+        self._states: dict[int, _KeyState] = {}
+        self._dirty: set[int] = set()
+        self._task: Optional[asyncio.Task] = None
+        self.rejected: defaultdict[str, int] = defaultdict(int)
+
+    def _state(self, key_info: dict, now: float) -> _KeyState:
+        state = self._states.get(key_info["id"])
+        if state is None:
+            state = self._states[key_info["id"]] = _KeyState(_burst(key_info), now)
+        return state
+
+    def admit(self, key_info: dict) -> Lease:
+        """요청 하나를 허용 (한도를 넘으면 RateLimitExceeded)"""
+        if not _has_limits(key_info):
+            return Lease(None)
+        now = time.time()
+        state = self._state(key_info, now)
+
+        self._check_quota(key_info, state, now)
+
+        max_concurrent = key_info.get("max_concurrent")
+        if max_concurrent and state.in_flight >= max_concurrent:
+            self._reject("concurrency")
+            raise RateLimitExceeded(f"동시 요청 한도({max_concurrent}개)를 초과했습니다", 1)
+
+        rps = key_info.get("rate_limit_rps")
+        if rps:
+            burst = _burst(key_info)
+            state.tokens = min(burst, state.tokens + (now - state.updated_at) * rps)
+            state.updated_at = now
+            if state.tokens < 1:
+                self._reject("rate")
+                raise RateLimitExceeded(
+                    f"초당 요청 한도({rps}/s)를 초과했습니다",
+                    max(1, math.ceil((1 - state.tokens) / rps))
+                )
+            state.tokens -= 1
+            self._dirty.add(key_info["id"])
+
+        state.in_flight += 1
+        return Lease(state)
+
+    def _check_quota(self, key_info: dict, state: _KeyState, now: float):
+        quota_tokens = key_info.get("quota_tokens")
+        quota_gpu_seconds = key_info.get("quota_gpu_seconds")
+        if not quota_tokens and not quota_gpu_seconds:
+            return
+        window = (key_info.get("quota_window_hours") or config.RATE_LIMIT_DEFAULT_QUOTA_WINDOW_HOURS) * 3600
+        _expire(state, now, window)
+        used_tokens = sum(usage[0] for usage in state.usage.values())
+        used_gpu_seconds = sum(usage[1] for usage in state.usage.values())
+        if (quota_tokens and used_tokens >= quota_tokens) or (quota_gpu_seconds and used_gpu_seconds >= quota_gpu_seconds):
+            # 가장 오래된 시간 버킷이 윈도우를 벗어날 때 다시 사용 가능
+            oldest = min(state.usage)
+            self._reject("quota")
+            raise RateLimitExceeded(
+                f"사용량 쿼터를 초과했습니다 (토큰 {int(used_tokens)}/{quota_tokens or '-'}, "
+                f"GPU {used_gpu_seconds:.0f}/{quota_gpu_seconds or '-'}초)",
+                max(1, math.ceil(oldest + QUOTA_BUCKET_SECONDS + window - now))
+            )
+
+    def charge(self, key_info: dict, tokens: int, gpu_seconds: float):
+        """업스트림 호출이 끝난 뒤 실제 사용량을 쿼터에 반영"""
+        if not (key_info.get("quota_tokens") or key_info.get("quota_gpu_seconds")):
+            return
+        now = time.time()
+        state = self._state(key_info, now)
+        bucket = int(now // QUOTA_BUCKET_SECONDS * QUOTA_BUCKET_SECONDS)
+        usage = state.usage.setdefault(bucket, [0, 0.0])
+        usage[0] += tokens
+        usage[1] += gpu_seconds
+        self._dirty.add(key_info["id"])
+
+    def _reject(self, reason: str):
+        self.rejected[reason] += 1
+
+    # ---------- SQLite 체크포인트 ----------
+
+    async def load(self):
+        rows = await asyncio.to_thread(database.load_rate_limit_state)
+        for key_id, tokens, updated_at, usage_json in rows:
+            state = _KeyState(tokens, updated_at)
+            state.usage = {int(bucket): usage for bucket, usage in json.loads(usage_json).items()}
+            self._states[key_id] = state
+
+    async def checkpoint(self):
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        rows = [
+            (key_id, state.tokens, state.updated_at, json.dumps(state.usage))
+            for key_id in dirty
+            if (state := self._states.get(key_id)) is not None
+        ]
+        try:
+            await asyncio.to_thread(database.save_rate_limit_state, rows)
+        except Exception as e:
+            print(f"요청 한도 상태 저장 실패 (다음 주기에 재시도): {e}")
+            self._dirty |= dirty
+
+    async def _checkpoint_loop(self):
+        while True:
+            await asyncio.sleep(config.RATE_LIMIT_CHECKPOINT_SECONDS)
+            await self.checkpoint()
+
+    async def start(self):
+        try:
+            await self.load()
+        except Exception as e:
+            print(f"요청 한도 상태 불러오기 실패: {e}")
+        if self._task is None:
+            self._task = asyncio.create_task(self._checkpoint_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.checkpoint()
+
+    def stats(self) -> dict:
+        return {
+            "tracked_keys": len(self._states),
+            "in_flight": sum(state.in_flight for state in self._states.values()),
+            "rejected": dict(self.rejected),
+        }
+
+
+def _has_limits(key_info: dict) -> bool:
+    return any(key_info.get(column) for column in (
+        "rate_limit_rps", "max_concurrent", "quota_tokens", "quota_gpu_seconds"
+    ))
+
+
+def _burst(key_info: dict) -> float:
+    rps = key_info.get("rate_limit_rps") or 0
+    return float(key_info.get("rate_limit_burst") or max(1, math.ceil(rps)))
+
+
+def _expire(state: _KeyState, now: float, window: float):
+    for bucket in [bucket for bucket in state.usage if bucket + QUOTA_BUCKET_SECONDS <= now - window]:
+        del state.usage[bucket]
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,174 @@
+# fastapi_app/app/response_cache.py
+# 동일한 요청(모델, 프롬프트, 이미지, 옵션)에 대한 응답 캐시
+
+import asyncio
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Any, Iterable, Optional
+from . import config
+
+
+def make_key(model: str, prompt: str, options: dict[str, Any], images: Iterable[str] = ()) -> str:
+    """요청 내용으로 만든 캐시 키 (sha256 hex)"""
+    digest = hashlib.sha256()
+    header = json.dumps({"model": model, "prompt": prompt, "options": options}, sort_keys=True, ensure_ascii=False)
+    digest.update(header.encode("utf-8"))
+    for image in images:
+        digest.update(b"\0image\0")
+        digest.update(image.encode("ascii") if isinstance(image, str) else image)
+    return digest.hexdigest()
+
+
+def is_deterministic(options: dict[str, Any]) -> bool:
+    """temperature=0 이거나 seed가 고정된 요청만 같은 입력에 같은 출력을 보장"""
+    return options.get("temperature") == 0 or options.get("seed") is not None
+
+
+def should_cache(options: dict[str, Any], requested: Optional[bool]) -> bool:
+    """
+    requested: 요청의 cache 필드
+      None  → 결정적(deterministic) 옵션일 때만 캐시
+      True  → 호출자가 명시적으로 캐시 사용 (예: temperature=0.1 OCR 재제출)
+      False → 캐시 사용 안 함
+    """
+    if not config.RESPONSE_CACHE_ENABLED or requested is False:
+        return False
+    return requested is True or is_deterministic(options)
+
+
+class ResponseCache:
+    """
+    메모리(LRU, 바이트 한도) + 선택적 디스크 계층 응답 캐시
+
+    디스크 계층은 /app/database 볼륨 아래에 키별 JSON 파일로 저장되어 재시작 후에도 유지됩니다.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = config.RESPONSE_CACHE_MAX_BYTES,
+        disk_dir: Optional[str] = config.RESPONSE_CACHE_DISK_DIR,
+        disk_max_bytes: int = config.RESPONSE_CACHE_DISK_MAX_BYTES,
+    ):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries: OrderedDict[str, tuple[int, dict]] = OrderedDict()
+        self._bytes = 0
+        self._disk_bytes = 0
+
+        # 메트릭
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def start(self):
+        if self.disk_dir:
+            self._disk_bytes = await asyncio.to_thread(self._scan_disk)
+
+    async def get(self, key: str) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        if self.disk_dir:
+            value = await asyncio.to_thread(self._read_disk, key)
+            if value is not None:
+                self.disk_hits += 1
+                self._remember(key, value, len(json.dumps(value, ensure_ascii=False).encode("utf-8")))
+                return value
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, value: dict):
+        data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        self._remember(key, value, len(data))
+        if self.disk_dir:
+            try:
+                await asyncio.to_thread(self._write_disk, key, data)
+            except OSError as e:
+                print(f"응답 캐시 디스크 저장 실패: {e}")
+
+    def _remember(self, key: str, value: dict, size: int):
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[0]
+        self._entries[key] = (size, value)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (evicted_size, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    # ---------- 디스크 계층 (스레드에서 실행) ----------
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def _read_disk(self, key: str) -> Optional[dict]:
+        try:
+            with open(self._path(key), "rb") as f:
+                return json.loads(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key: str, data: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self._disk_bytes += len(data)
+        if self._disk_bytes > self.disk_max_bytes:
+            self._disk_bytes = self._prune_disk()
+
+    def _disk_files(self) -> list[os.DirEntry]:
+        files = []
+        if not os.path.isdir(self.disk_dir):
+            return files
+        for bucket in os.scandir(self.disk_dir):
+            if bucket.is_dir():
+                files.extend(entry for entry in os.scandir(bucket.path) if entry.name.endswith(".json"))
+        return files
+
+    def _scan_disk(self) -> int:
+        return sum(entry.stat().st_size for entry in self._disk_files())
+
+    def _prune_disk(self) -> int:
+        """오래된 파일부터 지워서 디스크 한도의 80%까지 줄임"""
+        files = sorted(self._disk_files(), key=lambda entry: entry.stat().st_mtime)
+        total = sum(entry.stat().st_size for entry in files)
+        target = self.disk_max_bytes * 0.8
+        for entry in files:
+            if total <= target:
+                break
+            size = entry.stat().st_size
+            try:
+                os.remove(entry.path)
+                total -= size
+            except OSError:
+                pass
+        return total
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "disk_bytes": self._disk_bytes if self.disk_dir else None,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+response_cache = ResponseCache()
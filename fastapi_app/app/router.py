@@ -0,0 +1,304 @@
+# fastapi_app/app/router.py
+# 모델별 Ollama 복제본(replica) 선택 + 헬스 체크 + 장애 조치(failover)
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Optional
+import httpx
+from . import config, metrics
+from .clients import registry as ollama_clients
+from .scheduler import Priority, QueueDeadlineError, QueueFullError, schedulers
+
+# 연결 자체가 맺어지지 않은 실패 → 요청이 업스트림에 닿지 않았으므로 언제든 다른 복제본으로 재시도해도 안전
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+# 연결이 끊긴 경우(RemoteProtocolError)는 Ollama가 이미 생성을 일부/전부 실행했을 수 있음.
+# 응답 헤더를 받자마자 돌아오는 스트리밍 open에서 헤더 전에 끊긴 경우만 재시도 (비스트리밍은 GPU 작업 중복 방지)
+FAILOVER_ERRORS = CONNECT_ERRORS + (httpx.RemoteProtocolError,)
+
+
+class Replica:
+    """하나의 Ollama 서버 상태 (헬스, 진행 중 요청 수, 지연 시간 EWMA, 보유/적재 모델)"""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.healthy = True
+        self.outstanding = 0
+        self.latency_ewma = 0.0
+        self.consecutive_failures = 0
+        self.consecutive_successes = 0
+        self.available_models: Optional[set[str]] = None  # /api/tags (None: 아직 모름)
+        self.loaded_models: set[str] = set()               # /api/ps
+        self.last_probe_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+        # 메트릭
+        self.requests = 0
+        self.failures = 0
+        self.ejections = 0
+
+    @property
+    def max_inflight(self) -> int:
+        return config.BACKEND_MAX_INFLIGHT.get(self.endpoint, 1)
+
+    def serves(self, model: str) -> bool:
+        return self.available_models is None or model in self.available_models
+
+    def score(self) -> float:
+        """작을수록 우선 (진행 중 요청 수를 동시 실행 한도로 나눈 값, ewma 정책은 지연 시간 가중)"""
+        load = (self.outstanding + 1) / self.max_inflight
+        if config.ROUTER_POLICY == "ewma":
+            return load * (self.latency_ewma or 1.0)
+        return load
+
+    def record_success(self, latency: Optional[float] = None):
+        """latency: 응답 헤더까지 걸린 시간 (스트리밍만, 비스트리밍은 본문 전체 시간이라 EWMA에 넣지 않음)"""
+        if latency is None:
+            self._mark_up()
+            return
+        alpha = 0.2
+        if self.latency_ewma:
+            self.latency_ewma = alpha * latency + (1 - alpha) * self.latency_ewma
+        else:
+            self.latency_ewma = latency
+        self._mark_up()
+
+    def record_failure(self, error: Exception):
+        self.failures += 1
+        self.last_error = str(error) or type(error).__name__
+        self.consecutive_successes = 0
+        self.consecutive_failures += 1
+        if self.healthy and self.consecutive_failures >= config.ROUTER_EJECT_AFTER_FAILURES:
+            self.healthy = False
+            self.ejections += 1
+            print(f"Replica ejected: {self.endpoint} ({self.last_error})")
+
+    def _mark_up(self):
+        self.consecutive_failures = 0
+        self.consecutive_successes += 1
+        if not self.healthy and self.consecutive_successes >= config.ROUTER_READMIT_AFTER_SUCCESSES:
+            self.healthy = True
+            print(f"Replica readmitted: {self.endpoint}")
+
+    def stats(self) -> dict:
+        return {
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "latency_ewma_ms": round(self.latency_ewma * 1000, 2),
+            "requests": self.requests,
+            "failures": self.failures,
+            "ejections": self.ejections,
+            "loaded_models": sorted(self.loaded_models),
+            "last_error": self.last_error,
+        }
+
+
+class _Lease:
+    """복제본 하나에서 진행 중인 요청 (스케줄러 슬롯 + outstanding 카운트)"""
+
+    __slots__ = ("replica", "ticket", "model", "started_at", "_released")
+
+    def __init__(self, replica: Replica, ticket, model: str):
+        self.replica = replica
+        self.ticket = ticket
+        self.model = model
+        self.started_at = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.ticket.release()
+            self.replica.outstanding -= 1
+            metrics.UPSTREAM_TOTAL_SECONDS.observe(time.monotonic() - self.started_at, self.model, self.replica.endpoint)
+
+
+class ReplicaRouter:
+    """
+    config.OLLAMA_REPLICAS의 모델별 복제본 중 하나를 골라 요청을 보냅니다.
+
+    - 진행 중 요청이 가장 적은(또는 EWMA 지연이 가장 짧은) 정상 복제본 우선
+    - 백그라운드로 /api/tags, /api/ps를 확인해 연속 실패 시 제외하고 회복 시 다시 포함
+    - 연결에 실패하거나(스트리밍은 응답 헤더 전에 끊긴 경우 포함) 대기열이 가득 찬 경우 다음 복제본으로 재시도
+    """
+
+    def __init__(self):
+        self._replicas: dict[str, Replica] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.failovers = 0
+        self.affinity_hits = 0
+
+    def replica(self, endpoint: str) -> Replica:
+        replica = self._replicas.get(endpoint)
+        if replica is None:
+            replica = self._replicas[endpoint] = Replica(endpoint)
+        return replica
+
+    def endpoints(self) -> list[str]:
+        """설정된 모든 복제본 엔드포인트"""
+        return sorted({endpoint for replicas in config.OLLAMA_REPLICAS.values() for endpoint in replicas})
+
+    def candidates(self, model: str) -> list[Replica]:
+        """시도할 순서대로 정렬한 복제본 (정상 복제본이 하나도 없으면 제외된 복제본도 시도)"""
+        replicas = [self.replica(endpoint) for endpoint in config.OLLAMA_REPLICAS.get(model, [])]
+        serving = [replica for replica in replicas if replica.serves(model)] or replicas
+        healthy = [replica for replica in serving if replica.healthy]
+        return sorted(healthy or serving, key=lambda replica: replica.score() + self._swap_penalty(replica, model))
+
+    def _swap_penalty(self, replica: Replica, model: str) -> float:
+        """모델을 새로 올려야 하는 복제본은 뒤로 (슬롯이 꽉 찬 것과 비슷한 비용으로 취급)"""
+        scheduler = schedulers.get(replica.endpoint)
+        if not scheduler.max_loaded_models or model in scheduler.resident_models:
+            return 0.0
+        return config.ROUTER_SWAP_PENALTY
+
+    async def open(
+        self,
+        model: str,
+        owner: str,
+        fn: Callable[[httpx.AsyncClient], Awaitable[Any]],
+        priority: Optional[Priority] = None,
+        affinity: Optional[Any] = None,
+        streaming: bool = True,
+    ) -> tuple[Any, Callable[[], None]]:
+        """
+        복제본을 골라 슬롯을 얻고 fn(client)를 실행해 (결과, release) 반환
+
+        스트리밍처럼 응답이 끝날 때까지 슬롯을 유지해야 하는 경우 사용하며,
+        호출자는 작업이 끝나면 반드시 release()를 호출해야 합니다.
+        affinity: endpoint 속성을 가진 객체 (예: 세션). 그 복제본이 정상이면 먼저 시도하고,
+        응답한 복제본으로 endpoint를 갱신합니다.
+        streaming: fn이 응답 헤더를 받자마자 돌아오는 경우 True (그때까지의 시간을 TTFB로 기록).
+        """
+        candidates = self.candidates(model)
+        if not candidates:
+            raise KeyError(model)
+        if affinity is not None and affinity.endpoint:
+            pinned = [replica for replica in candidates if replica.endpoint == affinity.endpoint]
+            if pinned:
+                self.affinity_hits += 1
+                candidates = pinned + [replica for replica in candidates if replica is not pinned[0]]
+
+        queue_full: Optional[QueueFullError] = None
+        last_error: Optional[Exception] = None
+        for attempt, replica in enumerate(candidates[:config.ROUTER_MAX_ATTEMPTS]):
+            if attempt:
+                self.failovers += 1
+            try:
+                ticket = await schedulers.get(replica.endpoint).acquire(owner, model, priority)
+            except QueueDeadlineError:
+                # 이미 최대 대기 시간을 다 썼으므로 다른 복제본에서 다시 기다리지 않음
+                raise
+            except QueueFullError as e:
+                if queue_full is None or e.retry_after < queue_full.retry_after:
+                    queue_full = e
+                continue
+
+            replica.outstanding += 1
+            replica.requests += 1
+            lease = _Lease(replica, ticket, model)
+            try:
+                result = await fn(ollama_clients.get(replica.endpoint))
+            except FAILOVER_ERRORS as e:
+                lease.release()
+                replica.record_failure(e)
+                metrics.UPSTREAM_ERRORS.inc(replica.endpoint)
+                if not streaming and not isinstance(e, CONNECT_ERRORS):
+                    raise
+                last_error = e
+                continue
+            except BaseException:
+                lease.release()
+                raise
+            if streaming:
+                ttfb = time.monotonic() - lease.started_at
+                replica.record_success(ttfb)
+                metrics.UPSTREAM_TTFB_SECONDS.observe(ttfb, model, replica.endpoint)
+            else:
+                # 비스트리밍 fn은 본문까지 다 받은 뒤 끝나므로 TTFB가 아님 (전체 시간은 UPSTREAM_TOTAL_SECONDS)
+                replica.record_success()
+            if affinity is not None:
+                affinity.endpoint = replica.endpoint
+            return result, lease.release
+
+        if last_error is not None:
+            raise last_error
+        raise queue_full
+
+    async def call(
+        self,
+        model: str,
+        owner: str,
+        fn: Callable[[httpx.AsyncClient], Awaitable[Any]],
+        priority: Optional[Priority] = None,
+        affinity: Optional[Any] = None,
+    ) -> Any:
+        """open()과 같지만 fn이 끝나면 바로 슬롯 반환 (비스트리밍 요청)"""
+        result, release = await self.open(model, owner, fn, priority, affinity, streaming=False)
+        release()
+        return result
+
+    # ---------- 헬스 체크 ----------
+
+    async def start(self):
+        for endpoint in self.endpoints():
+            self.replica(endpoint)
+        if self._task is None:
+            self._task = asyncio.create_task(self._probe_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _probe_loop(self):
+        while True:
+            try:
+                await self.probe_all()
+            except Exception as e:
+                print(f"복제본 헬스 체크 실패 (다음 주기에 재시도): {e}")
+            await asyncio.sleep(config.ROUTER_HEALTH_CHECK_INTERVAL_SECONDS)
+
+    async def probe_all(self):
+        await asyncio.gather(*(self.probe(self.replica(endpoint)) for endpoint in self.endpoints()))
+
+    async def probe(self, replica: Replica):
+        client = ollama_clients.get(replica.endpoint)
+        timeout = config.ROUTER_HEALTH_CHECK_TIMEOUT_SECONDS
+        try:
+            tags, ps = await asyncio.gather(
+                client.get("/api/tags", timeout=timeout),
+                client.get("/api/ps", timeout=timeout),
+            )
+            tags.raise_for_status()
+            ps.raise_for_status()
+            replica.available_models = {model["name"] for model in tags.json().get("models", [])}
+            replica.loaded_models = {model["name"] for model in ps.json().get("models", [])}
+            schedulers.get(replica.endpoint).observe_loaded(replica.loaded_models)
+        except Exception as e:
+            # 연결 실패뿐 아니라 형식이 잘못된 응답(name 없는 모델 항목 등)도 실패로 처리
+            replica.record_failure(e)
+        else:
+            replica._mark_up()
+        finally:
+            replica.last_probe_at = time.time()
+
+    def stats(self) -> dict:
+        return {
+            "failovers": self.failovers,
+            "affinity_hits": self.affinity_hits,
+            "replicas": {endpoint: replica.stats() for endpoint, replica in sorted(self._replicas.items())},
+        }
+
+
+router = ReplicaRouter()
+
+metrics.registry.gauge(
+    "gateway_replica_outstanding", "Requests routed to each replica and not yet finished", ("backend",),
+    lambda: {(endpoint,): replica.outstanding for endpoint, replica in router._replicas.items()})
+metrics.registry.gauge(
+    "gateway_replica_healthy", "1 if the replica is receiving traffic, 0 if ejected", ("backend",),
+    lambda: {(endpoint,): int(replica.healthy) for endpoint, replica in router._replicas.items()})
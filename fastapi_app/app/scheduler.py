@@ -0,0 +1,548 @@
+# fastapi_app/app/scheduler.py
+# 백엔드(Ollama 엔드포인트)별 동시 실행 수 제한 + 대기열 스케줄러
+
+import asyncio
+import math
+import time
+from collections import OrderedDict, defaultdict, deque
+from contextlib import asynccontextmanager
+from typing import Callable, Iterable, Optional
+from . import config, metrics
+
+
+class QueueFullError(Exception):
+    """대기열이 가득 차서 요청을 받을 수 없음 (HTTP 503 + Retry-After로 변환)"""
+
+    def __init__(self, endpoint: str, retry_after: int):
+        super().__init__(f"Backend {endpoint} is busy")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+class QueueDeadlineError(QueueFullError):
+    """최대 대기 시간 안에 슬롯을 얻지 못해 대기열에서 빠짐 (다른 복제본으로 재시도하지 않음)"""
+
+    def __init__(self, endpoint: str, retry_after: int, priority: str):
+        super().__init__(endpoint, retry_after)
+        self.args = (f"Queue wait deadline passed on {endpoint} ({priority})",)
+        self.priority = priority
+
+
+# 클래스별 대기 시간 백분위 계산에 쓰는 최근 표본 수
+WAIT_SAMPLES = 1024
+
+
+class Priority:
+    """요청의 우선순위 클래스 (rank가 작을수록 먼저) + 대기열 최대 대기 시간 (초, None이면 무제한)"""
+
+    __slots__ = ("name", "rank", "max_wait")
+
+    def __init__(self, name: str, max_wait: Optional[float] = None):
+        self.name = name
+        self.rank = config.PRIORITY_CLASSES.index(name)
+        self.max_wait = max_wait
+
+
+def resolve_priority(
+    requested: Optional[str],
+    key_class: Optional[str] = None,
+    default_class: Optional[str] = None,
+    max_wait: Optional[float] = None,
+) -> Priority:
+    """
+    요청 헤더 → 엔드포인트 기본값 → 키 클래스 → config 기본값 순으로 클래스를 정함
+    키에 priority_class가 있으면 그보다 높은 클래스는 키 클래스로 낮춤 (알 수 없는 클래스는 ValueError)
+    """
+    name = requested or default_class or key_class or config.PRIORITY_DEFAULT_CLASS
+    if name not in config.PRIORITY_CLASSES:
+        raise ValueError(f"Unknown priority class '{name}' (expected one of: {', '.join(config.PRIORITY_CLASSES)})")
+    if key_class in config.PRIORITY_CLASSES and config.PRIORITY_CLASSES.index(name) < config.PRIORITY_CLASSES.index(key_class):
+        name = key_class
+    if max_wait is None:
+        max_wait = config.PRIORITY_MAX_QUEUE_WAIT_SECONDS.get(name)
+    return Priority(name, max_wait)
+
+
+class Ticket:
+    """획득한 실행 슬롯. release()는 여러 번 호출해도 한 번만 반영됩니다."""
+
+    __slots__ = ("scheduler", "started_at", "wait_time", "swapped", "_released")
+
+    def __init__(self, scheduler: "BackendScheduler", wait_time: float, swapped: bool = False):
+        self.scheduler = scheduler
+        self.started_at = time.monotonic()
+        self.wait_time = wait_time
+        self.swapped = swapped  # 이 요청 때문에 백엔드가 모델을 교체해야 함
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.scheduler._release(time.monotonic() - self.started_at, self.swapped)
+
+
+class _Waiter:
+    __slots__ = ("owner", "model", "priority", "future", "enqueued_at", "swapped", "timer")
+
+    def __init__(self, owner: str, model: Optional[str], priority: Priority):
+        self.owner = owner
+        self.model = model
+        self.priority = priority
+        self.future = asyncio.get_running_loop().create_future()
+        self.enqueued_at = time.monotonic()
+        self.swapped = False
+        self.timer: Optional[asyncio.TimerHandle] = None  # 최대 대기 시간 만료 타이머
+
+
+class _Batch:
+    """마이크로배칭으로 모으는 중인 같은 모델 요청들"""
+
+    __slots__ = ("model", "waiters", "timer")
+
+    def __init__(self, model: Optional[str]):
+        self.model = model
+        self.waiters: list[_Waiter] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class BackendScheduler:
+    """
+    하나의 Ollama 백엔드에 대한 게이트웨이 측 스케줄러
+
+    - 동시에 업스트림으로 보내는 요청 수를 max_inflight(OLLAMA_NUM_PARALLEL과 동일하게)로 제한
+    - 초과 요청은 API 키 소유자별 대기열에 넣고 소유자 간 라운드로빈으로 꺼냄
+      (한 소유자가 요청을 몰아 보내도 다른 소유자가 굶지 않음)
+    - 대기열이 max_queue를 넘으면 즉시 QueueFullError
+    - 우선순위 클래스(config.PRIORITY_CLASSES)가 높은 요청을 먼저 꺼냄. 대기 시간이
+      PRIORITY_AGING_SECONDS 늘 때마다 한 단계씩 올려서 낮은 클래스도 결국 처리되고,
+      최대 대기 시간(Priority.max_wait)이 지난 요청은 대기열에서 빼고 QueueDeadlineError
+    - microbatch_window가 주어지면 빈 슬롯이 있어도 같은 모델 요청을 잠깐 모았다가 함께 보냄.
+      창 크기는 빈 슬롯 수와 몰려 들어올 때의 도착 간격으로 정하며, 요청이 드문드문 오면 0 (바로 전달)
+    - max_loaded_models가 주어지면 백엔드에 올라가 있는(resident) 모델 요청을 먼저 꺼내
+      모델 교체(swap)를 줄임. 다른 모델 요청이 SCHEDULER_RESIDENT_MAX_CONSECUTIVE번 연속으로
+      밀렸거나 SCHEDULER_RESIDENT_MAX_WAIT_SECONDS 이상 기다렸으면 가장 오래된 요청을 먼저 처리
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        max_inflight: int,
+        max_queue: int,
+        max_loaded_models: Optional[int] = None,
+        microbatch_window: Optional[float] = None,
+    ):
+        self.endpoint = endpoint
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.max_loaded_models = max_loaded_models
+        self.in_flight = 0
+        self._queues: OrderedDict[str, deque[_Waiter]] = OrderedDict()
+        self._queued = 0
+        # 백엔드에 올라가 있는 모델 (오래 사용하지 않은 순, /api/ps + 디스패치 기록)
+        self._resident: OrderedDict[str, None] = OrderedDict()
+        self._bypass_streak = 0
+        # 마이크로배칭 (도착 간격 EWMA로 창 크기 결정)
+        self.microbatch_window = microbatch_window
+        self._batch: Optional[_Batch] = None
+        self._last_arrival: Optional[float] = None
+        self._gap_ewma = 0.0     # 창 안에 연달아 도착한 요청 사이 간격
+        self._follow_ewma = 0.0  # 직전 요청 후 창 안에 도착한 요청 비율
+
+        # 메트릭
+        self.dispatched = 0
+        self.rejected = 0
+        self.max_wait_ms = 0.0
+        self._total_wait_ms = 0.0
+        self._service_time_ewma = 0.0
+        self.swaps = 0
+        self.starvation_swaps = 0
+        self._swap_service_time_ewma = 0.0
+        self.aged_dispatches = 0
+        self.expired: defaultdict[str, int] = defaultdict(int)
+        self._waits: defaultdict[str, deque[float]] = defaultdict(lambda: deque(maxlen=WAIT_SAMPLES))
+        self._dispatched_by_class: defaultdict[str, int] = defaultdict(int)
+        self.microbatches = 0
+        self.microbatched = 0
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    async def acquire(self, owner: str, model: Optional[str] = None, priority: Optional[Priority] = None) -> Ticket:
+        """
+        실행 슬롯을 얻을 때까지 대기
+        (대기열이 가득 차면 QueueFullError, 최대 대기 시간이 지나면 QueueDeadlineError)
+        """
+        priority = priority or Priority(config.PRIORITY_DEFAULT_CLASS)
+        if self.microbatch_window:
+            self._observe_arrival()
+            if self._batch is not None and self._batch.model != model:
+                # 다른 모델 요청: 모으던 요청을 먼저 보냄
+                self._flush_batch()
+        if self.in_flight + self._batching < self.max_inflight and not self._queued:
+            if self._batch is not None or self._batch_window() > 0:
+                return await self._join_batch(owner, model, priority)
+            self.in_flight += 1
+            return self._admit(0.0, priority, self._load(model))
+
+        if self._queued >= self.max_queue:
+            self.rejected += 1
+            raise QueueFullError(self.endpoint, self.retry_after())
+
+        waiter = _Waiter(owner, model, priority)
+        self._queues.setdefault(owner, deque()).append(waiter)
+        self._queued += 1
+        if priority.max_wait is not None:
+            waiter.timer = asyncio.get_running_loop().call_later(priority.max_wait, self._expire, waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            future = waiter.future
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # 슬롯을 받은 직후 취소된 경우: 슬롯을 바로 반환
+                self.in_flight -= 1
+                self._dispatch()
+            else:
+                self._remove(waiter)
+            raise
+        return self._admit(time.monotonic() - waiter.enqueued_at, priority, waiter.swapped)
+
+    @asynccontextmanager
+    async def slot(self, owner: str, model: Optional[str] = None):
+        ticket = await self.acquire(owner, model)
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    def _admit(self, wait_time: float, priority: Priority, swapped: bool = False) -> Ticket:
+        wait_ms = wait_time * 1000
+        self.dispatched += 1
+        self._total_wait_ms += wait_ms
+        self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+        self._dispatched_by_class[priority.name] += 1
+        self._waits[priority.name].append(wait_time)
+        metrics.QUEUE_WAIT_SECONDS.observe(wait_time, self.endpoint, priority.name)
+        return Ticket(self, wait_time, swapped)
+
+    # ---------- 마이크로배칭 ----------
+
+    @property
+    def _batching(self) -> int:
+        return len(self._batch.waiters) if self._batch is not None else 0
+
+    def _observe_arrival(self):
+        alpha = 0.2
+        now = time.monotonic()
+        if self._last_arrival is not None:
+            gap = now - self._last_arrival
+            follows = gap <= self.microbatch_window
+            self._follow_ewma = alpha * follows + (1 - alpha) * self._follow_ewma
+            if follows:
+                self._gap_ewma = alpha * gap + (1 - alpha) * self._gap_ewma if self._gap_ewma else gap
+        self._last_arrival = now
+
+    def _batch_window(self) -> float:
+        """
+        새 배치를 열 때 기다릴 시간 (0이면 바로 전달)
+        남은 빈 슬롯을 연달아 도착하는 간격으로 채우는 데 걸릴 예상 시간, 최대 microbatch_window
+        """
+        if not self.microbatch_window or self._follow_ewma < config.MICROBATCH_MIN_FOLLOW_RATIO:
+            return 0.0
+        remaining = self.max_inflight - self.in_flight - 1
+        if remaining <= 0 or not self._gap_ewma:
+            return 0.0
+        return min(self.microbatch_window, self._gap_ewma * remaining)
+
+    async def _join_batch(self, owner: str, model: Optional[str], priority: Priority) -> Ticket:
+        if self._batch is None:
+            self._batch = _Batch(model)
+            self._batch.timer = asyncio.get_running_loop().call_later(self._batch_window(), self._flush_batch)
+        batch = self._batch
+        waiter = _Waiter(owner, model, priority)
+        batch.waiters.append(waiter)
+        if self.in_flight + len(batch.waiters) >= self.max_inflight:
+            # 빈 슬롯을 모두 채움: 창이 끝나기 전에 바로 보냄
+            self._flush_batch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.in_flight -= 1
+                self._dispatch()
+            elif waiter in batch.waiters:
+                batch.waiters.remove(waiter)
+                if not batch.waiters and self._batch is batch:
+                    batch.timer.cancel()
+                    self._batch = None
+            raise
+        return self._admit(time.monotonic() - waiter.enqueued_at, priority, waiter.swapped)
+
+    def _flush_batch(self):
+        """모은 요청을 한꺼번에 슬롯에 배정"""
+        batch, self._batch = self._batch, None
+        if batch is None:
+            return
+        batch.timer.cancel()
+        waiters = [waiter for waiter in batch.waiters if not waiter.future.done()]
+        for waiter in waiters:
+            self.in_flight += 1
+            waiter.swapped = self._load(waiter.model)
+            waiter.future.set_result(None)
+        if waiters:
+            self.microbatches += 1
+            self.microbatched += len(waiters)
+
+    def _expire(self, waiter: _Waiter):
+        """최대 대기 시간 만료: 아직 대기 중이면 대기열에서 빼고 QueueDeadlineError 전달"""
+        if waiter.future.done():
+            return
+        self._remove(waiter)
+        self.expired[waiter.priority.name] += 1
+        waiter.future.set_exception(QueueDeadlineError(self.endpoint, self.retry_after(), waiter.priority.name))
+
+    def _release(self, service_time: float, swapped: bool = False):
+        self.in_flight -= 1
+        alpha = 0.2
+        if swapped:
+            if self._swap_service_time_ewma:
+                self._swap_service_time_ewma = alpha * service_time + (1 - alpha) * self._swap_service_time_ewma
+            else:
+                self._swap_service_time_ewma = service_time
+        elif self._service_time_ewma:
+            self._service_time_ewma = alpha * service_time + (1 - alpha) * self._service_time_ewma
+        else:
+            self._service_time_ewma = service_time
+        self._dispatch()
+
+    def _dispatch(self):
+        while self.in_flight < self.max_inflight and self._queued:
+            waiter = self._pick_next()
+            self.in_flight += 1
+            waiter.swapped = self._load(waiter.model)
+            waiter.future.set_result(None)
+
+    # ---------- 모델 상주(residency) ----------
+
+    def _tracks_residency(self) -> bool:
+        return bool(self.max_loaded_models) and config.SCHEDULER_RESIDENCY_AWARE
+
+    def _load(self, model: Optional[str]) -> bool:
+        """model 요청을 보냄 → 상주 모델 목록 갱신, 모델 교체가 일어나면 True"""
+        if model is None or not self.max_loaded_models:
+            return False
+        if model in self._resident:
+            self._resident.move_to_end(model)
+            return False
+        self._resident[model] = None
+        if len(self._resident) <= self.max_loaded_models:
+            return False
+        while len(self._resident) > self.max_loaded_models:
+            self._resident.popitem(last=False)
+        self.swaps += 1
+        return True
+
+    def observe_loaded(self, models: Iterable[str]):
+        """/api/ps로 확인한 실제 적재 모델 반영 (최근 디스패치 순서는 유지)"""
+        models = set(models)
+        for model in list(self._resident):
+            if model not in models:
+                del self._resident[model]
+        for model in models:
+            if model not in self._resident:
+                self._resident[model] = None
+                self._resident.move_to_end(model, last=False)
+
+    @property
+    def resident_models(self) -> list[str]:
+        return list(self._resident)
+
+    def _effective_rank(self, waiter: _Waiter, now: float) -> int:
+        """대기 시간만큼 올라간(aging) 우선순위 클래스"""
+        aging = config.PRIORITY_AGING_SECONDS
+        if not aging:
+            return waiter.priority.rank
+        return max(0, waiter.priority.rank - int((now - waiter.enqueued_at) / aging))
+
+    def _pick_next(self) -> _Waiter:
+        # 가장 높은(aging 반영) 클래스의 요청만 후보로 두고, 그 안에서 상주 모델/라운드로빈 적용
+        now = time.monotonic()
+        ranks = {waiter: self._effective_rank(waiter, now) for queue in self._queues.values() for waiter in queue}
+        best = min(ranks.values())
+        waiter = None
+        if self._tracks_residency() and self._resident:
+            waiter = self._pick_resident(lambda candidate: ranks[candidate] == best)
+
+        if waiter is None:
+            # 소유자 간 라운드로빈: 후보가 있는 첫 소유자의 가장 오래된 요청을 꺼내고 소유자를 맨 뒤로 보냄
+            owner, queue, waiter = next(
+                (owner, queue, candidate)
+                for owner, queue in self._queues.items()
+                for candidate in queue
+                if ranks[candidate] == best
+            )
+            self._take(owner, queue, waiter)
+        if best < waiter.priority.rank:
+            self.aged_dispatches += 1
+        return waiter
+
+    def _pick_resident(self, eligible: Callable[[_Waiter], bool]) -> Optional[_Waiter]:
+        """
+        상주 모델 요청을 소유자 라운드로빈 순서로 선택
+        다른 모델 요청이 굶고 있으면 그중 가장 오래된 요청을 반환 (모델 교체 허용)
+        """
+        resident_pick = None
+        oldest_other = None
+        for owner, queue in self._queues.items():
+            for waiter in queue:
+                if not eligible(waiter):
+                    continue
+                if waiter.model in self._resident:
+                    if resident_pick is None:
+                        resident_pick = (owner, queue, waiter)
+                elif oldest_other is None or waiter.enqueued_at < oldest_other[2].enqueued_at:
+                    oldest_other = (owner, queue, waiter)
+
+        if oldest_other is None:
+            self._bypass_streak = 0
+            return self._take(*resident_pick) if resident_pick else None
+        if resident_pick is None:
+            return None
+
+        starving = (
+            self._bypass_streak >= config.SCHEDULER_RESIDENT_MAX_CONSECUTIVE
+            or time.monotonic() - oldest_other[2].enqueued_at >= config.SCHEDULER_RESIDENT_MAX_WAIT_SECONDS
+        )
+        if starving:
+            self._bypass_streak = 0
+            self.starvation_swaps += 1
+            return self._take(*oldest_other)
+        self._bypass_streak += 1
+        return self._take(*resident_pick)
+
+    def _take(self, owner: str, queue: deque, waiter: _Waiter) -> _Waiter:
+        if waiter.timer is not None:
+            waiter.timer.cancel()
+        queue.remove(waiter)
+        if queue:
+            self._queues.move_to_end(owner)
+        else:
+            del self._queues[owner]
+        self._queued -= 1
+        return waiter
+
+    def _remove(self, waiter: _Waiter):
+        if waiter.timer is not None:
+            waiter.timer.cancel()
+        queue = self._queues.get(waiter.owner)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            self._queued -= 1
+            if not queue:
+                del self._queues[waiter.owner]
+
+    def retry_after(self) -> int:
+        """현재 대기열이 빠지는 데 걸릴 예상 시간 (초)"""
+        service_time = self._service_time_ewma or config.SCHEDULER_DEFAULT_RETRY_AFTER_SECONDS
+        return max(1, math.ceil(service_time * (self._queued + 1) / self.max_inflight))
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_inflight": self.max_inflight,
+            "queued": self._queued,
+            "max_queue": self.max_queue,
+            "queued_by_owner": {owner: len(queue) for owner, queue in self._queues.items()},
+            "queued_by_class": self._queued_by_class(),
+            "dispatched": self.dispatched,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self._total_wait_ms / self.dispatched, 2) if self.dispatched else 0.0,
+            "max_wait_ms": round(self.max_wait_ms, 2),
+            "avg_service_ms": round(self._service_time_ewma * 1000, 2),
+            "resident_models": self.resident_models,
+            "swaps": self.swaps,
+            "starvation_swaps": self.starvation_swaps,
+            "avg_swap_service_ms": round(self._swap_service_time_ewma * 1000, 2),
+            # 모델 교체로 늘어난 처리 시간 추정치 (교체 요청 - 일반 요청 평균)
+            "swap_overhead_ms": round(max(0.0, self._swap_service_time_ewma - self._service_time_ewma) * 1000, 2)
+            if self._swap_service_time_ewma and self._service_time_ewma else None,
+            "aged_dispatches": self.aged_dispatches,
+            "microbatch": {
+                "batches": self.microbatches,
+                "avg_size": round(self.microbatched / self.microbatches, 2) if self.microbatches else None,
+                "window_ms": round(self._batch_window() * 1000, 2),
+                "arrival_gap_ms": round(self._gap_ewma * 1000, 2),
+                "follow_ratio": round(self._follow_ewma, 2),
+            } if self.microbatch_window else None,
+            "wait_by_class": {
+                name: {
+                    "dispatched": self._dispatched_by_class[name],
+                    "expired": self.expired[name],
+                    "p50_ms": _percentile_ms(self._waits[name], 0.50),
+                    "p99_ms": _percentile_ms(self._waits[name], 0.99),
+                }
+                for name in config.PRIORITY_CLASSES
+                if self._dispatched_by_class[name] or self.expired[name]
+            },
+        }
+
+    def _queued_by_class(self) -> dict[str, int]:
+        counts: dict[str, int] = {}
+        for queue in self._queues.values():
+            for waiter in queue:
+                counts[waiter.priority.name] = counts.get(waiter.priority.name, 0) + 1
+        return counts
+
+
+def _percentile_ms(samples: Iterable[float], q: float) -> Optional[float]:
+    """최근 대기 시간 표본의 백분위 (nearest-rank, ms)"""
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    return round(ordered[max(0, math.ceil(q * len(ordered)) - 1)] * 1000, 2)
+
+
+class SchedulerRegistry:
+    """엔드포인트별 BackendScheduler (config.BACKEND_MAX_INFLIGHT 기준으로 지연 생성)"""
+
+    def __init__(self):
+        self._schedulers: dict[str, BackendScheduler] = {}
+
+    def get(self, endpoint: str) -> BackendScheduler:
+        scheduler = self._schedulers.get(endpoint)
+        if scheduler is None:
+            scheduler = BackendScheduler(
+                endpoint,
+                max_inflight=config.BACKEND_MAX_INFLIGHT.get(endpoint, 1),
+                max_queue=config.BACKEND_MAX_QUEUE.get(endpoint, config.SCHEDULER_DEFAULT_MAX_QUEUE),
+                max_loaded_models=config.BACKEND_MAX_LOADED_MODELS.get(endpoint),
+                microbatch_window=config.BACKEND_MICROBATCH_MAX_WINDOW_SECONDS.get(endpoint),
+            )
+            self._schedulers[endpoint] = scheduler
+        return scheduler
+
+    def stats(self) -> dict[str, dict]:
+        return {endpoint: scheduler.stats() for endpoint, scheduler in self._schedulers.items()}
+
+
+schedulers = SchedulerRegistry()
+
+metrics.registry.gauge(
+    "gateway_backend_in_flight", "Requests currently running on each backend", ("backend",),
+    lambda: {(endpoint,): scheduler.in_flight for endpoint, scheduler in schedulers._schedulers.items()})
+metrics.registry.gauge(
+    "gateway_backend_queued", "Requests waiting for a backend slot", ("backend",),
+    lambda: {(endpoint,): scheduler.queued for endpoint, scheduler in schedulers._schedulers.items()})
+metrics.registry.counter_callback(
+    "gateway_backend_model_swaps_total", "Dispatches that required the backend to load a different model", ("backend",),
+    lambda: {(endpoint,): scheduler.swaps for endpoint, scheduler in schedulers._schedulers.items()})
+metrics.registry.counter_callback(
+    "gateway_backend_rejected_total", "Requests rejected because the backend queue was full", ("backend",),
+    lambda: {(endpoint,): scheduler.rejected for endpoint, scheduler in schedulers._schedulers.items()})
+metrics.registry.counter_callback(
+    "gateway_backend_queue_deadline_expired_total", "Requests dropped from the queue after their max queue wait", ("backend", "priority"),
+    lambda: {
+        (endpoint, name): count
+        for endpoint, scheduler in schedulers._schedulers.items()
+        for name, count in scheduler.expired.items()
+    })
@@ -0,0 +1,155 @@
+# fastapi_app/app/sessions.py
+# /v1/generate 세션: Ollama가 돌려준 context(토큰 배열)를 게이트웨이에 보관했다가 다음 요청에 다시 넣음
+#
+# 클라이언트는 session_id만 보내고 이전 대화를 다시 보내지 않으며, 세션은 마지막으로 응답한
+# 복제본에 고정(affinity)되어 그 서버의 KV 캐시를 재사용합니다 (prompt_eval 시간 단축).
+# 토큰은 array('I')(토큰당 4바이트)로 저장하고 전체 크기는 SESSIONS_MAX_BYTES 이하로 LRU 관리합니다.
+
+import time
+from array import array
+from collections import OrderedDict, defaultdict
+from typing import Optional
+from . import config, metrics
+
+# 세션 하나의 고정 오버헤드 추정치 (객체, 키, dict 항목)
+SESSION_OVERHEAD_BYTES = 256
+
+
+class Session:
+    __slots__ = ("owner", "session_id", "model", "endpoint", "context", "turns", "created_at", "updated_at")
+
+    def __init__(self, owner: str, session_id: str, model: str):
+        self.owner = owner
+        self.session_id = session_id
+        self.model = model
+        self.endpoint: Optional[str] = None  # 마지막으로 응답한 복제본 (ReplicaRouter affinity)
+        self.context = array("I")
+        self.turns = 0
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+
+    @property
+    def size(self) -> int:
+        return SESSION_OVERHEAD_BYTES + self.context.itemsize * len(self.context)
+
+    def info(self) -> dict:
+        return {
+            "session_id": self.session_id,
+            "model": self.model,
+            "endpoint": self.endpoint,
+            "turns": self.turns,
+            "context_tokens": len(self.context),
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+
+class SessionStore:
+    """(소유자, session_id) → Session LRU (바이트 예산 + 유휴 TTL)"""
+
+    def __init__(self, max_bytes: int = config.SESSIONS_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._sessions: OrderedDict[tuple[str, str], Session] = OrderedDict()
+        self._bytes = 0
+
+        # 메트릭
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.resets = 0
+        # context 재사용 여부("replayed"/"fresh")별 prompt_eval 합계
+        self._prompt_eval: defaultdict[str, list[float]] = defaultdict(lambda: [0, 0, 0.0])
+
+    def get(self, owner: str, session_id: str, model: str) -> Session:
+        """세션 반환 (없거나 만료되었거나 모델이 바뀌었으면 새 세션)"""
+        key = (owner, session_id)
+        session = self._sessions.get(key)
+        if session is not None and (
+            session.model != model or time.time() - session.updated_at > config.SESSIONS_IDLE_TTL_SECONDS
+        ):
+            # context 토큰은 모델별이라 다른 모델에 넣을 수 없음
+            self._drop(key)
+            session = None
+        if session is None:
+            self.misses += 1
+            session = Session(owner, session_id, model)
+            self._sessions[key] = session
+            self._bytes += session.size
+        else:
+            self.hits += 1
+            self._sessions.move_to_end(key)
+        self._evict()
+        return session
+
+    def peek(self, owner: str, session_id: str) -> Optional[Session]:
+        return self._sessions.get((owner, session_id))
+
+    def update(self, session: Session, context: Optional[list[int]]):
+        """응답의 context로 세션 갱신 (너무 길어지면 비워서 다음 요청부터 새로 시작)"""
+        key = (session.owner, session.session_id)
+        if self._sessions.get(key) is not session:
+            return  # 그사이 삭제/교체됨
+        self._bytes -= session.size
+        if context and len(context) <= config.SESSIONS_MAX_CONTEXT_TOKENS:
+            session.context = array("I", context)
+        else:
+            if context:
+                self.resets += 1
+            session.context = array("I")
+        session.turns += 1
+        session.updated_at = time.time()
+        self._bytes += session.size
+        self._sessions.move_to_end(key)
+        self._evict()
+
+    def delete(self, owner: str, session_id: str) -> bool:
+        return self._drop((owner, session_id))
+
+    def _drop(self, key) -> bool:
+        session = self._sessions.pop(key, None)
+        if session is None:
+            return False
+        self._bytes -= session.size
+        return True
+
+    def _evict(self):
+        # 가장 최근 세션은 예산보다 커도 남김 (다음 요청에서 바로 쓰임)
+        while self._bytes > self.max_bytes and len(self._sessions) > 1:
+            _, session = self._sessions.popitem(last=False)
+            self._bytes -= session.size
+            self.evictions += 1
+
+    def record_prompt_eval(self, model: str, replayed: bool, body: Optional[dict]):
+        """context를 다시 넣은 요청과 아닌 요청의 prompt_eval 비교용 집계"""
+        if not body or not body.get("done"):
+            return
+        mode = "replayed" if replayed else "fresh"
+        if body.get("prompt_eval_duration"):
+            metrics.GENERATE_PROMPT_EVAL_SECONDS.observe(body["prompt_eval_duration"] / 1e9, model, mode)
+        totals = self._prompt_eval[mode]
+        totals[0] += 1
+        totals[1] += body.get("prompt_eval_count") or 0
+        totals[2] += (body.get("prompt_eval_duration") or 0) / 1e6
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "resets": self.resets,
+            "prompt_eval": {
+                mode: {
+                    "requests": requests,
+                    "avg_prompt_tokens": round(tokens / requests, 1),
+                    "avg_prompt_eval_ms": round(duration_ms / requests, 2),
+                }
+                for mode, (requests, tokens, duration_ms) in self._prompt_eval.items()
+                if requests
+            },
+        }
+
+
+session_store = SessionStore()
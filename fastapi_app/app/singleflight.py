@@ -0,0 +1,66 @@
+# fastapi_app/app/singleflight.py
+# 동시에 들어온 동일 요청을 하나의 업스트림 호출로 합치기 (single-flight)
+
+import asyncio
+from typing import Any, Awaitable, Callable
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    같은 키로 진행 중인 호출이 있으면 새로 호출하지 않고 그 결과(또는 예외)를 함께 받습니다.
+
+    업스트림 호출은 별도 태스크로 실행되므로 처음 요청한 클라이언트가 끊겨도
+    나머지 대기자는 결과를 받을 수 있고, 모든 대기자가 떠나면 호출을 취소합니다.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, _Call] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+        """(결과, 다른 요청과 공유했는지 여부) 반환"""
+        call = self._calls.get(key)
+        shared = call is not None
+        if call is None:
+            call = _Call(asyncio.create_task(fn()))
+            call.task.add_done_callback(lambda task: self._forget(key, call, task))
+            self._calls[key] = call
+            self.leaders += 1
+        else:
+            self.followers += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task), shared
+        except asyncio.CancelledError:
+            if not call.task.done() and call.waiters == 1:
+                call.task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+
+    def _forget(self, key: str, call: _Call, task: asyncio.Task):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        if not task.cancelled():
+            # 대기자가 모두 떠난 뒤 실패한 경우 "exception was never retrieved" 경고 방지
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "in_progress": len(self._calls),
+            "leaders": self.leaders,
+            "coalesced": self.followers,
+        }
+
+
+singleflight = SingleFlight()
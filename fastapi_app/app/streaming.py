@@ -0,0 +1,144 @@
+# fastapi_app/app/streaming.py
+# Ollama NDJSON 스트림을 클라이언트로 그대로 중계하는 헬퍼
+
+import json
+import anyio
+import httpx
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+SSE_MEDIA_TYPE = "text/event-stream"
+
+# 스트림 종료 후 호출되는 콜백: (조립된 전체 텍스트, 마지막 done 청크 또는 None)
+StreamFinishCallback = Callable[[str, Optional[dict]], Awaitable[None]]
+
+
+def media_type_for(stream_format: str) -> str:
+    return SSE_MEDIA_TYPE if stream_format == "sse" else NDJSON_MEDIA_TYPE
+
+
+async def open_stream(client: httpx.AsyncClient, path: str, payload: dict) -> httpx.Response:
+    """
+    업스트림 스트리밍 요청을 열고 상태 코드를 확인합니다.
+
+    응답 헤더를 보내기 전에 연결 오류/HTTP 오류를 드러내기 위해
+    StreamingResponse 생성 전에 호출합니다.
+    """
+    request = client.build_request("POST", path, json=payload)
+    response = await client.send(request, stream=True)
+    if response.is_error:
+        await response.aread()
+        await response.aclose()
+        response.raise_for_status()
+    return response
+
+
+def _generate_text(chunk: dict) -> str:
+    return chunk.get("response", "")
+
+
+async def relay(
+    response: httpx.Response,
+    stream_format: str,
+    on_finish: StreamFinishCallback,
+    text_of: Callable[[dict], str] = _generate_text,
+    drop_final_keys: tuple[str, ...] = (),
+) -> AsyncIterator[bytes]:
+    """
+    Ollama의 NDJSON 청크를 도착하는 즉시 NDJSON 또는 SSE로 전달합니다.
+
+    - 다음 청크는 이전 청크 전송이 끝난 뒤에만 읽으므로 업스트림에 자연스럽게 backpressure가 걸립니다.
+    - 클라이언트 연결이 끊기면 제너레이터가 취소되고 업스트림 연결을 닫아 GPU 슬롯을 반환합니다.
+    - 전체 텍스트는 청크 단위로 누적해 스트림 종료 후 on_finish에 전달합니다.
+    - drop_final_keys: 마지막(done) 청크에서 빼고 보낼 키 (예: 게이트웨이가 보관하는 context)
+    """
+    parts: list[str] = []
+    final_chunk = None
+    try:
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            try:
+                chunk = json.loads(line)
+            except ValueError:
+                chunk = {}
+            parts.append(text_of(chunk))
+            if chunk.get("done"):
+                final_chunk = chunk
+                if any(key in chunk for key in drop_final_keys):
+                    line = json.dumps(
+                        {key: value for key, value in chunk.items() if key not in drop_final_keys},
+                        ensure_ascii=False
+                    )
+
+            if stream_format == "sse":
+                yield f"data: {line}\n\n".encode("utf-8")
+            else:
+                yield f"{line}\n".encode("utf-8")
+    finally:
+        # 취소된 상태에서도 정리 작업이 끝까지 실행되도록 보호
+        with anyio.CancelScope(shield=True):
+            await response.aclose()
+            try:
+                await on_finish("".join(parts), final_chunk)
+            except Exception as e:
+                print(f"스트림 종료 처리 중 에러: {e}")
+
+
+class RelayResponse(StreamingResponse):
+    """
+    업스트림 스트림을 중계하는 StreamingResponse
+
+    응답이 어떤 식으로 끝나든(정상 종료, 클라이언트 연결 끊김, 전송 시작 전 취소)
+    업스트림 연결을 닫고 on_close(예: 스케줄러 슬롯 반환)를 정확히 한 번 호출합니다.
+    """
+
+    def __init__(
+        self,
+        upstream: httpx.Response,
+        stream_format: str,
+        on_finish: StreamFinishCallback,
+        on_close: Optional[Callable[[], None]] = None,
+        text_of: Callable[[dict], str] = _generate_text,
+        headers: Optional[dict] = None,
+        drop_final_keys: tuple[str, ...] = (),
+    ):
+        super().__init__(
+            relay(upstream, stream_format, on_finish, text_of, drop_final_keys),
+            media_type=media_type_for(stream_format),
+            headers=headers,
+        )
+        self.upstream = upstream
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            with anyio.CancelScope(shield=True):
+                await self.body_iterator.aclose()
+                await self.upstream.aclose()
+                if self.on_close is not None:
+                    self.on_close()
+
+
+class ClosingStreamingResponse(StreamingResponse):
+    """
+    응답이 어떤 식으로 끝나든(정상 종료, 클라이언트 연결 끊김, 전송 시작 전 취소)
+    본문 제너레이터를 닫고 on_close(예: 임시 파일 삭제)를 정확히 한 번 호출하는 StreamingResponse
+
+    본문 제너레이터의 finally는 제너레이터가 한 번도 시작되지 않으면 실행되지 않으므로 정리는 여기서 합니다.
+    """
+
+    def __init__(self, content, on_close: Callable[[], Awaitable[None]], **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            with anyio.CancelScope(shield=True):
+                await self.body_iterator.aclose()
+                await self.on_close()
@@ -0,0 +1,105 @@
+# fastapi_app/app/usage.py
+# API 키/모델별 토큰 수와 GPU 시간 집계
+#
+# request_count는 호출 횟수만 세므로 5토큰 요청과 4,000토큰 gpt-oss:20b 요청이 같게 보입니다.
+# Ollama 최종 응답(done 청크)의 prompt_eval_count, eval_count, *_duration을 메모리에 누적했다가
+# 백그라운드에서 usage_daily 테이블에 일괄 반영합니다.
+
+import asyncio
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Optional
+from . import config, database
+
+_FIELDS = len(database.USAGE_COLUMNS)
+
+
+def usage_of(body: dict) -> tuple:
+    """Ollama 응답 본문 → USAGE_COLUMNS 순서의 증가분 (나노초 → ms)"""
+    return (
+        1,
+        body.get("prompt_eval_count") or 0,
+        body.get("eval_count") or 0,
+        (body.get("prompt_eval_duration") or 0) / 1e6,
+        (body.get("eval_duration") or 0) / 1e6,
+        (body.get("load_duration") or 0) / 1e6,
+        (body.get("total_duration") or 0) / 1e6,
+    )
+
+
+class UsageMeter:
+    """
+    (키 id, 소유자, 모델, 일자)별 사용량을 메모리에 누적하고 주기적으로 DB에 반영
+
+    gpu_ms(owner)는 게이트웨이 시작 이후 소유자별 GPU 시간(ms)으로, 공정 분배 스케줄링에 사용할 수 있습니다.
+    """
+
+    def __init__(self):
+        self._pending: defaultdict[tuple, list[float]] = defaultdict(lambda: [0] * _FIELDS)
+        self._gpu_ms_by_owner: defaultdict[str, float] = defaultdict(float)
+        self._task: Optional[asyncio.Task] = None
+        self.flushes = 0
+
+    def record(self, api_key: dict, model: str, body: Optional[dict]):
+        """업스트림 호출 1회의 사용량 기록 (캐시 응답이나 공유된 single-flight 결과는 기록하지 않음)"""
+        if not body or not body.get("done", True):
+            return
+        owner = api_key.get("owner", "unknown")
+        delta = usage_of(body)
+        totals = self._pending[(api_key.get("id"), owner, model, date.today().isoformat())]
+        for index, value in enumerate(delta):
+            totals[index] += value
+        self._gpu_ms_by_owner[owner] += delta[-1]
+
+    def gpu_ms(self, owner: str) -> float:
+        return self._gpu_ms_by_owner.get(owner, 0.0)
+
+    async def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, defaultdict(lambda: [0] * _FIELDS)
+        rows = [(*key, *totals) for key, totals in pending.items()]
+        try:
+            await asyncio.to_thread(database.add_usage, rows)
+            self.flushes += 1
+        except Exception as e:
+            print(f"사용량 반영 실패 (다음 주기에 재시도): {e}")
+            for key, totals in pending.items():
+                merged = self._pending[key]
+                for index, value in enumerate(totals):
+                    merged[index] += value
+
+    async def report(self, days: int = 7, owner: Optional[str] = None) -> list[dict]:
+        """최근 days일의 소유자/모델별 사용량 (아직 반영 전인 메모리 누적분 포함)"""
+        await self.flush()
+        since = (date.today() - timedelta(days=days - 1)).isoformat()
+        rows = await asyncio.to_thread(database.get_usage, since, owner)
+        for row in rows:
+            row["tokens_per_second"] = round(row["completion_tokens"] / (row["eval_ms"] / 1000), 2) if row["eval_ms"] else None
+        return rows
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(config.USAGE_FLUSH_INTERVAL_SECONDS)
+            await self.flush()
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending_rows": len(self._pending),
+            "flushes": self.flushes,
+            "gpu_ms_by_owner": {owner: round(ms, 1) for owner, ms in self._gpu_ms_by_owner.items()},
+        }
+
+
+usage_meter = UsageMeter()
@@ -0,0 +1,162 @@
+# fastapi_app/app/warmup.py
+# 모델 워밍업 + keep-warm 관리
+#
+# 서버 시작을 막지 않고 백그라운드에서 config.WARMUP_MODELS의 모델을 올립니다.
+# 백엔드끼리는 병렬로, 같은 백엔드 안에서는 순서대로 로드합니다 (GPU 메모리 경합 방지).
+# 이후 주기적으로 /api/ps를 확인해 내려간 모델을 백엔드가 한가할 때 다시 올립니다.
+
+import asyncio
+import time
+from typing import Optional
+import httpx
+from . import config
+from .clients import registry as ollama_clients
+from .scheduler import schedulers
+
+WARMUP_OWNER = "__warmup__"
+
+
+class ModelWarmth:
+    """백엔드 하나에 올릴 모델 하나의 워밍업 상태"""
+
+    def __init__(self, endpoint: str, model: str):
+        self.endpoint = endpoint
+        self.model = model
+        self.state = "pending"  # pending / loading / ready / failed
+        self.ever_ready = False
+        self.loads = 0
+        self.last_load_ms: Optional[float] = None       # 워밍업 요청 전체 시간 (콜드 스타트)
+        self.last_ollama_load_ms: Optional[float] = None  # Ollama가 보고한 load_duration
+        self.last_warmed_at: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "loads": self.loads,
+            "cold_start_ms": self.last_load_ms,
+            "ollama_load_ms": self.last_ollama_load_ms,
+            "last_warmed_at": self.last_warmed_at,
+            "error": self.error,
+        }
+
+
+class WarmupManager:
+    def __init__(self):
+        self._models: dict[tuple[str, str], ModelWarmth] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _configured(self) -> list[ModelWarmth]:
+        for endpoint, models in config.WARMUP_MODELS.items():
+            for model in models:
+                if (endpoint, model) not in self._models:
+                    self._models[(endpoint, model)] = ModelWarmth(endpoint, model)
+        return [
+            self._models[(endpoint, model)]
+            for endpoint, models in config.WARMUP_MODELS.items()
+            for model in models
+        ]
+
+    async def start(self):
+        self._configured()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        await self.warm_all(initial=True)
+        while True:
+            await asyncio.sleep(config.WARMUP_RECHECK_INTERVAL_SECONDS)
+            await self.warm_all(initial=False)
+
+    async def warm_all(self, initial: bool = False):
+        """백엔드별로 병렬 실행 (initial=False면 내려간 모델만, 백엔드가 한가할 때만)"""
+        by_endpoint: dict[str, list[ModelWarmth]] = {}
+        for warmth in self._configured():
+            by_endpoint.setdefault(warmth.endpoint, []).append(warmth)
+        await asyncio.gather(*(
+            self._warm_backend(endpoint, entries, initial) for endpoint, entries in by_endpoint.items()
+        ))
+
+    async def _warm_backend(self, endpoint: str, entries: list[ModelWarmth], initial: bool):
+        if not initial:
+            loaded = await self._loaded_models(endpoint)
+            if loaded is None:
+                return
+            for warmth in entries:
+                if warmth.model not in loaded and warmth.state == "ready":
+                    warmth.state = "pending"
+            entries = [warmth for warmth in entries if warmth.model not in loaded]
+
+        for warmth in entries:
+            scheduler = schedulers.get(endpoint)
+            if not initial and (scheduler.in_flight or scheduler.queued):
+                # 사용자 요청 처리 중에는 다시 올리지 않음 (다음 확인 때 재시도)
+                return
+            await self.warm(warmth)
+
+    async def _loaded_models(self, endpoint: str) -> Optional[set[str]]:
+        try:
+            response = await ollama_clients.get(endpoint).get("/api/ps", timeout=config.ROUTER_HEALTH_CHECK_TIMEOUT_SECONDS)
+            response.raise_for_status()
+            return {model["name"] for model in response.json().get("models", [])}
+        except (httpx.HTTPError, ValueError) as e:
+            print(f"워밍업 상태 확인 실패 ({endpoint}): {e}")
+            return None
+
+    async def warm(self, warmth: ModelWarmth):
+        """
+        빈 프롬프트로 /api/generate를 호출해 모델만 메모리에 올림
+
+        임베딩 전용 모델은 /api/generate를 지원하지 않으므로(400) 빈 입력으로 /api/embed를 호출합니다.
+        """
+        warmth.state = "loading"
+        started = time.monotonic()
+        if warmth.model in config.EMBEDDING_MODELS:
+            path, payload = "/api/embed", {"model": warmth.model, "input": "", "keep_alive": config.WARMUP_KEEP_ALIVE}
+        else:
+            path, payload = "/api/generate", {
+                "model": warmth.model, "prompt": "", "stream": False, "keep_alive": config.WARMUP_KEEP_ALIVE
+            }
+        try:
+            async with schedulers.get(warmth.endpoint).slot(WARMUP_OWNER, warmth.model):
+                response = await ollama_clients.get(warmth.endpoint).post(
+                    path, json=payload, timeout=config.WARMUP_TIMEOUT_SECONDS,
+                )
+            response.raise_for_status()
+            load_duration = response.json().get("load_duration")
+        except Exception as e:
+            warmth.state = "failed"
+            warmth.error = str(e) or type(e).__name__
+            print(f"⚠️ 워밍업 실패: {warmth.model} @ {warmth.endpoint} ({warmth.error})")
+            return
+
+        warmth.state = "ready"
+        warmth.ever_ready = True
+        warmth.error = None
+        warmth.loads += 1
+        warmth.last_load_ms = round((time.monotonic() - started) * 1000, 2)
+        warmth.last_ollama_load_ms = round(load_duration / 1e6, 2) if load_duration else None
+        warmth.last_warmed_at = time.time()
+        print(f"✅ 워밍업 완료: {warmth.model} @ {warmth.endpoint} ({warmth.last_load_ms}ms)")
+
+    def is_ready(self) -> bool:
+        """설정된 모든 모델이 한 번 이상 워밍업되었는지 (이후 내려가도 준비 상태 유지)"""
+        return all(warmth.ever_ready for warmth in self._configured())
+
+    def stats(self) -> dict:
+        return {
+            endpoint: {warmth.model: warmth.stats() for warmth in self._configured() if warmth.endpoint == endpoint}
+            for endpoint in config.WARMUP_MODELS
+        }
+
+
+warmup_manager = WarmupManager()
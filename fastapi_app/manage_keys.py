@@ -2,7 +2,7 @@ import sqlite3
 import secrets
 import string
 import argparse
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
 
 # Docker 컨테이너 내부의 DB 파일 경로를 사용합니다.
@@ -15,16 +15,49 @@ def init_db_path():
     if not os.path.exists(db_dir):
         os.makedirs(db_dir)
 
+def connect(read_only=False):
+    """
+    Opens the database. The gateway keeps it in WAL mode, so read-only
+    connections never block (or get blocked by) the gateway's log writes.
+    """
+    if read_only:
+        return sqlite3.connect(f"file:{DATABASE_FILE}?mode=ro", uri=True)
+    return sqlite3.connect(DATABASE_FILE, timeout=10.0)
+
 def generate_api_key(length=16):
     """Generates a cryptographically secure API key."""
     characters = string.ascii_letters + string.digits
     return ''.join(secrets.choice(characters) for _ in range(length))
 
+def ensure_key_version_column(cursor):
+    """Adds the key_version column to databases created before it existed."""
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(api_keys)")}
+    if "key_version" not in columns:
+        cursor.execute("ALTER TABLE api_keys ADD COLUMN key_version INTEGER NOT NULL DEFAULT 0")
+
+# Per-key limit columns (NULL means unlimited). The gateway adds them on startup too.
+LIMIT_COLUMNS = {
+    "rate_limit_rps": "REAL",
+    "rate_limit_burst": "INTEGER",
+    "max_concurrent": "INTEGER",
+    "quota_tokens": "INTEGER",
+    "quota_gpu_seconds": "REAL",
+    "quota_window_hours": "REAL",
+    "priority_class": "TEXT",
+}
+
+def ensure_limit_columns(cursor):
+    """Adds the rate-limit/quota columns to databases created before they existed."""
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(api_keys)")}
+    for column, definition in LIMIT_COLUMNS.items():
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE api_keys ADD COLUMN {column} {definition}")
+
 def add_key(owner):
     """Adds a new API key to the database."""
     init_db_path()
     new_key = generate_api_key()
-    conn = sqlite3.connect(DATABASE_FILE)
+    conn = connect()
     cursor = conn.cursor()
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS api_keys (
@@ -33,12 +66,15 @@ def add_key(owner):
             owner TEXT NOT NULL,
             is_active BOOLEAN NOT NULL DEFAULT 1,
             created_at TEXT NOT NULL,
-            request_count INTEGER NOT NULL DEFAULT 0
+            request_count INTEGER NOT NULL DEFAULT 0,
+            key_version INTEGER NOT NULL DEFAULT 0
         )
     ''')
+    ensure_key_version_column(cursor)
     try:
         cursor.execute(
-            "INSERT INTO api_keys (api_key, owner, created_at) VALUES (?, ?, ?)",
+            "INSERT INTO api_keys (api_key, owner, created_at, key_version) "
+            "VALUES (?, ?, ?, (SELECT COALESCE(MAX(key_version), 0) + 1 FROM api_keys))",
             (new_key, owner, datetime.now().isoformat())
         )
         conn.commit()
@@ -50,9 +86,16 @@ def add_key(owner):
 
 def revoke_key(api_key):
     """Revokes an existing API key."""
-    conn = sqlite3.connect(DATABASE_FILE)
+    conn = connect()
     cursor = conn.cursor()
-    cursor.execute("UPDATE api_keys SET is_active = 0 WHERE api_key = ?", (api_key,))
+    ensure_key_version_column(cursor)
+    # key_version을 올려서 실행 중인 게이트웨이의 키 캐시가 바로 무효화되도록 함
+    cursor.execute(
+        "UPDATE api_keys SET is_active = 0, "
+        "key_version = (SELECT COALESCE(MAX(key_version), 0) + 1 FROM api_keys) "
+        "WHERE api_key = ?",
+        (api_key,)
+    )
     conn.commit()
     if cursor.rowcount > 0:
         print(f"🔑 Key '{api_key}' has been revoked.")
@@ -60,12 +103,56 @@ def revoke_key(api_key):
         print(f"⚠️ Key '{api_key}' not found.")
     conn.close()
 
+def set_limits(api_key, limits):
+    """Sets rate limits and quotas for a key. A value of 0 removes that limit."""
+    changes = {column: (value or None) for column, value in limits.items() if value is not None}
+    if not changes:
+        print("⚠️ Nothing to change. Pass at least one limit option.")
+        return
+    conn = connect()
+    cursor = conn.cursor()
+    ensure_key_version_column(cursor)
+    ensure_limit_columns(cursor)
+    assignments = ", ".join(f"{column} = ?" for column in changes)
+    # key_version을 올려서 실행 중인 게이트웨이가 새 한도를 바로 읽도록 함
+    cursor.execute(
+        f"UPDATE api_keys SET {assignments}, "
+        "key_version = (SELECT COALESCE(MAX(key_version), 0) + 1 FROM api_keys) "
+        "WHERE api_key = ?",
+        (*changes.values(), api_key)
+    )
+    conn.commit()
+    if cursor.rowcount > 0:
+        summary = ", ".join(f"{column}={value if value is not None else 'unlimited'}" for column, value in changes.items())
+        print(f"⚙️ Limits updated for '{api_key}': {summary}")
+    else:
+        print(f"⚠️ Key '{api_key}' not found.")
+    conn.close()
+
+def format_limits(key):
+    """One-line summary of a key's limits for the list command."""
+    columns = key.keys()
+    parts = []
+    if "rate_limit_rps" in columns and key["rate_limit_rps"]:
+        parts.append(f"{key['rate_limit_rps']:g}/s" + (f" burst {key['rate_limit_burst']}" if key["rate_limit_burst"] else ""))
+    if "max_concurrent" in columns and key["max_concurrent"]:
+        parts.append(f"{key['max_concurrent']} concurrent")
+    if "quota_tokens" in columns and key["quota_tokens"]:
+        parts.append(f"{key['quota_tokens']} tok")
+    if "quota_gpu_seconds" in columns and key["quota_gpu_seconds"]:
+        parts.append(f"{key['quota_gpu_seconds']:g} GPU-s")
+    if "quota_window_hours" in columns and (key["quota_tokens"] or key["quota_gpu_seconds"]):
+        parts.append(f"per {key['quota_window_hours'] or 24:g}h")
+    if "priority_class" in columns and key["priority_class"]:
+        parts.append(f"max priority {key['priority_class']}")
+    return ", ".join(parts) or "unlimited"
+
 def list_keys():
     """Lists all API keys in the database."""
-    conn = sqlite3.connect(DATABASE_FILE)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
     try:
+        conn = connect(read_only=True)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
         cursor.execute("SELECT * FROM api_keys")
         keys = cursor.fetchall()
         conn.close()
@@ -73,11 +160,43 @@ def list_keys():
         print("--- API Keys ---")
         for key in keys:
             status = "Active" if key['is_active'] else "Inactive"
-            print(f"Owner: {key['owner']:<15} | Key: {key['api_key']:<20} | Status: {status:<10} | Requests: {key['request_count']}")
+            print(f"Owner: {key['owner']:<15} | Key: {key['api_key']:<20} | Status: {status:<10} | Requests: {key['request_count']:<8} | Limits: {format_limits(key)}")
         print("----------------")
     except sqlite3.OperationalError:
         print("⚠️ No keys found or database not initialized. Please add a key first.")
 
+def show_usage(days=7, owner=None):
+    """Shows token and GPU-time usage per owner and model for the last N days."""
+    since = (datetime.now().date() - timedelta(days=days - 1)).isoformat()
+    sql = (
+        "SELECT owner, model, SUM(requests) AS requests, SUM(prompt_tokens) AS prompt_tokens, "
+        "SUM(completion_tokens) AS completion_tokens, SUM(eval_ms) AS eval_ms, SUM(gpu_ms) AS gpu_ms "
+        "FROM usage_daily WHERE day >= ?"
+    )
+    params = [since]
+    if owner:
+        sql += " AND owner = ?"
+        params.append(owner)
+    sql += " GROUP BY owner, model ORDER BY gpu_ms DESC"
+    try:
+        conn = connect(read_only=True)
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute(sql, params).fetchall()
+        conn.close()
+    except sqlite3.OperationalError:
+        print("⚠️ No usage data yet. The gateway creates the usage table on startup.")
+        return
+
+    print(f"--- Usage since {since} ---")
+    for row in rows:
+        tokens_per_second = row['completion_tokens'] / (row['eval_ms'] / 1000) if row['eval_ms'] else 0.0
+        print(
+            f"Owner: {row['owner']:<15} | Model: {row['model']:<16} | Requests: {row['requests']:<6} | "
+            f"Prompt tok: {row['prompt_tokens']:<8} | Output tok: {row['completion_tokens']:<8} | "
+            f"GPU: {row['gpu_ms'] / 1000:>9.1f}s | {tokens_per_second:>6.1f} tok/s"
+        )
+    print("----------------")
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Manage API keys for the AI server.")
@@ -91,6 +210,20 @@ if __name__ == "__main__":
 
     parser_list = subparsers.add_parser("list", help="List all API keys.")
 
+    parser_limits = subparsers.add_parser("limits", help="Set rate limits and quotas for a key (0 removes a limit).")
+    parser_limits.add_argument("api_key", type=str, help="The API key to change.")
+    parser_limits.add_argument("--rps", type=float, help="Requests per second (token bucket refill rate).")
+    parser_limits.add_argument("--burst", type=int, help="Token bucket size (default: ceil(rps)).")
+    parser_limits.add_argument("--concurrency", type=int, help="Maximum concurrent in-flight requests.")
+    parser_limits.add_argument("--quota-tokens", type=int, help="Prompt + output tokens per quota window.")
+    parser_limits.add_argument("--quota-gpu-seconds", type=float, help="Ollama total_duration seconds per quota window.")
+    parser_limits.add_argument("--window-hours", type=float, help="Rolling quota window in hours (default: 24).")
+    parser_limits.add_argument("--priority", choices=["interactive", "standard", "batch", "none"], help="Highest queue priority class the key may use ('none' removes the cap).")
+
+    parser_usage = subparsers.add_parser("usage", help="Show token and GPU-time usage per key owner and model.")
+    parser_usage.add_argument("--days", type=int, default=7, help="Number of days to include (default: 7).")
+    parser_usage.add_argument("--owner", type=str, help="Only show this owner.")
+
     args = parser.parse_args()
 
     if args.command == "add":
@@ -99,3 +232,15 @@ if __name__ == "__main__":
         revoke_key(args.api_key)
     elif args.command == "list":
         list_keys()
+    elif args.command == "limits":
+        set_limits(args.api_key, {
+            "rate_limit_rps": args.rps,
+            "rate_limit_burst": args.burst,
+            "max_concurrent": args.concurrency,
+            "quota_tokens": args.quota_tokens,
+            "quota_gpu_seconds": args.quota_gpu_seconds,
+            "quota_window_hours": args.window_hours,
+            "priority_class": "" if args.priority == "none" else args.priority,
+        })
+    elif args.command == "usage":
+        show_usage(args.days, args.owner)
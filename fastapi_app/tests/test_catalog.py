@@ -0,0 +1,91 @@
+"""
+🧪 모델 목록 캐시 테스트
+"""
+import asyncio
+import time
+
+import httpx
+from fastapi.testclient import TestClient
+
+from app import config, main
+from app.catalog import ModelCatalog
+from app.clients import registry
+
+FAST = "http://catalog-fast:11434"
+SLOW = "http://catalog-slow:11434"
+
+
+def _setup(monkeypatch, calls, slow_delay=0.0):
+    async def fast(request):
+        calls.append(request.url.host)
+        return httpx.Response(200, json={"models": [{"name": f"qwen2.5vl:7b"}, {"name": "llama3:latest"}]})
+
+    async def slow(request):
+        calls.append(request.url.host)
+        await asyncio.sleep(slow_delay)
+        return httpx.Response(200, json={"models": [{"name": "gpt-oss:20b"}]})
+
+    monkeypatch.setattr(config, "OLLAMA_REPLICAS", {"qwen2.5vl:7b": [FAST], "gpt-oss:20b": [SLOW]})
+    for endpoint, handler in ((FAST, fast), (SLOW, slow)):
+        monkeypatch.setitem(
+            registry._clients, endpoint,
+            httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url=endpoint)
+        )
+
+
+def test_slow_backend_bounded_by_timeout(monkeypatch):
+    """느린 백엔드는 타임아웃으로 끊고 나머지 결과만 반환"""
+    calls = []
+    _setup(monkeypatch, calls, slow_delay=1.0)
+    monkeypatch.setattr(config, "CATALOG_BACKEND_TIMEOUT_SECONDS", 0.1)
+
+    async def scenario():
+        started = time.monotonic()
+        snapshot = await ModelCatalog().get()
+        return snapshot, time.monotonic() - started
+
+    snapshot, elapsed = asyncio.run(scenario())
+    assert elapsed < 0.5
+    assert [model["name"] for model in snapshot.models] == ["qwen2.5vl:7b", "llama3:latest"]
+    assert SLOW in snapshot.errors
+
+
+def test_stale_while_revalidate(monkeypatch):
+    """신선한 캐시는 그대로, 오래된 캐시는 반환 후 백그라운드 갱신, 동시 요청은 갱신 1회 공유"""
+    calls = []
+    _setup(monkeypatch, calls)
+    catalog = ModelCatalog()
+
+    async def scenario():
+        await asyncio.gather(*(catalog.get() for _ in range(5)))
+        assert len(calls) == 2  # 백엔드당 1회
+
+        await catalog.get()
+        assert len(calls) == 2  # TTL 이내 → 캐시
+
+        monkeypatch.setattr(config, "CATALOG_TTL_SECONDS", 0.0)
+        stale = await catalog.get()
+        assert stale.models  # 오래된 캐시 즉시 반환
+        await catalog._refresh_task
+        assert len(calls) == 4
+
+    asyncio.run(scenario())
+    assert catalog.stats()["stale_hits"] == 1
+
+
+def test_models_endpoint_etag(monkeypatch):
+    """같은 내용이면 If-None-Match로 304"""
+    _setup(monkeypatch, [])
+    monkeypatch.setattr(main, "model_catalog", ModelCatalog())
+    main.app.dependency_overrides[main.get_valid_api_key] = lambda: {"owner": "tester"}
+    try:
+        client = TestClient(main.app)
+        first = client.get("/v1/models")
+        second = client.get("/v1/models", headers={"If-None-Match": first.headers["ETag"]})
+    finally:
+        main.app.dependency_overrides.clear()
+
+    assert first.status_code == 200
+    assert len(first.json()["models"]) == 3
+    assert second.status_code == 304
+    assert second.headers["ETag"] == first.headers["ETag"]
@@ -0,0 +1,39 @@
+"""
+🧪 Ollama 클라이언트 레지스트리 테스트
+"""
+import asyncio
+
+from app import config
+from app.clients import OllamaClientRegistry
+
+
+def test_registry_lifecycle():
+    """엔드포인트별 클라이언트 생성 및 종료"""
+    async def scenario():
+        registry = OllamaClientRegistry()
+        await registry.startup()
+        assert registry.endpoints() == sorted(set(config.OLLAMA_ENDPOINTS.values()))
+
+        endpoint = config.OLLAMA_ENDPOINTS["gpt-oss:20b"]
+        client = registry.get(endpoint)
+        assert registry.get(endpoint) is client
+
+        await registry.shutdown()
+        assert client.is_closed
+        assert registry.endpoints() == []
+
+    asyncio.run(scenario())
+
+
+def test_pool_stats_empty_pool():
+    """요청 전에는 열린 연결이 없음"""
+    async def scenario():
+        registry = OllamaClientRegistry()
+        await registry.startup()
+        stats = registry.pool_stats()
+        await registry.shutdown()
+        return stats
+
+    stats = asyncio.run(scenario())
+    for pool in stats.values():
+        assert pool == {"open": 0, "idle": 0, "active": 0, "waiting": 0}
@@ -0,0 +1,168 @@
+"""
+🧪 /v1/chat 대화 기록 + 압축 테스트
+"""
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app import config, database, main
+from app.clients import registry
+from app.conversations import ConversationStore, estimate_tokens
+from app.router import ReplicaRouter
+
+MODEL = "gpt-oss:20b"
+ENDPOINT = "http://replica-a:11434"
+
+
+@pytest.fixture
+def db_file(tmp_path, monkeypatch):
+    path = str(tmp_path / "api_server.db")
+    monkeypatch.setattr(config, "DATABASE_FILE", path)
+    monkeypatch.setattr(config, "CHAT_CHARS_PER_TOKEN", 1.0)
+    database.init_db()
+    return path
+
+
+def _history(store, owner, conversation_id, turns):
+    async def fill():
+        conversation = await store.get(owner, conversation_id)
+        for i in range(turns):
+            await store.save_turn(conversation, MODEL, [{"role": "user", "content": f"q{i}" * 10}], f"a{i}" * 10, None)
+        return conversation
+    return asyncio.run(fill())
+
+
+def test_trim_keeps_recent_turns_within_budget(db_file, monkeypatch):
+    store = ConversationStore()
+    conversation = _history(store, "alice", "c1", 5)
+    per_turn = 2 * estimate_tokens("q0" * 10)
+    monkeypatch.setattr(config, "CHAT_HISTORY_TOKEN_BUDGET", estimate_tokens("system") + estimate_tokens("next") + 2 * per_turn + 3)
+
+    messages, pending = asyncio.run(store.build_messages(
+        conversation, [{"role": "system", "content": "system"}, {"role": "user", "content": "next"}], "trim"
+    ))
+
+    assert [message["content"] for message in messages] == ["system", "q3" * 10, "a3" * 10, "q4" * 10, "a4" * 10, "next"]
+    # 답변을 받기 전에는 대화 상태를 바꾸지 않음
+    assert conversation.system is None and pending.system == "system"
+    # trim은 기록을 지우지 않음
+    assert len(conversation.messages) == 10
+    assert store.stats()["trimmed"] == 1
+    assert store.stats()["history_tokens_omitted"] == 3 * per_turn
+
+
+def test_summarize_replaces_old_turns_and_persists(db_file, monkeypatch):
+    store = ConversationStore()
+    conversation = _history(store, "alice", "c1", 4)
+    per_turn = 2 * estimate_tokens("q0" * 10)
+    monkeypatch.setattr(config, "CHAT_SUMMARY_MAX_TOKENS", 10)
+    monkeypatch.setattr(config, "CHAT_HISTORY_TOKEN_BUDGET", estimate_tokens("next") + 14 + per_turn)
+    summarized = []
+
+    async def summarize(previous, dropped):
+        summarized.append((previous, [message["content"] for message in dropped]))
+        return "earlier turns"
+
+    async def scenario():
+        messages, pending = await store.build_messages(conversation, [{"role": "user", "content": "next"}], "summarize", summarize)
+        # 업스트림 호출이 실패하면 save_turn까지 가지 않으므로 요약 전 상태 그대로
+        assert conversation.summary is None and len(conversation.messages) == 8
+        await store.save_turn(conversation, MODEL, [{"role": "user", "content": "next"}], "reply", 3, pending)
+        return messages
+
+    messages = asyncio.run(scenario())
+    assert summarized == [(None, ["q0" * 10, "a0" * 10, "q1" * 10, "a1" * 10, "q2" * 10, "a2" * 10])]
+    assert messages[0] == {"role": "system", "content": "Summary of the earlier conversation:\nearlier turns"}
+    assert [message["content"] for message in messages[1:]] == ["q3" * 10, "a3" * 10, "next"]
+
+    # 다른 프로세스(새 저장소)에서 다시 읽어도 요약 이후 메시지만 메모리에 올라옴
+    reloaded = asyncio.run(ConversationStore().get("alice", "c1"))
+    assert reloaded.summary == "earlier turns" and reloaded.summarized_count == 6
+    assert [message["content"] for message in reloaded.messages] == ["q3" * 10, "a3" * 10, "next", "reply"]
+    assert reloaded.messages[-1]["tokens"] == 3 + 4
+
+
+def test_chat_endpoint_stores_history_and_streams(db_file, monkeypatch):
+    """첫 턴은 비스트리밍, 다음 턴은 스트리밍으로 이전 기록을 붙여 보냄"""
+    sent = []
+
+    def handler(request):
+        body = json.loads(request.content)
+        sent.append(body["messages"])
+        reply = f"reply-{len(sent)}"
+        if body["stream"]:
+            chunks = [
+                {"message": {"role": "assistant", "content": reply[:3]}, "done": False},
+                {"message": {"role": "assistant", "content": reply[3:]}, "done": False},
+                {"message": {"role": "assistant", "content": ""}, "done": True, "eval_count": 2},
+            ]
+            content = "".join(json.dumps(chunk) + "\n" for chunk in chunks)
+            return httpx.Response(200, content=content, headers={"Content-Type": "application/x-ndjson"})
+        return httpx.Response(200, json={"message": {"role": "assistant", "content": reply}, "done": True, "eval_count": 2})
+
+    monkeypatch.setattr(config, "SUPPORTED_MODELS", [MODEL])
+    monkeypatch.setattr(config, "OLLAMA_REPLICAS", {MODEL: [ENDPOINT]})
+    monkeypatch.setitem(
+        registry._clients, ENDPOINT,
+        httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url=ENDPOINT)
+    )
+    monkeypatch.setattr(main, "replica_router", ReplicaRouter())
+    monkeypatch.setattr(main, "conversation_store", ConversationStore())
+
+    async def no_log(**kwargs):
+        pass
+    monkeypatch.setattr(main.log_writer, "add_api_log", no_log)
+
+    main.app.dependency_overrides[main.get_prioritized_api_key] = lambda: {"id": 1, "owner": "tester", "priority": None}
+    main.app.dependency_overrides[main.get_valid_api_key] = lambda: {"id": 1, "owner": "tester"}
+    try:
+        client = TestClient(main.app)
+        first = client.post("/v1/chat", json={
+            "model": MODEL, "conversation_id": "c1",
+            "messages": [{"role": "system", "content": "be brief"}, {"role": "user", "content": "hello"}],
+        })
+        second = client.post("/v1/chat", json={
+            "model": MODEL, "conversation_id": "c1", "stream": True,
+            "messages": [{"role": "user", "content": "again"}],
+        })
+        stored = client.get("/v1/chat/conversations/c1")
+        missing = client.get("/v1/chat/conversations/nope")
+    finally:
+        main.app.dependency_overrides.clear()
+
+    assert first.status_code == 200 and first.headers["X-Conversation-Id"] == "c1"
+    assert first.json()["message"]["content"] == "reply-1"
+    assert "".join(json.loads(line)["message"]["content"] for line in second.text.splitlines()) == "reply-2"
+    assert sent[1] == [
+        {"role": "system", "content": "be brief"},
+        {"role": "user", "content": "hello"},
+        {"role": "assistant", "content": "reply-1"},
+        {"role": "user", "content": "again"},
+    ]
+    assert stored.json()["message_count"] == 4
+    assert stored.json()["messages"][-1] == {"role": "assistant", "content": "reply-2"}
+    assert missing.status_code == 404
+
+
+def test_slow_summary_falls_back_to_trim(db_file, monkeypatch):
+    """요약이 CHAT_SUMMARY_TIMEOUT_SECONDS를 넘으면 기다리지 않고 오래된 턴만 빼서 보냄"""
+    store = ConversationStore()
+    conversation = _history(store, "alice", "c1", 4)
+    per_turn = 2 * estimate_tokens("q0" * 10)
+    monkeypatch.setattr(config, "CHAT_SUMMARY_MAX_TOKENS", 10)
+    monkeypatch.setattr(config, "CHAT_SUMMARY_TIMEOUT_SECONDS", 0.05)
+    monkeypatch.setattr(config, "CHAT_HISTORY_TOKEN_BUDGET", estimate_tokens("next") + 14 + per_turn)
+
+    async def summarize(previous, dropped):
+        await asyncio.sleep(5)
+        return "too late"
+
+    messages, pending = asyncio.run(store.build_messages(
+        conversation, [{"role": "user", "content": "next"}], "summarize", summarize
+    ))
+    assert [message["content"] for message in messages] == ["q3" * 10, "a3" * 10, "next"]
+    assert pending.summarized == 0 and pending.summary is None
+    assert store.stats()["summary_failures"] == 1
@@ -0,0 +1,59 @@
+"""
+🧪 DB 연결/마이그레이션 테스트
+"""
+import sqlite3
+
+import pytest
+
+from app import config, database
+
+
+@pytest.fixture
+def db_file(tmp_path, monkeypatch):
+    path = str(tmp_path / "api_server.db")
+    monkeypatch.setattr(config, "DATABASE_FILE", path)
+    yield path
+    database.close_connection()
+
+
+def test_upgrade_existing_volume(db_file):
+    """마이그레이션 이전 스키마의 DB를 그대로 업그레이드"""
+    conn = sqlite3.connect(db_file)
+    conn.execute('''
+        CREATE TABLE api_keys (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            api_key TEXT NOT NULL UNIQUE,
+            owner TEXT NOT NULL,
+            is_active BOOLEAN NOT NULL DEFAULT 1,
+            created_at TEXT NOT NULL,
+            request_count INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute("INSERT INTO api_keys (api_key, owner, created_at) VALUES ('old-key', 'legacy', '2024-01-01')")
+    conn.commit()
+    conn.close()
+
+    database.init_db()
+
+    assert database.fetch_active_key("old-key")["key_version"] == 0
+    conn = database.get_connection()
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == len(database.MIGRATIONS)
+    indexes = {row[1] for row in conn.execute("PRAGMA index_list(logs)")}
+    assert {"idx_logs_owner_timestamp", "idx_logs_model_timestamp"} <= indexes
+
+
+def test_wal_and_connection_reuse(db_file):
+    """WAL 모드 + 스레드별 연결 재사용"""
+    database.init_db()
+    conn = database.get_connection()
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert database.get_connection() is conn
+
+
+def test_init_db_is_idempotent(db_file):
+    """이미 최신 스키마면 아무 것도 하지 않음"""
+    database.init_db()
+    database.init_db()
+    database.insert_api_logs([("tester", "gpt-oss:20b", "p", "r", False, "2024-01-01T00:00:00")])
+    count = database.get_connection().execute("SELECT COUNT(*) FROM logs").fetchone()[0]
+    assert count == 1
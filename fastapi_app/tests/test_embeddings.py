@@ -0,0 +1,132 @@
+"""
+🧪 /v1/embeddings 테스트 (중복 제거, 캐시, 배치, 응답 형식)
+"""
+import asyncio
+import base64
+import json
+import struct
+
+import httpx
+from fastapi.testclient import TestClient
+
+from app import config, main
+from app.clients import registry
+from app.embeddings import EmbeddingService, pack, unpack
+from app.router import ReplicaRouter
+
+MODEL = "bge-m3:latest"
+ENDPOINT = "http://replica-a:11434"
+
+
+def _vector(text):
+    return [float(len(text)), 0.5, -1.25]
+
+
+def test_dedupes_caches_and_batches(monkeypatch):
+    monkeypatch.setattr(config, "EMBEDDINGS_BATCH_SIZE", 2)
+    service = EmbeddingService()
+    calls = []
+
+    async def fetch(batch):
+        calls.append(batch)
+        return [_vector(text) for text in batch]
+
+    async def scenario():
+        first = await service.embed(MODEL, ["a", "bb", "a", "ccc"], True, fetch)
+        second = await service.embed(MODEL, ["ccc", "dddd"], True, fetch)
+        return first, second
+
+    (vectors, cached), (again, cached_again) = asyncio.run(scenario())
+    assert calls == [["a", "bb"], ["ccc"], ["dddd"]]
+    assert [unpack(vector) for vector in vectors] == [_vector("a"), _vector("bb"), _vector("a"), _vector("ccc")]
+    assert cached == 0 and cached_again == 1
+    assert again[0] == vectors[3]
+    assert service.stats()["duplicates"] == 1
+
+
+def test_concurrent_requests_share_batch():
+    service = EmbeddingService()
+    calls = []
+
+    async def fetch(batch):
+        calls.append(batch)
+        await asyncio.sleep(0.05)
+        return [_vector(text) for text in batch]
+
+    async def scenario():
+        return await asyncio.gather(
+            service.embed(MODEL, ["x"], True, fetch),
+            service.embed(MODEL, ["x", "yy"], True, fetch),
+        )
+
+    (first, _), (second, _) = asyncio.run(scenario())
+    assert calls == [["x"], ["yy"]]
+    assert first[0] == second[0]
+    assert service.stats()["shared"] == 1
+
+
+def test_failed_batch_is_not_cached():
+    service = EmbeddingService()
+
+    async def broken(batch):
+        return []
+
+    async def fetch(batch):
+        return [_vector(text) for text in batch]
+
+    async def scenario():
+        try:
+            await service.embed(MODEL, ["a"], True, broken)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("expected ValueError")
+        return await service.embed(MODEL, ["a"], True, fetch)
+
+    vectors, cached = asyncio.run(scenario())
+    assert cached == 0 and unpack(vectors[0]) == _vector("a")
+
+
+def test_endpoint_formats(monkeypatch):
+    sent = []
+
+    def handler(request):
+        body = json.loads(request.content)
+        sent.append(body["input"])
+        return httpx.Response(200, json={"model": MODEL, "embeddings": [_vector(text) for text in body["input"]], "prompt_eval_count": 3})
+
+    monkeypatch.setattr(config, "EMBEDDING_MODELS", {MODEL})
+    monkeypatch.setattr(config, "OLLAMA_REPLICAS", {MODEL: [ENDPOINT]})
+    monkeypatch.setitem(
+        registry._clients, ENDPOINT,
+        httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url=ENDPOINT)
+    )
+    monkeypatch.setattr(main, "replica_router", ReplicaRouter())
+    monkeypatch.setattr(main, "embedding_service", EmbeddingService())
+
+    logged = []
+
+    async def log(**kwargs):
+        logged.append(kwargs)
+    monkeypatch.setattr(main.log_writer, "add_api_log", log)
+
+    main.app.dependency_overrides[main.get_prioritized_api_key] = lambda: {"id": 1, "owner": "tester", "priority": None}
+    try:
+        client = TestClient(main.app)
+        as_json = client.post("/v1/embeddings", json={"model": MODEL, "input": ["hi", "there", "hi"]})
+        as_base64 = client.post("/v1/embeddings", json={"model": MODEL, "input": ["hi", "there"], "format": "base64"})
+        as_float32 = client.post("/v1/embeddings", json={"model": MODEL, "input": "hi", "format": "float32"})
+        bad_model = client.post("/v1/embeddings", json={"model": "gpt-oss:20b", "input": "hi"})
+    finally:
+        main.app.dependency_overrides.clear()
+
+    assert sent == [["hi", "there"]]
+    assert as_json.json()["embeddings"] == [_vector("hi"), _vector("there"), _vector("hi")]
+    assert as_json.json()["dimensions"] == 3
+    assert as_base64.headers["X-Cache-Hits"] == "2"
+    assert base64.b64decode(as_base64.json()["embeddings"][1]) == pack(_vector("there"))
+    assert as_float32.headers["content-type"] == "application/octet-stream"
+    assert struct.unpack("<3f", as_float32.content) == tuple(_vector("hi"))
+    assert bad_model.status_code == 400
+    # 로그에는 입력 전문 대신 개수와 글자 수
+    assert logged[0]["prompt"] == "[EMBED] 3 texts, 9 chars: hi..."
@@ -0,0 +1,64 @@
+"""
+🧪 OCR 이미지 전처리 테스트
+"""
+import asyncio
+import base64
+import io
+
+from PIL import Image, ImageDraw
+
+from app import image_preprocess
+from app.ocr_input import Base64Image
+
+
+def _photo(width=1600, height=1200, orientation=None, quality=95):
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    for y in range(100, height - 100, 80):
+        draw.rectangle([100, y, width - 300, y + 30], fill="black")
+    output = io.BytesIO()
+    exif = Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation
+    image.save(output, format="JPEG", quality=quality, exif=exif)
+    return output.getvalue()
+
+
+def test_downscale_and_exif_rotate():
+    """max_pixels 이하로 축소 + EXIF 회전(90도) 반영"""
+    result = image_preprocess.preprocess_image(_photo(orientation=6), 300_000, False, "jpeg")
+    width, height = result["size"]
+    assert width * height <= 300_000
+    assert height > width  # 가로 사진이 세로로 회전됨
+    assert result["original_size"] == (1600, 1200)
+
+
+def test_grayscale_png_output():
+    """흑백 PNG로 재인코딩"""
+    result = image_preprocess.preprocess_image(_photo(), 300_000, True, "png")
+    image = Image.open(io.BytesIO(base64.b64decode(result["image_base64"])))
+    assert image.format == "PNG"
+    assert image.mode == "L"
+
+
+def test_perceptual_hash_survives_recompression():
+    """재압축으로 바이트가 달라져도 perceptual hash는 동일"""
+    first = image_preprocess.preprocess_image(_photo(quality=95), 300_000, False, "jpeg")
+    second = image_preprocess.preprocess_image(_photo(quality=60), 300_000, False, "jpeg")
+    assert first["sha256"] != second["sha256"]
+    assert first["phash"] == second["phash"]
+
+
+def test_preprocess_in_process_pool():
+    """프로세스 풀에서 실행 + 소요 시간 보고"""
+    async def scenario():
+        try:
+            source = Base64Image(base64.b64encode(_photo()).decode("ascii"))
+            image, elapsed_ms = await image_preprocess.preprocess(source, max_pixels=300_000, dedupe=True)
+            return await image.digest(), elapsed_ms
+        finally:
+            image_preprocess.shutdown()
+
+    digest, elapsed_ms = asyncio.run(scenario())
+    assert digest.startswith("phash:")
+    assert elapsed_ms > 0
@@ -0,0 +1,263 @@
+"""
+🧪 비동기 작업 큐 (/v1/jobs) 테스트
+"""
+import asyncio
+import json
+import sqlite3
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app import config, database, jobs, main
+from app.jobs import JobManager, check_callback_url
+from app.rate_limit import RateLimiter
+from app.scheduler import Priority, QueueFullError
+
+
+@pytest.fixture
+def db_file(tmp_path, monkeypatch):
+    path = str(tmp_path / "api_server.db")
+    monkeypatch.setattr(config, "DATABASE_FILE", path)
+    monkeypatch.setattr(config, "JOBS_POLL_INTERVAL_SECONDS", 0.05)
+    database.init_db()
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO api_keys (api_key, owner, created_at) VALUES ('key-1', 'tester', '2024-01-01')")
+    conn.commit()
+    conn.close()
+    return path
+
+
+KEY = {"id": 1, "owner": "tester"}
+
+
+def _resolve_to(address):
+    async def resolve(host, port):
+        return [address]
+    return resolve
+
+
+def test_job_runs_and_long_poll_returns_result(db_file, monkeypatch):
+    """제출 → 워커 실행 → 롱폴링으로 결과, 콜백 전송"""
+    callbacks = []
+    monkeypatch.setattr(jobs, "resolve_host", _resolve_to("93.184.216.34"))
+
+    async def handler(body, api_key):
+        await asyncio.sleep(0.05)
+        assert api_key["priority"].name == "batch"
+        return {"response": body["prompt"].upper()}
+
+    def callback(request):
+        callbacks.append(json.loads(request.content))
+        return httpx.Response(204)
+
+    async def scenario():
+        manager = JobManager()
+        manager.register("generate", handler)
+        await manager.start()
+        manager._http = httpx.AsyncClient(transport=httpx.MockTransport(callback))
+        try:
+            job = await manager.submit(KEY, "generate", {"prompt": "hi"}, "gpt-oss:20b", Priority("batch"), "http://hooks.local/done")
+            assert job["status"] == "queued"
+            finished = await manager.wait(job["id"], timeout=5)
+            for _ in range(50):
+                if callbacks:
+                    break
+                await asyncio.sleep(0.01)
+            return finished, await manager.get(job["id"])
+        finally:
+            await manager.stop()
+
+    finished, stored = asyncio.run(scenario())
+    assert finished["status"] == "succeeded"
+    assert json.loads(finished["result"]) == {"response": "HI"}
+    assert finished["expires_at"] > finished["finished_at"]
+    assert callbacks[0]["id"] == finished["id"] and callbacks[0]["result"] == {"response": "HI"}
+    assert stored["callback_state"] == "delivered"
+
+
+def test_callback_to_internal_address_is_refused(db_file, monkeypatch):
+    """콜백 호스트가 내부 주소로 확인되면 보내지 않고 재시도 없이 failed"""
+    posted = []
+    monkeypatch.setattr(jobs, "resolve_host", _resolve_to("169.254.169.254"))
+
+    async def handler(body, api_key):
+        return {"response": "ok"}
+
+    def callback(request):
+        posted.append(request)
+        return httpx.Response(204)
+
+    async def scenario():
+        manager = JobManager()
+        manager.register("generate", handler)
+        await manager.start()
+        manager._http = httpx.AsyncClient(transport=httpx.MockTransport(callback))
+        try:
+            job = await manager.submit(KEY, "generate", {}, None, Priority("batch"), "http://metadata.example/hook")
+            await manager.wait(job["id"], timeout=5)
+            while not manager.callbacks_failed:
+                await asyncio.sleep(0.01)
+            return await manager.get(job["id"])
+        finally:
+            await manager.stop()
+
+    job = asyncio.run(scenario())
+    assert posted == []
+    assert job["callback_state"] == "failed"
+
+
+def test_callback_url_rejects_internal_literals(monkeypatch):
+    for url in ("http://127.0.0.1/hook", "http://10.0.0.5/hook", "http://[::1]/hook", "http://[::ffff:192.168.0.1]/hook"):
+        with pytest.raises(ValueError):
+            check_callback_url(url)
+    check_callback_url("https://93.184.216.34/hook")
+
+    # 허용 목록에 명시한 호스트는 내부 주소여도 허용, 목록 밖은 거절
+    monkeypatch.setattr(config, "JOBS_CALLBACK_ALLOWED_HOSTS", {"127.0.0.1"})
+    check_callback_url("http://127.0.0.1/hook")
+    with pytest.raises(ValueError):
+        check_callback_url("https://93.184.216.34/hook")
+
+
+def test_running_job_survives_restart(db_file):
+    """실행 중에 종료된 작업은 다음 시작 때 다시 실행"""
+    calls = []
+
+    async def handler(body, api_key):
+        calls.append(body)
+        return {"ok": True}
+
+    async def scenario():
+        first = JobManager()
+        job = await first.submit(KEY, "generate", {"n": 1}, None, Priority("standard"))
+        # 이전 프로세스가 작업을 가져간 뒤 죽은 상황
+        assert database.claim_next_job(job["created_at"] + 1)["id"] == job["id"]
+
+        second = JobManager()
+        second.register("generate", handler)
+        await second.start()
+        try:
+            return await second.wait(job["id"], timeout=5)
+        finally:
+            await second.stop()
+
+    job = asyncio.run(scenario())
+    assert job["status"] == "succeeded"
+    assert job["attempts"] == 2
+    assert calls == [{"n": 1}]
+
+
+def test_cancel_running_job(db_file):
+    """실행 중인 작업 취소 → 실행 태스크도 취소되고 결과로 덮어쓰지 않음"""
+    started = []
+
+    async def handler(body, api_key):
+        started.append(True)
+        await asyncio.sleep(60)
+        return {"never": True}
+
+    async def scenario():
+        manager = JobManager()
+        manager.register("ocr", handler)
+        await manager.start()
+        try:
+            job = await manager.submit(KEY, "ocr", {}, None, Priority("batch"))
+            while not started:
+                await asyncio.sleep(0.01)
+            assert await manager.cancel(job["id"])
+            assert not await manager.cancel(job["id"])  # 이미 끝남
+            await asyncio.sleep(0.1)
+            return await manager.get(job["id"]), manager.stats()
+        finally:
+            await manager.stop()
+
+    job, stats = asyncio.run(scenario())
+    assert job["status"] == "cancelled"
+    assert job["result"] is None
+    assert stats["running"] == 0
+
+
+def test_busy_backend_requeues_job(db_file):
+    """백엔드 대기열이 가득 차면 실패가 아니라 Retry-After 뒤로 다시 대기"""
+    async def handler(body, api_key):
+        raise QueueFullError("http://gpu0", retry_after=30)
+
+    async def scenario():
+        manager = JobManager()
+        manager.register("generate", handler)
+        await manager.start()
+        try:
+            job = await manager.submit(KEY, "generate", {}, None, Priority("batch"))
+            while not manager.requeued:
+                await asyncio.sleep(0.01)
+            return await manager.get(job["id"])
+        finally:
+            await manager.stop()
+
+    job = asyncio.run(scenario())
+    assert job["status"] == "queued"
+    assert job["run_after"] > job["created_at"] + 20
+
+
+def test_rate_limited_key_requeues_job(db_file, monkeypatch):
+    """키의 동시 실행 한도가 차 있으면 작업을 실행하지 않고 Retry-After 뒤로 다시 대기"""
+    conn = sqlite3.connect(db_file)
+    conn.execute("UPDATE api_keys SET max_concurrent = 1 WHERE id = 1")
+    conn.commit()
+    conn.close()
+    limiter = RateLimiter()
+    monkeypatch.setattr(jobs, "rate_limiter", limiter)
+    ran = []
+
+    async def handler(body, api_key):
+        ran.append(body)
+        return {}
+
+    async def scenario():
+        # 같은 키의 대화형 요청이 슬롯을 쓰는 중
+        busy = limiter.admit(database.fetch_key_by_id(1))
+        manager = JobManager()
+        manager.register("generate", handler)
+        await manager.start()
+        try:
+            job = await manager.submit(KEY, "generate", {}, None, Priority("batch"))
+            while not manager.requeued:
+                await asyncio.sleep(0.01)
+            return await manager.get(job["id"])
+        finally:
+            await manager.stop()
+            busy.release()
+
+    job = asyncio.run(scenario())
+    assert ran == []
+    assert job["status"] == "queued" and job["run_after"] > job["created_at"]
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_submit_endpoint_validates_and_hides_other_owners(db_file):
+    """잘못된 요청은 제출 시점에 거절, 다른 소유자의 작업은 404"""
+    main.app.dependency_overrides[main.get_valid_api_key] = lambda: KEY
+    try:
+        client = TestClient(main.app)
+        bad_model = client.post("/v1/jobs", json={"type": "generate", "request": {"model": "nope", "prompt": "x"}})
+        missing_prompt = client.post("/v1/jobs", json={"type": "generate", "request": {"model": "gpt-oss:20b"}})
+        bad_callback = client.post("/v1/jobs", json={
+            "type": "generate", "request": {"model": "gpt-oss:20b", "prompt": "x"}, "callback_url": "file:///etc/passwd"
+        })
+        accepted = client.post("/v1/jobs", json={"type": "generate", "request": {"model": "gpt-oss:20b", "prompt": "x"}})
+        job_id = accepted.json()["id"]
+        own = client.get(f"/v1/jobs/{job_id}")
+
+        main.app.dependency_overrides[main.get_valid_api_key] = lambda: {"id": 2, "owner": "someone-else"}
+        other = client.get(f"/v1/jobs/{job_id}")
+    finally:
+        main.app.dependency_overrides.clear()
+
+    assert bad_model.status_code == 400
+    assert missing_prompt.status_code == 422
+    assert bad_callback.status_code == 400
+    assert accepted.status_code == 202
+    assert accepted.headers["location"] == f"/v1/jobs/{job_id}"
+    assert own.json()["status"] == "queued" and own.json()["priority"] == "batch"
+    assert other.status_code == 404
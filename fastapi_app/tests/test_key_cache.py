@@ -0,0 +1,75 @@
+"""
+🧪 API 키 캐시 테스트
+"""
+import asyncio
+import sqlite3
+
+import pytest
+
+from app import config, database
+from app.key_cache import APIKeyCache
+
+
+@pytest.fixture
+def db_file(tmp_path, monkeypatch):
+    """임시 DB에 테스트용 키 1개 생성"""
+    path = str(tmp_path / "api_server.db")
+    monkeypatch.setattr(config, "DATABASE_FILE", path)
+    database.init_db()
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "INSERT INTO api_keys (api_key, owner, created_at) VALUES ('valid-key', 'tester', '2024-01-01')"
+    )
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _request_count(path):
+    conn = sqlite3.connect(path)
+    count = conn.execute("SELECT request_count FROM api_keys WHERE api_key = 'valid-key'").fetchone()[0]
+    conn.close()
+    return count
+
+
+def test_cache_hit_and_batched_count(db_file):
+    """두 번째 검증부터는 캐시 사용, request_count는 flush 시 한 번에 반영"""
+    async def scenario():
+        cache = APIKeyCache()
+        for _ in range(3):
+            assert (await cache.validate("valid-key"))["owner"] == "tester"
+        assert cache.misses == 1 and cache.hits == 2
+        assert _request_count(db_file) == 0
+        await cache.flush_counts()
+
+    asyncio.run(scenario())
+    assert _request_count(db_file) == 3
+
+
+def test_negative_cache(db_file):
+    """잘못된 키도 캐시"""
+    async def scenario():
+        cache = APIKeyCache()
+        assert await cache.validate("wrong-key") is None
+        assert await cache.validate("wrong-key") is None
+        return cache.misses
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_revoke_invalidates_cache(db_file):
+    """key_version이 바뀌면 캐시가 비워져 revoke가 반영됨"""
+    async def scenario():
+        cache = APIKeyCache()
+        await cache.check_version()
+        assert await cache.validate("valid-key") is not None
+
+        conn = sqlite3.connect(db_file)
+        conn.execute("UPDATE api_keys SET is_active = 0, key_version = key_version + 1")
+        conn.commit()
+        conn.close()
+
+        await cache.check_version()
+        return await cache.validate("valid-key")
+
+    assert asyncio.run(scenario()) is None
@@ -0,0 +1,69 @@
+"""
+🧪 로그 일괄 기록기 테스트
+"""
+import asyncio
+import sqlite3
+
+import pytest
+
+from app import config, database
+from app.log_writer import LogWriter
+
+
+@pytest.fixture
+def db_file(tmp_path, monkeypatch):
+    path = str(tmp_path / "api_server.db")
+    monkeypatch.setattr(config, "DATABASE_FILE", path)
+    database.init_db()
+    return path
+
+
+def _log_count(path):
+    conn = sqlite3.connect(path)
+    count = conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0]
+    conn.close()
+    return count
+
+
+def test_flush_on_shutdown(db_file, tmp_path):
+    """종료 시 큐에 남은 로그를 모두 기록"""
+    async def scenario():
+        writer = LogWriter(batch_size=10, spill_file=str(tmp_path / "spill.jsonl"))
+        await writer.start()
+        await asyncio.gather(*(writer.add_api_log("tester", "gpt-oss:20b", f"p{i}", "r") for i in range(25)))
+        await writer.stop()
+        return writer.stats()
+
+    stats = asyncio.run(scenario())
+    assert _log_count(db_file) == 25
+    assert stats["written"] == 25
+    assert stats["queue_depth"] == 0
+
+
+def test_overflow_drop(db_file, tmp_path):
+    """drop 정책: 큐가 가득 차면 버리고 카운트"""
+    async def scenario():
+        writer = LogWriter(max_queue=2, overflow_policy="drop", spill_file=str(tmp_path / "spill.jsonl"))
+        await writer.start()
+        await writer.add_api_logs([("tester", "m", "p", "r", False)] * 5)
+        await writer.stop()
+        return writer.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["dropped"] == 3
+    assert _log_count(db_file) == 2
+
+
+def test_overflow_spill(db_file, tmp_path):
+    """spill 정책: 넘친 로그는 파일에 저장했다가 종료 시 DB에 기록"""
+    async def scenario():
+        writer = LogWriter(max_queue=2, overflow_policy="spill", spill_file=str(tmp_path / "spill.jsonl"))
+        await writer.start()
+        await writer.add_api_logs([("tester", "m", "p", "r", False)] * 5)
+        await writer.stop()
+        return writer.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["spilled"] == 3
+    assert _log_count(db_file) == 5
+    assert not (tmp_path / "spill.jsonl").exists()
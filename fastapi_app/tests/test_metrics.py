@@ -0,0 +1,47 @@
+"""
+🧪 Prometheus 메트릭 테스트
+"""
+from fastapi.testclient import TestClient
+
+from app import main, metrics
+
+
+def test_histogram_buckets_are_cumulative():
+    """버킷은 누적, _count와 _sum 포함"""
+    registry = metrics.Registry()
+    histogram = registry.histogram("test_seconds", "test", ("backend",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, "gpu0")
+
+    text = registry.render()
+    assert 'test_seconds_bucket{backend="gpu0",le="0.1"} 2' in text
+    assert 'test_seconds_bucket{backend="gpu0",le="1"} 3' in text
+    assert 'test_seconds_bucket{backend="gpu0",le="+Inf"} 4' in text
+    assert 'test_seconds_count{backend="gpu0"} 4' in text
+    assert 'test_seconds_sum{backend="gpu0"} 3.65' in text
+
+
+def test_label_escaping_and_callback_gauge():
+    """라벨 값 이스케이프 + 수집 시점 콜백 게이지"""
+    registry = metrics.Registry()
+    registry.counter("test_total", "test", ("model",)).inc('a"b', value=2)
+    registry.gauge("test_in_flight", "test", ("backend",), lambda: {("gpu0",): 3})
+
+    text = registry.render()
+    assert 'test_total{model="a\\"b"} 2' in text
+    assert "# TYPE test_in_flight gauge" in text
+    assert 'test_in_flight{backend="gpu0"} 3' in text
+
+
+def test_ollama_body_metrics_and_endpoint():
+    """Ollama 응답 본문의 토큰 수/소요 시간이 /metrics에 노출"""
+    metrics.observe_ollama("test-model", {
+        "eval_count": 42, "eval_duration": 2_000_000_000,
+        "prompt_eval_count": 7, "prompt_eval_duration": 100_000_000,
+    })
+    response = TestClient(main.app).get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'ollama_eval_tokens_total{model="test-model"} 42' in response.text
+    assert 'ollama_prompt_eval_duration_seconds_count{model="test-model"} 1' in response.text
+    assert "# TYPE gateway_backend_in_flight gauge" in response.text
@@ -0,0 +1,85 @@
+"""
+🧪 배치 OCR 엔드포인트 테스트
+"""
+import json
+
+import httpx
+from fastapi.testclient import TestClient
+
+from app import config, main
+
+MODEL = "qwen2.5vl:7b"
+
+
+def _client(monkeypatch, handler, logged):
+    async def add_api_logs(entries):
+        logged.append(list(entries))
+
+    endpoint = config.OLLAMA_ENDPOINTS[MODEL]
+    monkeypatch.setattr(config, "RESPONSE_CACHE_ENABLED", False)
+    monkeypatch.setitem(
+        main.ollama_clients._clients, endpoint,
+        httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url=endpoint)
+    )
+    monkeypatch.setattr(main.log_writer, "add_api_logs", add_api_logs)
+    main.app.dependency_overrides[main.get_valid_api_key] = lambda: {"owner": "tester"}
+    return TestClient(main.app)
+
+
+def _lines(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_batch_results_tagged_with_index(monkeypatch):
+    """각 결과에 index가 붙고, 마지막 요약 줄과 함께 로그는 한 번에 기록"""
+    def handler(request):
+        image = json.loads(request.content)["images"][0]
+        if image == "bad":
+            return httpx.Response(500)
+        return httpx.Response(200, json={"response": f"text-{image}"})
+
+    logged = []
+    try:
+        client = _client(monkeypatch, handler, logged)
+        response = client.post("/v1/qwen/ocr/batch", json={"images": ["a", "bad", "c"], "model": MODEL})
+    finally:
+        main.app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    lines = _lines(response)
+    results = {line["index"]: line for line in lines[:-1]}
+    assert results[0]["ocr_text"] == "text-a"
+    assert results[1]["success"] is False
+    assert results[2]["ocr_text"] == "text-c"
+    assert lines[-1] == {**lines[-1], "done": True, "total": 3, "succeeded": 2}
+    assert len(logged) == 1 and len(logged[0]) == 2
+
+
+def test_batch_size_limit(monkeypatch):
+    """OCR_BATCH_MAX_IMAGES를 넘으면 413"""
+    monkeypatch.setattr(config, "OCR_BATCH_MAX_IMAGES", 2)
+    try:
+        client = _client(monkeypatch, lambda request: httpx.Response(200, json={}), [])
+        response = client.post("/v1/qwen/ocr/batch", json={"images": ["a", "b", "c"], "model": MODEL})
+    finally:
+        main.app.dependency_overrides.clear()
+    assert response.status_code == 413
+
+
+def test_file_batch(monkeypatch):
+    """multipart 업로드 배치도 같은 NDJSON 형식"""
+    def handler(request):
+        return httpx.Response(200, json={"response": "page"})
+
+    logged = []
+    try:
+        client = _client(monkeypatch, handler, logged)
+        files = [("files", (f"p{i}.png", b"\x89PNG" + bytes([i]), "image/png")) for i in range(2)]
+        response = client.post("/v1/qwen/ocr-file/batch", files=files, params={"model": MODEL})
+    finally:
+        main.app.dependency_overrides.clear()
+
+    lines = _lines(response)
+    assert sorted(line["index"] for line in lines[:-1]) == [0, 1]
+    assert all(line["ocr_text"] == "page" for line in lines[:-1])
+    assert lines[-1]["succeeded"] == 2
@@ -0,0 +1,177 @@
+"""
+🧪 여러 페이지 문서(PDF, TIFF) OCR 테스트
+"""
+import asyncio
+import base64
+import io
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app import config, image_preprocess, main, ocr_document
+
+MODEL = "qwen2.5vl:7b"
+
+
+def _tiff(pages=3):
+    frames = [Image.new("L", (400, 300), 40 * page) for page in range(pages)]
+    output = io.BytesIO()
+    frames[0].save(output, format="TIFF", save_all=True, append_images=frames[1:])
+    return output.getvalue()
+
+
+def test_render_tiff_pages(tmp_path):
+    """TIFF의 각 페이지를 따로 래스터화"""
+    path = tmp_path / "scan.tiff"
+    path.write_bytes(_tiff())
+    assert ocr_document.count_pages(str(path), "tiff") == 3
+
+    result = ocr_document.render_page(str(path), "tiff", 2, 60_000, True, "png")
+    page = Image.open(io.BytesIO(base64.b64decode(result["image_base64"])))
+    assert page.size[0] * page.size[1] <= 60_000
+    assert page.getpixel((0, 0)) == 80
+
+
+def test_render_pdf_page(tmp_path):
+    """PDF 페이지를 max_pixels에 맞춰 바로 렌더링"""
+    pypdfium2 = pytest.importorskip("pypdfium2")
+    pdf = pypdfium2.PdfDocument.new()
+    for _ in range(2):
+        pdf.new_page(612, 792)  # US Letter
+    path = tmp_path / "doc.pdf"
+    pdf.save(str(path))
+    pdf.close()
+
+    assert ocr_document.count_pages(str(path), "pdf") == 2
+    result = ocr_document.render_page(str(path), "pdf", 1, 500_000, False, "jpeg")
+    width, height = result["size"]
+    assert width * height <= 500_000
+    assert height > width
+
+
+def _shade_handler(request):
+    image = json.loads(request.content)["images"][0]
+    shade = Image.open(io.BytesIO(base64.b64decode(image))).getpixel((0, 0))
+    return httpx.Response(200, json={"response": f"shade-{shade}"})
+
+
+def test_document_endpoint_streams_pages_in_order(monkeypatch):
+    """페이지 순서대로 NDJSON 줄을 내보내고 마지막 줄에 처리량 보고"""
+    handler = _shade_handler
+    logged = []
+
+    async def add_api_logs(entries):
+        logged.append(list(entries))
+
+    endpoint = config.OLLAMA_ENDPOINTS[MODEL]
+    monkeypatch.setattr(config, "RESPONSE_CACHE_ENABLED", False)
+    monkeypatch.setitem(
+        main.ollama_clients._clients, endpoint,
+        httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url=endpoint)
+    )
+    monkeypatch.setattr(main.log_writer, "add_api_logs", add_api_logs)
+    main.app.dependency_overrides[main.get_valid_api_key] = lambda: {"owner": "tester"}
+    try:
+        response = TestClient(main.app).post(
+            "/v1/qwen/ocr-document",
+            files={"file": ("scan.tiff", _tiff(), "image/tiff")},
+            params={"model": MODEL, "grayscale": True, "image_format": "png"}
+        )
+    finally:
+        main.app.dependency_overrides.clear()
+        image_preprocess.shutdown()
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["page"] for line in lines[:-1]] == [1, 2, 3]
+    assert [line["ocr_text"] for line in lines[:-1]] == ["shade-0", "shade-40", "shade-80"]
+    assert lines[-1]["pages"] == 3 and lines[-1]["succeeded"] == 3
+    assert lines[-1]["pages_per_minute"] > 0
+    assert len(logged) == 1 and len(logged[0]) == 3
+
+
+def test_document_endpoint_reports_page_render_error(monkeypatch):
+    """한 페이지 렌더링이 실패해도 에러 줄을 내보내고 나머지 페이지와 요약 줄까지 계속"""
+    run_in_pool = image_preprocess.run_in_pool
+
+    async def flaky_run_in_pool(fn, *args):
+        if fn is ocr_document.render_page and args[2] == 1:
+            raise ValueError("broken page")
+        return await run_in_pool(fn, *args)
+
+    async def add_api_logs(entries):
+        pass
+
+    endpoint = config.OLLAMA_ENDPOINTS[MODEL]
+    monkeypatch.setattr(config, "RESPONSE_CACHE_ENABLED", False)
+    monkeypatch.setattr(ocr_document.image_preprocess, "run_in_pool", flaky_run_in_pool)
+    monkeypatch.setitem(
+        main.ollama_clients._clients, endpoint,
+        httpx.AsyncClient(transport=httpx.MockTransport(_shade_handler), base_url=endpoint)
+    )
+    monkeypatch.setattr(main.log_writer, "add_api_logs", add_api_logs)
+    main.app.dependency_overrides[main.get_valid_api_key] = lambda: {"owner": "tester"}
+    try:
+        response = TestClient(main.app).post(
+            "/v1/qwen/ocr-document",
+            files={"file": ("scan.tiff", _tiff(), "image/tiff")},
+            params={"model": MODEL, "grayscale": True, "image_format": "png"}
+        )
+    finally:
+        main.app.dependency_overrides.clear()
+        image_preprocess.shutdown()
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["page"] for line in lines[:-1]] == [1, 2, 3]
+    assert lines[1]["success"] is False and "broken page" in lines[1]["error"]
+    assert [line["ocr_text"] for line in (lines[0], lines[2])] == ["shade-0", "shade-80"]
+    assert lines[-1]["done"] is True and lines[-1]["succeeded"] == 2
+
+
+def test_document_cleanup_when_client_leaves_before_body(monkeypatch, tmp_path):
+    """본문 전송 전에 연결이 끊겨 본문 제너레이터가 시작되지 않아도 임시 파일 삭제와 로그 기록은 실행"""
+    from starlette.datastructures import Headers, UploadFile
+
+    flushed = []
+
+    async def add_api_logs(entries):
+        flushed.append(list(entries))
+
+    monkeypatch.setattr(config, "OCR_DOCUMENT_TMP_DIR", str(tmp_path))
+    monkeypatch.setattr(main.log_writer, "add_api_logs", add_api_logs)
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        raise OSError("client went away")
+
+    async def scenario():
+        data = _tiff()
+        upload = UploadFile(io.BytesIO(data), size=len(data), filename="scan.tiff", headers=Headers({"content-type": "image/tiff"}))
+        options = main.ocr_query_options(model=MODEL)
+        response = await main.qwen_ocr_document(file=upload, options=options, api_key={"owner": "tester"})
+        assert list(tmp_path.iterdir())
+        with pytest.raises(Exception):
+            await response({"type": "http", "asgi": {"spec_version": "2.4"}}, receive, send)
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        image_preprocess.shutdown()
+    assert list(tmp_path.iterdir()) == []
+    assert flushed == [[]]
+
+
+def test_rejects_unsupported_type():
+    """PDF/TIFF가 아니면 415"""
+    main.app.dependency_overrides[main.get_valid_api_key] = lambda: {"owner": "tester"}
+    try:
+        response = TestClient(main.app).post(
+            "/v1/qwen/ocr-document", files={"file": ("a.txt", b"hello", "text/plain")}
+        )
+    finally:
+        main.app.dependency_overrides.clear()
+    assert response.status_code == 415
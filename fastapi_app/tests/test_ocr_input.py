@@ -0,0 +1,58 @@
+"""
+🧪 OCR 이미지 입력 소스 테스트
+"""
+import asyncio
+import base64
+import io
+import json
+
+import httpx
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from app.ocr_input import BASE64_CHUNK_BYTES, Base64Image, UploadedImage
+
+IMAGE = bytes(range(256)) * (BASE64_CHUNK_BYTES // 256 + 7)
+
+
+def _upload(data):
+    return UploadFile(io.BytesIO(data), size=len(data), filename="scan.png")
+
+
+def test_streamed_body_matches_json_payload():
+    """청크 단위로 만든 본문이 일반 JSON 직렬화 결과와 같은 내용"""
+    received = {}
+
+    async def handler(request):
+        received["body"] = b"".join([chunk async for chunk in request.stream])
+        received["length"] = int(request.headers["Content-Length"])
+        return httpx.Response(200, json={"response": "ok"})
+
+    async def scenario():
+        image = await UploadedImage.from_upload(_upload(IMAGE))
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://ollama") as client:
+            await image.post(client, {"model": "qwen2.5vl:7b", "prompt": "읽어주세요", "stream": False})
+
+    asyncio.run(scenario())
+    payload = json.loads(received["body"])
+    assert received["length"] == len(received["body"])
+    assert payload["prompt"] == "읽어주세요"
+    assert payload["images"] == [base64.b64encode(IMAGE).decode("ascii")]
+
+
+def test_digest_matches_base64_source():
+    """업로드 파일과 base64 문자열이 같은 이미지면 같은 digest"""
+    async def scenario():
+        uploaded = await UploadedImage.from_upload(_upload(IMAGE))
+        inline = Base64Image(base64.b64encode(IMAGE).decode("ascii"))
+        return await uploaded.digest(), await inline.digest()
+
+    uploaded_digest, inline_digest = asyncio.run(scenario())
+    assert uploaded_digest == inline_digest
+
+
+def test_upload_size_limit():
+    """최대 크기를 넘으면 413"""
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(UploadedImage.from_upload(_upload(b"x" * 11), max_bytes=10))
+    assert exc_info.value.status_code == 413
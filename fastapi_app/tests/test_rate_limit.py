@@ -0,0 +1,96 @@
+"""
+🧪 API 키별 요청 속도 제한 / 동시 실행 수 제한 / 쿼터 테스트
+"""
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import config, database, main
+from app.rate_limit import RateLimiter, RateLimitExceeded
+
+
+@pytest.fixture
+def db_file(tmp_path, monkeypatch):
+    path = str(tmp_path / "api_server.db")
+    monkeypatch.setattr(config, "DATABASE_FILE", path)
+    database.init_db()
+    return path
+
+
+def test_unlimited_key_is_not_tracked():
+    """한도가 없는 키는 상태를 만들지 않음"""
+    limiter = RateLimiter()
+    for _ in range(100):
+        limiter.admit({"id": 1, "owner": "tester"}).release()
+    assert limiter.stats()["tracked_keys"] == 0
+
+
+def test_token_bucket_rejects_with_retry_after():
+    """burst만큼 허용한 뒤 거절, Retry-After는 토큰이 다시 찰 때까지"""
+    limiter = RateLimiter()
+    key = {"id": 1, "owner": "tester", "rate_limit_rps": 0.5, "rate_limit_burst": 3}
+    for _ in range(3):
+        limiter.admit(key).release()
+    with pytest.raises(RateLimitExceeded) as exc:
+        limiter.admit(key)
+    assert exc.value.retry_after == 2
+    assert limiter.stats()["rejected"] == {"rate": 1}
+
+
+def test_concurrency_lease_release():
+    """동시 실행 한도는 release 후 다시 사용 가능 (중복 release는 무시)"""
+    limiter = RateLimiter()
+    key = {"id": 1, "owner": "tester", "max_concurrent": 2}
+    first = limiter.admit(key)
+    second = limiter.admit(key)
+    with pytest.raises(RateLimitExceeded):
+        limiter.admit(key)
+    first.release()
+    first.release()
+    assert limiter.stats()["in_flight"] == 1
+    limiter.admit(key)
+    second.release()
+
+
+def test_quota_survives_restart(db_file):
+    """GPU 시간 쿼터는 체크포인트 후 새 인스턴스에서도 유지"""
+    key = {"id": 1, "owner": "tester", "quota_gpu_seconds": 10, "quota_window_hours": 1}
+
+    async def scenario():
+        limiter = RateLimiter()
+        limiter.admit(key).release()
+        limiter.charge(key, tokens=500, gpu_seconds=12.5)
+        with pytest.raises(RateLimitExceeded) as exc:
+            limiter.admit(key)
+        assert exc.value.retry_after > 3600
+        await limiter.checkpoint()
+
+        restarted = RateLimiter()
+        await restarted.load()
+        with pytest.raises(RateLimitExceeded):
+            restarted.admit(key)
+        # 다른 키에는 영향 없음
+        restarted.admit({**key, "id": 2}).release()
+
+    asyncio.run(scenario())
+
+
+def test_limits_apply_only_to_inference_endpoints(monkeypatch):
+    """쿼터를 다 쓴 키도 조회/삭제는 가능하고, 추론 요청만 429"""
+    key = {"id": 1, "owner": "tester", "rate_limit_rps": 1, "rate_limit_burst": 1}
+    monkeypatch.setattr(main, "rate_limiter", RateLimiter())
+    main.app.dependency_overrides[main.get_valid_api_key] = lambda: key
+    try:
+        client = TestClient(main.app)
+        first = client.post("/v1/embeddings", json={"model": "no-such-model", "input": "hi"})
+        limited = client.post("/v1/embeddings", json={"model": "no-such-model", "input": "hi"})
+        polls = [client.get("/v1/sessions/s1") for _ in range(3)]
+        deleted = client.delete("/v1/sessions/s1")
+    finally:
+        main.app.dependency_overrides.clear()
+
+    assert first.status_code == 400
+    assert limited.status_code == 429 and "Retry-After" in limited.headers
+    assert [poll.status_code for poll in polls] == [404, 404, 404]
+    assert deleted.status_code == 404
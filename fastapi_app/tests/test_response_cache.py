@@ -0,0 +1,55 @@
+"""
+🧪 응답 캐시 테스트
+"""
+import asyncio
+
+from app.response_cache import ResponseCache, make_key, should_cache
+
+
+def test_cache_key():
+    """모델/프롬프트/옵션/이미지가 모두 같아야 같은 키"""
+    base = make_key("qwen2.5vl:7b", "OCR", {"temperature": 0.1, "top_p": 0.9}, ["aGVsbG8="])
+    assert base == make_key("qwen2.5vl:7b", "OCR", {"top_p": 0.9, "temperature": 0.1}, ["aGVsbG8="])
+    assert base != make_key("qwen2.5vl:7b", "OCR", {"temperature": 0.1, "top_p": 0.9}, ["d29ybGQ="])
+    assert base != make_key("qwen2.5vl:7b", "OCR", {"temperature": 0.2, "top_p": 0.9}, ["aGVsbG8="])
+
+
+def test_should_cache():
+    """결정적 옵션이거나 호출자가 명시적으로 요청한 경우만 캐시"""
+    assert should_cache({"temperature": 0}, None)
+    assert should_cache({"seed": 42, "temperature": 0.7}, None)
+    assert not should_cache({"temperature": 0.1}, None)
+    assert should_cache({"temperature": 0.1}, True)
+    assert not should_cache({"temperature": 0}, False)
+
+
+def test_lru_eviction_by_bytes():
+    """바이트 한도를 넘으면 가장 오래 안 쓴 항목부터 제거"""
+    async def scenario():
+        cache = ResponseCache(max_bytes=60, disk_dir=None)
+        await cache.put("a", {"response": "x" * 10})
+        await cache.put("b", {"response": "y" * 10})
+        await cache.get("a")
+        await cache.put("c", {"response": "z" * 10})
+        return [await cache.get(key) is not None for key in ("a", "b", "c")], cache.stats()
+
+    present, stats = asyncio.run(scenario())
+    assert present == [True, False, True]
+    assert stats["evictions"] == 1
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    """디스크 계층은 새 인스턴스(재시작)에서도 조회 가능"""
+    async def scenario():
+        first = ResponseCache(disk_dir=str(tmp_path))
+        await first.start()
+        await first.put("k" * 64, {"response": "cached"})
+
+        second = ResponseCache(disk_dir=str(tmp_path))
+        await second.start()
+        value = await second.get("k" * 64)
+        return value, second.stats()
+
+    value, stats = asyncio.run(scenario())
+    assert value == {"response": "cached"}
+    assert stats["disk_hits"] == 1
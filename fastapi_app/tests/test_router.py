@@ -0,0 +1,154 @@
+"""
+🧪 복제본 라우터 테스트
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from app import config
+from app import router as router_module
+from app import scheduler as scheduler_module
+from app.clients import registry
+from app.router import ReplicaRouter
+
+MODEL = "qwen2.5vl:7b"
+PRIMARY = "http://replica-a:11434"
+SECONDARY = "http://replica-b:11434"
+
+
+def _setup(monkeypatch, handlers):
+    monkeypatch.setattr(config, "OLLAMA_REPLICAS", {MODEL: [PRIMARY, SECONDARY]})
+    monkeypatch.setattr(config, "ROUTER_EJECT_AFTER_FAILURES", 1)
+    for endpoint, handler in handlers.items():
+        monkeypatch.setitem(
+            registry._clients, endpoint,
+            httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url=endpoint)
+        )
+
+
+def _down(request):
+    raise httpx.ConnectError("connection refused", request=request)
+
+
+def _up(request):
+    if request.url.path in ("/api/tags", "/api/ps"):
+        return httpx.Response(200, json={"models": [{"name": MODEL}]})
+    return httpx.Response(200, json={"response": request.url.host})
+
+
+def test_failover_before_first_byte(monkeypatch):
+    """연결 실패한 복제본은 제외하고 다음 복제본으로 재시도"""
+    _setup(monkeypatch, {PRIMARY: _down, SECONDARY: _up})
+    router = ReplicaRouter()
+
+    async def scenario():
+        response = await router.call(MODEL, "alice", lambda client: client.post("/api/generate", json={}))
+        return response.json()["response"]
+
+    assert asyncio.run(scenario()) == "replica-b"
+    assert router.failovers == 1
+    assert router.replica(PRIMARY).healthy is False
+    assert [replica.endpoint for replica in router.candidates(MODEL)] == [SECONDARY]
+
+
+def test_least_outstanding(monkeypatch):
+    """진행 중 요청이 적은 복제본을 먼저 선택"""
+    _setup(monkeypatch, {PRIMARY: _up, SECONDARY: _up})
+    router = ReplicaRouter()
+    router.replica(PRIMARY).outstanding = 3
+    assert router.candidates(MODEL)[0].endpoint == SECONDARY
+
+
+def test_probe_readmits_replica(monkeypatch):
+    """헬스 체크가 성공하면 제외된 복제본을 다시 포함하고 적재 모델을 기록"""
+    _setup(monkeypatch, {PRIMARY: _up, SECONDARY: _up})
+    router = ReplicaRouter()
+    router.replica(PRIMARY).healthy = False
+
+    asyncio.run(router.probe_all())
+    replica = router.replica(PRIMARY)
+    assert replica.healthy is True
+    assert replica.loaded_models == {MODEL}
+
+
+def test_probe_treats_malformed_body_as_failure(monkeypatch):
+    """/api/tags 응답 형식이 잘못되어도 헬스 체크가 죽지 않고 실패로 기록"""
+    def malformed(request):
+        if request.url.path == "/api/tags":
+            return httpx.Response(200, json={"models": [{"size": 1}]})
+        return httpx.Response(200, json=["not", "a", "dict"])
+
+    _setup(monkeypatch, {PRIMARY: malformed, SECONDARY: _up})
+    router = ReplicaRouter()
+
+    asyncio.run(router.probe_all())
+    assert router.replica(PRIMARY).healthy is False
+    assert router.replica(PRIMARY).last_error
+    assert router.replica(SECONDARY).healthy is True
+
+
+def test_all_replicas_down(monkeypatch):
+    """모든 복제본이 실패하면 마지막 연결 오류 전달"""
+    _setup(monkeypatch, {PRIMARY: _down, SECONDARY: _down})
+    router = ReplicaRouter()
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(router.call(MODEL, "alice", lambda client: client.post("/api/generate", json={})))
+    assert router.replica(PRIMARY).outstanding == 0
+
+
+def test_prefers_replica_with_resident_model(monkeypatch):
+    """부하가 같으면 모델이 이미 적재된 복제본 선택"""
+    _setup(monkeypatch, {PRIMARY: _up, SECONDARY: _up})
+    monkeypatch.setattr(config, "BACKEND_MAX_LOADED_MODELS", {PRIMARY: 1, SECONDARY: 1})
+    monkeypatch.setattr(scheduler_module, "schedulers", scheduler_module.SchedulerRegistry())
+    monkeypatch.setattr(router_module, "schedulers", scheduler_module.schedulers)
+    scheduler_module.schedulers.get(PRIMARY).observe_loaded(["llama3:latest"])
+    scheduler_module.schedulers.get(SECONDARY).observe_loaded([MODEL])
+
+    assert ReplicaRouter().candidates(MODEL)[0].endpoint == SECONDARY
+
+
+def test_ttfb_recorded_only_for_streaming_opens(monkeypatch):
+    """비스트리밍 call()은 본문 전체 시간이므로 TTFB 히스토그램과 지연 EWMA에 넣지 않음"""
+    _setup(monkeypatch, {PRIMARY: _up, SECONDARY: _up})
+    monkeypatch.setattr(config, "OLLAMA_REPLICAS", {MODEL: [PRIMARY]})
+    monkeypatch.setattr(router_module.metrics.UPSTREAM_TTFB_SECONDS, "_values", {})
+    router = ReplicaRouter()
+
+    async def scenario():
+        await router.call(MODEL, "alice", lambda client: client.post("/api/generate", json={}))
+        called = router.replica(PRIMARY).latency_ewma
+        _, release = await router.open(MODEL, "alice", lambda client: client.post("/api/generate", json={}))
+        release()
+        return called
+
+    assert asyncio.run(scenario()) == 0.0
+    assert router.replica(PRIMARY).latency_ewma > 0
+    ttfb = router_module.metrics.UPSTREAM_TTFB_SECONDS._values[(MODEL, PRIMARY)]
+    assert sum(ttfb[:-1]) == 1
+
+
+def test_dropped_connection_fails_over_only_for_streaming(monkeypatch):
+    """연결이 끊긴 비스트리밍 요청은 생성이 이미 실행됐을 수 있으므로 다른 복제본으로 재시도하지 않음"""
+    def dropped(request):
+        raise httpx.RemoteProtocolError("Server disconnected without sending a response.", request=request)
+
+    _setup(monkeypatch, {PRIMARY: dropped, SECONDARY: _up})
+    router = ReplicaRouter()
+    router.replica(SECONDARY).outstanding = 3  # PRIMARY를 먼저 시도하도록
+
+    def generate(client):
+        return client.post("/api/generate", json={})
+
+    async def scenario():
+        with pytest.raises(httpx.RemoteProtocolError):
+            await router.call(MODEL, "alice", generate)
+        assert router.failovers == 0
+        router.replica(PRIMARY).healthy = True
+        response, release = await router.open(MODEL, "alice", generate)
+        release()
+        return response.json()["response"]
+
+    assert asyncio.run(scenario()) == "replica-b"
+    assert router.failovers == 1
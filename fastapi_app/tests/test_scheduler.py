@@ -0,0 +1,240 @@
+"""
+🧪 백엔드 스케줄러 테스트
+"""
+import asyncio
+import time
+
+import pytest
+
+from app import config
+from app.scheduler import BackendScheduler, Priority, QueueDeadlineError, QueueFullError, resolve_priority
+
+
+def test_inflight_limit_and_fair_order():
+    """동시 실행 수 제한 + 소유자 간 라운드로빈"""
+    async def scenario():
+        scheduler = BackendScheduler("http://gpu0", max_inflight=1, max_queue=10)
+        order = []
+
+        first = await scheduler.acquire("busy")
+        waiters = [
+            asyncio.create_task(scheduler.acquire(owner))
+            for owner in ["busy", "busy", "busy", "quiet"]
+        ]
+        await asyncio.sleep(0)
+        assert scheduler.in_flight == 1 and scheduler.queued == 4
+
+        first.release()
+        owners = ["busy", "busy", "busy", "quiet"]
+        pending = dict(zip(waiters, owners))
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                order.append(pending.pop(task))
+                task.result().release()
+        return order
+
+    # busy가 먼저 큐에 3개를 넣었어도 quiet은 두 번째로 처리
+    assert asyncio.run(scenario())[:2] == ["busy", "quiet"]
+
+
+def test_queue_full_rejects_with_retry_after():
+    """대기열이 가득 차면 즉시 거절"""
+    async def scenario():
+        scheduler = BackendScheduler("http://gpu0", max_inflight=1, max_queue=1)
+        await scheduler.acquire("a")
+        queued = asyncio.create_task(scheduler.acquire("b"))
+        await asyncio.sleep(0)
+        with pytest.raises(QueueFullError) as exc_info:
+            await scheduler.acquire("c")
+        queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+        return exc_info.value, scheduler.stats()
+
+    error, stats = asyncio.run(scenario())
+    assert error.retry_after >= 1
+    assert stats["rejected"] == 1
+    assert stats["queued"] == 0
+
+
+def test_cancelled_waiter_leaves_queue():
+    """대기 중 취소된 요청은 대기열에서 제거되고 슬롯을 차지하지 않음"""
+    async def scenario():
+        scheduler = BackendScheduler("http://gpu0", max_inflight=1, max_queue=5)
+        ticket = await scheduler.acquire("a")
+        waiter = asyncio.create_task(scheduler.acquire("b"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        ticket.release()
+        ticket.release()  # 중복 release는 무시
+        return scheduler.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["in_flight"] == 0
+    assert stats["queued"] == 0
+
+
+def test_resident_model_drains_before_swap(monkeypatch):
+    """적재된 모델 요청을 먼저 처리하고, 연속 한도를 넘으면 다른 모델로 교체"""
+    monkeypatch.setattr(config, "SCHEDULER_RESIDENT_MAX_CONSECUTIVE", 2)
+
+    async def scenario():
+        scheduler = BackendScheduler("http://gpu0", max_inflight=1, max_queue=10, max_loaded_models=1)
+        scheduler.observe_loaded(["llama3:latest"])
+        first = await scheduler.acquire("a", "llama3:latest")
+
+        requests = [
+            ("a", "qwen2.5vl:7b"),
+            ("b", "llama3:latest"),
+            ("c", "llama3:latest"),
+            ("d", "llama3:latest"),
+        ]
+        tasks = {asyncio.create_task(scheduler.acquire(owner, model)): model for owner, model in requests}
+        await asyncio.sleep(0)
+
+        order = []
+        ticket = first
+        while tasks:
+            ticket.release()
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            task = done.pop()
+            order.append(tasks.pop(task))
+            ticket = task.result()
+        ticket.release()
+        return order, scheduler.stats()
+
+    order, stats = asyncio.run(scenario())
+    # 먼저 들어온 qwen 요청은 llama3 요청 2개가 처리된 뒤 교체
+    assert order == ["llama3:latest", "llama3:latest", "qwen2.5vl:7b", "llama3:latest"]
+    assert stats["swaps"] == 2
+    assert stats["starvation_swaps"] == 1
+    assert stats["resident_models"] == ["llama3:latest"]
+
+
+def test_priority_class_served_first():
+    """나중에 들어온 interactive 요청이 먼저 대기 중인 batch 요청보다 먼저 처리"""
+    async def scenario():
+        scheduler = BackendScheduler("http://gpu0", max_inflight=1, max_queue=10)
+        order = []
+        ticket = await scheduler.acquire("ocr", priority=Priority("batch"))
+
+        async def request(owner, priority):
+            acquired = await scheduler.acquire(owner, priority=Priority(priority))
+            order.append(priority)
+            await asyncio.sleep(0)
+            acquired.release()
+
+        tasks = [asyncio.create_task(request("ocr", "batch")) for _ in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(request("chat", "interactive")))
+        await asyncio.sleep(0)
+        ticket.release()
+        await asyncio.gather(*tasks)
+        return order, scheduler.stats()
+
+    order, stats = asyncio.run(scenario())
+    assert order[0] == "interactive"
+    assert stats["wait_by_class"]["interactive"]["dispatched"] == 1
+    assert stats["wait_by_class"]["batch"]["p99_ms"] is not None
+
+
+def test_aging_promotes_old_requests(monkeypatch):
+    """오래 기다린 batch 요청은 interactive와 같은 단계가 되어 먼저 처리"""
+    monkeypatch.setattr(config, "PRIORITY_AGING_SECONDS", 5.0)
+
+    async def scenario():
+        scheduler = BackendScheduler("http://gpu0", max_inflight=1, max_queue=10)
+        ticket = await scheduler.acquire("a")
+        old_batch = asyncio.create_task(scheduler.acquire("ocr", priority=Priority("batch")))
+        await asyncio.sleep(0)
+        scheduler._queues["ocr"][0].enqueued_at -= 11  # 두 단계 승격
+        interactive = asyncio.create_task(scheduler.acquire("chat", priority=Priority("interactive")))
+        await asyncio.sleep(0)
+        ticket.release()
+        await asyncio.sleep(0)
+        first_done = old_batch.done(), interactive.done()
+        (await old_batch).release()
+        (await interactive).release()
+        return first_done, scheduler.stats()
+
+    first_done, stats = asyncio.run(scenario())
+    assert first_done == (True, False)
+    assert stats["aged_dispatches"] == 1
+
+
+def test_queue_deadline_expires_waiter():
+    """최대 대기 시간이 지나면 대기열에서 빠지고 QueueDeadlineError"""
+    async def scenario():
+        scheduler = BackendScheduler("http://gpu0", max_inflight=1, max_queue=10)
+        ticket = await scheduler.acquire("a")
+        with pytest.raises(QueueDeadlineError):
+            await scheduler.acquire("ocr", priority=Priority("batch", max_wait=0.01))
+        assert scheduler.queued == 0
+        ticket.release()
+        # 만료된 요청이 슬롯을 차지하지 않음
+        (await scheduler.acquire("b")).release()
+        return scheduler.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["in_flight"] == 0
+    assert stats["wait_by_class"]["batch"]["expired"] == 1
+
+
+def test_resolve_priority_caps_to_key_class():
+    """키의 priority_class보다 높은 클래스 요청은 키 클래스로 낮춤"""
+    assert resolve_priority("interactive", key_class="batch").name == "batch"
+    assert resolve_priority(None, default_class="batch").max_wait == config.PRIORITY_MAX_QUEUE_WAIT_SECONDS["batch"]
+    assert resolve_priority(None).name == config.PRIORITY_DEFAULT_CLASS
+    with pytest.raises(ValueError):
+        resolve_priority("urgent")
+
+
+def test_microbatch_gathers_concurrent_requests(monkeypatch):
+    """동시 요청이 이어지면 빈 슬롯 수만큼 모았다가 한꺼번에 보냄"""
+    monkeypatch.setattr(config, "MICROBATCH_MIN_FOLLOW_RATIO", 0.0)
+
+    async def scenario():
+        scheduler = BackendScheduler("http://gpu1", max_inflight=4, max_queue=10, microbatch_window=0.5)
+        scheduler._gap_ewma = 0.01  # 최근 도착 간격 10ms
+        scheduler._last_arrival = None
+        tasks = []
+        for _ in range(4):
+            tasks.append(asyncio.create_task(scheduler.acquire("u", "gpt-oss:20b")))
+            await asyncio.sleep(0)
+        started = time.monotonic()
+        tickets = await asyncio.gather(*tasks)
+        elapsed = time.monotonic() - started
+        for ticket in tickets:
+            ticket.release()
+        return elapsed, scheduler.stats()
+
+    elapsed, stats = asyncio.run(scenario())
+    # 4개가 모이는 즉시 전달 (창이 끝날 때까지 기다리지 않음)
+    assert elapsed < 0.1
+    assert stats["microbatch"]["batches"] == 1
+    assert stats["microbatch"]["avg_size"] == 4
+    assert stats["in_flight"] == 0
+
+
+def test_microbatch_window_closes_and_idle_passes_through(monkeypatch):
+    """창이 끝나면 모인 만큼 전달, 한가할 때는 기다리지 않음"""
+    async def scenario():
+        scheduler = BackendScheduler("http://gpu1", max_inflight=4, max_queue=10, microbatch_window=0.05)
+        # 드문드문 도착 (연달아 온 비율 < MICROBATCH_MIN_FOLLOW_RATIO) → 바로 전달
+        (await scheduler.acquire("u", "gpt-oss:20b")).release()
+        assert scheduler.microbatches == 0
+
+        scheduler._follow_ewma = 0.9
+        scheduler._gap_ewma = 0.01
+        pair = [asyncio.create_task(scheduler.acquire("u", "gpt-oss:20b")) for _ in range(2)]
+        await asyncio.sleep(0)
+        assert scheduler.in_flight == 0  # 아직 모으는 중
+        tickets = await asyncio.gather(*pair)
+        for ticket in tickets:
+            ticket.release()
+        return scheduler.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["microbatch"]["batches"] == 1
+    assert stats["microbatch"]["avg_size"] == 2
@@ -0,0 +1,106 @@
+"""
+🧪 /v1/generate 세션 (context 재사용 + 복제본 고정) 테스트
+"""
+import asyncio
+import json
+
+import httpx
+
+from app import config, main, models
+from app.clients import registry
+from app.router import ReplicaRouter
+from app.sessions import SESSION_OVERHEAD_BYTES, SessionStore
+
+MODEL = "gpt-oss:20b"
+PRIMARY = "http://replica-a:11434"
+SECONDARY = "http://replica-b:11434"
+
+
+def test_store_evicts_least_recent_by_bytes():
+    store = SessionStore(max_bytes=2 * SESSION_OVERHEAD_BYTES + 4 * 210)
+    first = store.get("alice", "s1", MODEL)
+    store.update(first, list(range(100)))
+    second = store.get("alice", "s2", MODEL)
+    store.update(second, list(range(100)))
+
+    # s1을 다시 사용했으므로 예산을 넘으면 s2가 먼저 빠짐
+    assert store.get("alice", "s1", MODEL) is first
+    store.update(first, list(range(120)))
+
+    assert store.peek("alice", "s2") is None
+    assert store.peek("alice", "s1") is first
+    assert store.stats()["evictions"] == 1
+    assert store.stats()["bytes"] == first.size
+
+
+def test_store_resets_on_model_change_and_long_context(monkeypatch):
+    monkeypatch.setattr(config, "SESSIONS_MAX_CONTEXT_TOKENS", 10)
+    store = SessionStore()
+    session = store.get("alice", "s1", MODEL)
+    store.update(session, [1, 2, 3])
+
+    # 다른 소유자의 같은 session_id는 별개 세션
+    assert not store.get("bob", "s1", MODEL).context
+    # 모델이 바뀌면 context를 버리고 새로 시작
+    assert not store.get("alice", "s1", "other:7b").context
+
+    session = store.get("alice", "s1", "other:7b")
+    store.update(session, list(range(11)))
+    assert not session.context and session.turns == 1
+    assert store.stats()["resets"] == 1
+
+
+def test_generate_replays_context_on_pinned_replica(monkeypatch):
+    """두 번째 요청은 이전 context를 다시 넣고, 첫 요청에 응답한 복제본으로 감"""
+    sent = []
+
+    def handler(request):
+        body = json.loads(request.content)
+        sent.append((request.url.host, body.get("context")))
+        return httpx.Response(200, json={
+            "response": "ok", "done": True,
+            "context": (body.get("context") or []) + [len(sent)],
+            "prompt_eval_count": 1 if body.get("context") else 5,
+            "prompt_eval_duration": 1_000_000,
+        })
+
+    monkeypatch.setattr(config, "SUPPORTED_MODELS", [MODEL])
+    monkeypatch.setattr(config, "OLLAMA_REPLICAS", {MODEL: [PRIMARY, SECONDARY]})
+    for endpoint in (PRIMARY, SECONDARY):
+        monkeypatch.setitem(
+            registry._clients, endpoint,
+            httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url=endpoint)
+        )
+    router = ReplicaRouter()
+    store = SessionStore()
+    monkeypatch.setattr(main, "replica_router", router)
+    monkeypatch.setattr(main, "session_store", store)
+
+    async def no_log(**kwargs):
+        pass
+    monkeypatch.setattr(main.log_writer, "add_api_log", no_log)
+
+    async def generate(session_id):
+        request = models.OllamaRequest(model=MODEL, prompt="hi", session_id=session_id, options={"temperature": 0})
+        model_name, payload = main.prepare_generate(request)
+        return await main.run_generate(request, model_name, payload, {"id": 1, "owner": "tester"})
+
+    async def scenario():
+        first, _ = await generate("chat-1")
+        # 첫 응답을 보낸 복제본이 더 바빠도 세션은 그 복제본에 고정
+        router.replica(f"http://{sent[0][0]}:11434").outstanding = 5
+        second, cache_hit = await generate("chat-1")
+        return first, second, cache_hit
+
+    first, second, cache_hit = asyncio.run(scenario())
+    assert "context" not in first and "context" not in second
+    assert cache_hit is False
+    assert sent[0][1] is None and sent[1][1] == [1]
+    assert sent[0][0] == sent[1][0]
+    assert router.stats()["affinity_hits"] == 1
+
+    session = store.peek("tester", "chat-1")
+    assert list(session.context) == [1, 2] and session.turns == 2
+    prompt_eval = store.stats()["prompt_eval"]
+    assert prompt_eval["fresh"]["avg_prompt_tokens"] == 5
+    assert prompt_eval["replayed"]["avg_prompt_tokens"] == 1
@@ -0,0 +1,113 @@
+"""
+🧪 Single-flight 요청 병합 테스트
+"""
+import asyncio
+
+import pytest
+
+from app.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_result():
+    """같은 키의 동시 요청은 업스트림 호출 1회를 공유"""
+    async def scenario():
+        group = SingleFlight()
+        calls = 0
+
+        async def upstream():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {"response": "ok"}
+
+        results = await asyncio.gather(*(group.do("same", upstream) for _ in range(5)))
+        return calls, results, group.stats()
+
+    calls, results, stats = asyncio.run(scenario())
+    assert calls == 1
+    assert all(result == {"response": "ok"} for result, _ in results)
+    assert sum(shared for _, shared in results) == 4
+    assert stats == {"in_progress": 0, "leaders": 1, "coalesced": 4}
+
+
+def test_error_delivered_to_every_waiter():
+    """업스트림 오류는 모든 대기자에게 전달"""
+    async def scenario():
+        group = SingleFlight()
+
+        async def upstream():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("ollama down")
+
+        return await asyncio.gather(*(group.do("same", upstream) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_leader_cancel_does_not_break_followers():
+    """처음 요청한 클라이언트가 끊겨도 나머지는 결과를 받음"""
+    async def scenario():
+        group = SingleFlight()
+
+        async def upstream():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        leader = asyncio.create_task(group.do("same", upstream))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(group.do("same", upstream))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(scenario()) == ("done", True)
+
+
+def test_generate_coalesces_only_cacheable_requests(monkeypatch):
+    """temperature>0 요청은 같은 프롬프트라도 각자 샘플링, temperature=0 요청만 합침"""
+    import httpx
+    from app import config, main, models
+    from app.clients import registry
+    from app.response_cache import ResponseCache
+    from app.router import ReplicaRouter
+
+    endpoint = "http://replica-a:11434"
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        await asyncio.sleep(0.02)
+        return httpx.Response(200, json={"response": f"sample-{len(calls)}", "done": True})
+
+    monkeypatch.setattr(config, "SUPPORTED_MODELS", ["gpt-oss:20b"])
+    monkeypatch.setattr(config, "OLLAMA_REPLICAS", {"gpt-oss:20b": [endpoint]})
+    monkeypatch.setattr(config, "BACKEND_MAX_INFLIGHT", {endpoint: 4})
+    monkeypatch.setitem(
+        registry._clients, endpoint,
+        httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url=endpoint)
+    )
+    monkeypatch.setattr(main, "replica_router", ReplicaRouter())
+    monkeypatch.setattr(main, "response_cache", ResponseCache(disk_dir=None))
+
+    async def no_log(**kwargs):
+        pass
+    monkeypatch.setattr(main.log_writer, "add_api_log", no_log)
+
+    async def generate(temperature):
+        request = models.OllamaRequest(model="gpt-oss:20b", prompt="hi", options={"temperature": temperature})
+        model_name, payload = main.prepare_generate(request)
+        response, _ = await main.run_generate(request, model_name, payload, {"id": 1, "owner": "tester"})
+        return response["response"]
+
+    async def scenario(temperature):
+        calls.clear()
+        results = await asyncio.gather(generate(temperature), generate(temperature))
+        return len(calls), results
+
+    sampled_calls, sampled = asyncio.run(scenario(0.8))
+    assert sampled_calls == 2 and sampled[0] != sampled[1]
+    deterministic_calls, deterministic = asyncio.run(scenario(0))
+    assert deterministic_calls == 1 and deterministic[0] == deterministic[1]
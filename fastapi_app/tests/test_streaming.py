@@ -0,0 +1,77 @@
+"""
+🧪 NDJSON 스트리밍 중계 테스트
+"""
+import asyncio
+import json
+
+import httpx
+
+from app import streaming
+
+CHUNKS = [
+    {"model": "gpt-oss:20b", "response": "안녕", "done": False},
+    {"model": "gpt-oss:20b", "response": "하세요", "done": False},
+    {"model": "gpt-oss:20b", "response": "", "done": True, "eval_count": 2},
+]
+
+
+def _mock_client():
+    body = "".join(json.dumps(c, ensure_ascii=False) + "\n" for c in CHUNKS).encode("utf-8")
+
+    def handler(request):
+        return httpx.Response(200, content=body, headers={"Content-Type": "application/x-ndjson"})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://ollama")
+
+
+def _collect(stream_format, drop_final_keys=()):
+    finished = {}
+
+    async def on_finish(text, final_chunk):
+        finished["text"] = text
+        finished["final"] = final_chunk
+
+    async def scenario():
+        async with _mock_client() as client:
+            upstream = await streaming.open_stream(client, "/api/generate", {"stream": True})
+            return [part async for part in streaming.relay(upstream, stream_format, on_finish, drop_final_keys=drop_final_keys)]
+
+    return asyncio.run(scenario()), finished
+
+
+def test_relay_ndjson():
+    """NDJSON 청크 그대로 전달 + 전체 텍스트 조립"""
+    parts, finished = _collect("ndjson")
+    assert len(parts) == len(CHUNKS)
+    assert json.loads(parts[0])["response"] == "안녕"
+    assert finished["text"] == "안녕하세요"
+    assert finished["final"]["eval_count"] == 2
+
+
+def test_relay_drops_final_keys():
+    """마지막 청크에서 지정한 키만 빼고 전달 (on_finish에는 원본 그대로)"""
+    parts, finished = _collect("ndjson", drop_final_keys=("eval_count",))
+    assert "eval_count" not in json.loads(parts[-1])
+    assert json.loads(parts[0]) == CHUNKS[0]
+    assert finished["final"]["eval_count"] == 2
+
+
+def test_relay_sse():
+    """SSE 형식 변환"""
+    parts, _ = _collect("sse")
+    assert all(p.startswith(b"data: ") and p.endswith(b"\n\n") for p in parts)
+
+
+def test_open_stream_http_error():
+    """업스트림 HTTP 오류는 스트림 시작 전에 예외로 전달"""
+    def handler(request):
+        return httpx.Response(404, json={"error": "model not found"})
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://ollama") as client:
+            try:
+                await streaming.open_stream(client, "/api/generate", {})
+            except httpx.HTTPStatusError as e:
+                return e.response.status_code
+
+    assert asyncio.run(scenario()) == 404
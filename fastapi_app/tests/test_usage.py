@@ -0,0 +1,65 @@
+"""
+🧪 키/모델별 사용량 집계 테스트
+"""
+import asyncio
+
+import pytest
+
+from app import config, database
+from app.usage import UsageMeter
+
+KEY = {"id": 1, "owner": "tester"}
+BODY = {
+    "done": True,
+    "prompt_eval_count": 20,
+    "eval_count": 100,
+    "prompt_eval_duration": 50_000_000,
+    "eval_duration": 2_000_000_000,
+    "load_duration": 0,
+    "total_duration": 2_100_000_000,
+}
+
+
+@pytest.fixture
+def db_file(tmp_path, monkeypatch):
+    path = str(tmp_path / "api_server.db")
+    monkeypatch.setattr(config, "DATABASE_FILE", path)
+    database.init_db()
+    return path
+
+
+def test_accumulate_and_flush(db_file):
+    """메모리에 누적했다가 한 번에 반영, 다음 반영은 기존 행에 더해짐"""
+    meter = UsageMeter()
+
+    async def scenario():
+        meter.record(KEY, "gpt-oss:20b", BODY)
+        meter.record(KEY, "gpt-oss:20b", BODY)
+        meter.record(KEY, "qwen2.5vl:7b", {**BODY, "eval_count": 10})
+        meter.record(KEY, "gpt-oss:20b", {"done": False, "response": "partial"})  # 중간 청크는 무시
+        await meter.flush()
+        meter.record(KEY, "gpt-oss:20b", BODY)
+        return await meter.report(days=1)
+
+    rows = {row["model"]: row for row in asyncio.run(scenario())}
+    gpt = rows["gpt-oss:20b"]
+    assert gpt["requests"] == 3
+    assert gpt["prompt_tokens"] == 60
+    assert gpt["completion_tokens"] == 300
+    assert gpt["gpu_ms"] == pytest.approx(6300.0)
+    assert gpt["tokens_per_second"] == 50.0
+    assert rows["qwen2.5vl:7b"]["completion_tokens"] == 10
+    assert meter.gpu_ms("tester") == pytest.approx(8400.0)
+
+
+def test_report_filters_owner(db_file):
+    """소유자 필터"""
+    meter = UsageMeter()
+
+    async def scenario():
+        meter.record(KEY, "gpt-oss:20b", BODY)
+        meter.record({"id": 2, "owner": "other"}, "gpt-oss:20b", BODY)
+        return await meter.report(days=1, owner="other")
+
+    rows = asyncio.run(scenario())
+    assert [row["owner"] for row in rows] == ["other"]
@@ -0,0 +1,141 @@
+"""
+🧪 모델 워밍업 관리자 테스트
+"""
+import asyncio
+import json
+
+import httpx
+
+from app import config
+from app.clients import registry
+from app.warmup import WarmupManager
+
+GPU0 = "http://warm-gpu0:11434"
+GPU1 = "http://warm-gpu1:11434"
+
+
+def _setup(monkeypatch, handler):
+    monkeypatch.setattr(config, "WARMUP_MODELS", {GPU0: ["qwen2.5vl:7b", "llama3:latest"], GPU1: ["gpt-oss:20b"]})
+    for endpoint in (GPU0, GPU1):
+        monkeypatch.setitem(
+            registry._clients, endpoint,
+            httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url=endpoint)
+        )
+
+
+def test_initial_warmup_records_cold_start(monkeypatch):
+    """모든 모델을 빈 프롬프트로 로드하고 콜드 스타트 시간을 기록"""
+    warmed = []
+
+    def handler(request):
+        body = json.loads(request.content)
+        warmed.append((request.url.host, body["model"], body["prompt"]))
+        return httpx.Response(200, json={"done": True, "load_duration": 2_500_000_000})
+
+    _setup(monkeypatch, handler)
+    manager = WarmupManager()
+    assert manager.is_ready() is False
+
+    asyncio.run(manager.warm_all(initial=True))
+    assert manager.is_ready() is True
+    assert sorted(warmed) == [
+        ("warm-gpu0", "llama3:latest", ""),
+        ("warm-gpu0", "qwen2.5vl:7b", ""),
+        ("warm-gpu1", "gpt-oss:20b", ""),
+    ]
+    stats = manager.stats()[GPU1]["gpt-oss:20b"]
+    assert stats["state"] == "ready"
+    assert stats["ollama_load_ms"] == 2500.0
+
+
+def test_rewarm_only_unloaded_models(monkeypatch):
+    """/api/ps에 없는 모델만 다시 로드"""
+    warmed = []
+
+    def handler(request):
+        if request.url.path == "/api/ps":
+            return httpx.Response(200, json={"models": [{"name": "qwen2.5vl:7b"}, {"name": "gpt-oss:20b"}]})
+        warmed.append(json.loads(request.content)["model"])
+        return httpx.Response(200, json={"done": True})
+
+    _setup(monkeypatch, handler)
+    asyncio.run(WarmupManager().warm_all(initial=False))
+    assert warmed == ["llama3:latest"]
+
+
+def test_failed_warmup_not_ready(monkeypatch):
+    """워밍업 실패 시 준비 상태가 아님"""
+    def handler(request):
+        raise httpx.ConnectError("connection refused", request=request)
+
+    _setup(monkeypatch, handler)
+    manager = WarmupManager()
+    asyncio.run(manager.warm_all(initial=True))
+    assert manager.is_ready() is False
+    assert manager.stats()[GPU0]["qwen2.5vl:7b"]["state"] == "failed"
+
+
+def test_embedding_model_warms_through_embed(monkeypatch):
+    """임베딩 전용 모델은 /api/generate가 400이므로 /api/embed로 올리고 준비 상태가 됨"""
+    warmed = []
+
+    def handler(request):
+        body = json.loads(request.content)
+        if request.url.path == "/api/generate" and body["model"] == "bge-m3:latest":
+            return httpx.Response(400, json={"error": '"bge-m3" does not support generate'})
+        warmed.append((request.url.path, body["model"]))
+        return httpx.Response(200, json={"model": body["model"], "embeddings": [], "load_duration": 1_000_000})
+
+    _setup(monkeypatch, handler)
+    monkeypatch.setattr(config, "WARMUP_MODELS", {GPU1: ["gpt-oss:20b", "bge-m3:latest"]})
+    monkeypatch.setattr(config, "EMBEDDING_MODELS", {"bge-m3:latest"})
+    manager = WarmupManager()
+    asyncio.run(manager.warm_all(initial=True))
+
+    assert warmed == [("/api/generate", "gpt-oss:20b"), ("/api/embed", "bge-m3:latest")]
+    assert manager.is_ready() is True
+    assert manager.stats()[GPU1]["bge-m3:latest"]["state"] == "ready"
+
+
+def test_optimized_entry_point_serves_requests(tmp_path, monkeypatch):
+    """main.optimized.py도 시작/종료와 인증, 로그 기록이 현재 모듈 구성으로 동작"""
+    import importlib.util
+    import os
+    import sqlite3
+    from fastapi.testclient import TestClient
+    from app import database
+
+    path = str(tmp_path / "api_server.db")
+    monkeypatch.setattr(config, "DATABASE_FILE", path)
+    monkeypatch.setattr(config, "WARMUP_MODELS", {})
+    database.init_db()
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO api_keys (api_key, owner, created_at) VALUES ('optimized-key', 'tester', '2024-01-01')")
+    conn.commit()
+    conn.close()
+
+    def handler(request):
+        return httpx.Response(200, json={"response": "hi there", "done": True})
+
+    real_client = httpx.AsyncClient
+    monkeypatch.setattr(httpx, "AsyncClient", lambda **kwargs: real_client(transport=httpx.MockTransport(handler), **kwargs))
+
+    spec = importlib.util.spec_from_file_location(
+        "app.main_optimized", os.path.join(os.path.dirname(database.__file__), "main.optimized.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    with TestClient(module.app) as client:
+        models = client.get("/v1/models", headers={"X-API-Key": "optimized-key"})
+        generated = client.post(
+            "/v1/generate", headers={"X-API-Key": "optimized-key"}, json={"model": "gpt-oss:20b", "prompt": "hello"}
+        )
+        rejected = client.get("/v1/models", headers={"X-API-Key": "wrong"})
+
+    assert models.status_code == 200
+    assert generated.status_code == 200 and generated.json()["response"] == "hi there"
+    assert rejected.status_code == 401
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT api_key_owner, response FROM logs").fetchall() == [("tester", "hi there")]
+    conn.close()